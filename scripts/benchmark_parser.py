@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Timings for the cleaning and parsing stages of comprehensive_parser
+Every stage runs over every lesson of the given RTF files and reports the best
+of several repeats in milliseconds per lesson, next to the regex cascade that
+clean_rtf used to be, so speed claims can be checked on real course files
+"""
+
+import argparse
+import re
+import time
+
+from comprehensive_parser import parse_lesson
+from rtf_lessons import iter_lessons, split_sections
+from rtf_tokenizer import CleanDocument, clean_rtf
+
+# Repeats per stage; the fastest is reported, as the least disturbed by other work
+DEFAULT_REPEATS = 5
+
+# The escapes the cascade knew, keyed by the digits after \' or \uc0\u
+CASCADE_CHAR_MAP = {
+    '92': "'", '96': '-', '93': '"', '94': '"',
+    '8217': "'", '8216': "'", '8220': '"', '8221': '"',
+    '8211': '–', '8212': '—', '8230': '...', '8594': '→'
+}
+
+def regex_cascade_clean(text):
+    """clean_rtf as it was before the tokenizer: a re.sub pass per kind of markup"""
+    if not text:
+        return ""
+    text = re.sub(r'\\uc0\\u(\d+)', lambda m: chr(int(m.group(1))), text)
+    text = re.sub(r"\\'(\d+)", lambda m: CASCADE_CHAR_MAP.get(m.group(1), ''), text)
+    text = re.sub(r'\\[a-z]+\d*\s*', ' ', text)
+    text = re.sub(r'\{|\}', '', text)
+    text = re.sub(r'\\\s*\n', ' ', text)
+    text = re.sub(r'\\', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\n\s*\n+', '\n\n', text)
+    return text.strip()
+
+def best_time(stage, lessons, repeats):
+    """Fastest of repeats runs of stage over every (lesson_num, block), in ms per lesson"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for lesson_num, block in lessons:
+            stage(lesson_num, block)
+        best = min(best, time.perf_counter() - start)
+    return best / len(lessons) * 1000
+
+STAGES = {
+    'regex cascade, whole lesson': lambda lesson_num, block: regex_cascade_clean(block),
+    'clean_rtf, whole lesson': lambda lesson_num, block: clean_rtf(block),
+    'CleanDocument (text and offset map)': lambda lesson_num, block: CleanDocument(block),
+    'split_sections': lambda lesson_num, block: split_sections(block, lesson_num),
+    'parse_lesson': lambda lesson_num, block: parse_lesson(block, 'Med', lesson_num, '0'),
+}
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Time the cleaning and parsing stages on lesson RTF files")
+    arg_parser.add_argument('files', nargs='+', help="lesson .rtf files, e.g. pre-med.rtf med.rtf")
+    arg_parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS,
+                            help=f"runs per stage; the fastest is reported (default {DEFAULT_REPEATS})")
+    args = arg_parser.parse_args()
+
+    lessons = [lesson for path in args.files for lesson in iter_lessons(path)]
+    if not lessons:
+        raise SystemExit("No lessons found")
+    size = sum(len(block) for _, block in lessons) / len(lessons)
+    print(f"{len(lessons)} lessons, {size:.0f} characters each on average")
+    for label, stage in STAGES.items():
+        print(f"  {label:40s} {best_time(stage, lessons, args.repeats):8.3f} ms/lesson")
@@ -6,185 +6,135 @@ Generates real multiple choice questions with options based on lesson content
 
 import re
 import json
+import argparse
+import itertools
+import os
+import posixpath
 import random
+from collections import Counter, deque
+from contextlib import ExitStack
+from concurrent.futures import Future, ProcessPoolExecutor
 
-def clean_rtf(text):
-    """Clean RTF formatting"""
-    if not text:
-        return ""
-    
-    # Handle Unicode escapes
-    text = re.sub(r'\\uc0\\u(\d+)', lambda m: chr(int(m.group(1))), text)
-    
-    # Handle special characters
-    char_map = {
-        '92': "'", '96': '-', '93': '"', '94': '"',
-        '8217': "'", '8216': "'", '8220': '"', '8221': '"',
-        '8211': '–', '8212': '—', '8230': '...', '8594': '→'
-    }
-    text = re.sub(r"\\'(\d+)", lambda m: char_map.get(m.group(1), ''), text)
-    
-    # Remove RTF codes but preserve structure
-    text = re.sub(r'\\[a-z]+\d*\s*', ' ', text)
-    text = re.sub(r'\{|\}', '', text)
-    text = re.sub(r'\\\s*\n', ' ', text)  # Replace backslash line breaks with space
-    text = re.sub(r'\\', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'\n\s*\n+', '\n\n', text)
-    return text.strip()
-
-def extract_section_text(content, start_marker, end_markers):
-    """Extract text between start_marker and any end_marker"""
-    start_match = re.search(start_marker, content, re.IGNORECASE)
-    if not start_match:
-        return None
+from distractor_index import DistractorIndex
+from fill_blanks import BlankIndex
+from lesson_corpus import LessonCorpus
+from lesson_scoring import SentenceScorer
+from medical_lexicon import LEXICON_PATH, load_lexicon
+from question_classifier import QuestionClassifier, summarize_question_types, write_type_summary
+from lesson_cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE, LessonCache, source_stamp
+from lesson_manifest import BuildManifest
+from lesson_pipeline import Pipeline
+from question_dedup import DEFAULT_THRESHOLD, NearDuplicateIndex
+from rtf_lessons import TITLE_PATTERN, find_intro, iter_lessons, section_text, split_sections
+from rtf_tokenizer import CleanDocument, normalize_space, save_pictures
+from sql_writer import CONFLICT_COLUMNS, DEFAULT_BATCH_SIZE, LESSON_COLUMNS, OUTPUT_FORMATS, Jsonb, SqlWriter, sql_value
+
+# Medical vocabulary and question cue phrases, compiled once
+LEXICON = load_lexicon()
+QUESTION_CLASSIFIER = QuestionClassifier(LEXICON)
+
+# Lexicon categories used for fill-in-the-blank words and drag-and-drop items
+FILL_BLANK_CATEGORIES = ('anatomy', 'substance', 'body_system', 'signalling')
+DRAG_DROP_CATEGORIES = ('anatomy', 'substance', 'body_system', 'signalling', 'skeleton', 'plurals')
+
+# Rule recorded in the type summary for the questions made up when a section has none
+FALLBACK_RULE = 'fallback'
+
+# Options longer than this are cut; shorter lesson sentences are offered to other lessons as wrong options
+MAX_OPTION_LENGTH = 80
+MIN_OPTION_LENGTH = 20
+
+# Section headers that end a bullet list
+SECTION_HEADERS = ['Key Points:', 'More to Learn:', 'Skill Check:', 'Questions:', 'Starter Questions:']
+# The lookahead lets a search pass over text that can start no header without trying each one
+SECTION_HEADER_PATTERN = re.compile('(?=[%s])(?:%s)' % (
+    ''.join(sorted({header[0].lower() + header[0].upper() for header in SECTION_HEADERS})),
+    '|'.join(re.escape(header) for header in SECTION_HEADERS)), re.IGNORECASE)
+
+# Bullet characters at the start of an item, and Pre-Med bullets inside a single line
+LEADING_BULLETS_PATTERN = re.compile(r'^[•\u9679●\s]+')
+INLINE_BULLET_PATTERN = re.compile(r'[•\u9679●]\s*([^\n•\u9679●]+)')
+
+# Items made only of bullet characters and whitespace, and runs of them to fold when comparing items
+BLANK_BULLET_PATTERN = re.compile(r'^[\s•\u9679●]+$')
+BULLET_RUN_PATTERN = re.compile(r'[•\u9679●\s]+')
+
+def _extract_line_bullets(text):
+    """Items of section text with line breaks, from a single pass over the lines
+
+    Questions end where a line ends in ? or ! (Med "question?\\question?" lists).
+    When a section has fewer than two such breaks, each run of lines up to one
+    ending in . ? or ! is an item instead (Skill Check statements). Short bullets
+    with no end punctuation fall back to the bullet characters of the same lines.
+    """
+    lines = text.split('\n')
+    flat_lines = []
+    question_items = []
+    question_breaks = 0
+    chunk = []
+    line_items = []
+    current_question = ""
     
-    start_pos = start_match.end()
+    for index, raw_line in enumerate(lines):
+        # Questions separated by ?\ or !\ - a break needs a newline after it
+        chunk.append(raw_line)
+        if index < len(lines) - 1 and raw_line.endswith(('?', '!')):
+            question_breaks += 1
+            question = LEADING_BULLETS_PATTERN.sub('', normalize_space('\n'.join(chunk)))
+            if len(question) > 10 and not SECTION_HEADER_PATTERN.search(question):
+                question_items.append(question)
+            chunk = []
+        
+        # Statements separated by \ - lines run on until one ends with . ? or !
+        normalized = normalize_space(raw_line)
+        if normalized:
+            flat_lines.append(normalized)
+        line = LEADING_BULLETS_PATTERN.sub('', normalized)
+        if len(line) < 5:
+            continue
+        current_question = f"{current_question} {line}" if current_question else line
+        if line.endswith(('.', '?', '!')):
+            if len(current_question) > 20 and not SECTION_HEADER_PATTERN.search(current_question):
+                line_items.append(current_question)
+            current_question = ""
     
-    # Find earliest end marker
-    end_pos = len(content)
-    for end_marker in end_markers:
-        end_match = re.search(end_marker, content[start_pos:], re.IGNORECASE)
-        if end_match and end_match.start() < end_pos:
-            end_pos = end_match.start()
+    # Add any remaining statement
+    if len(current_question) > 20 and not SECTION_HEADER_PATTERN.search(current_question):
+        line_items.append(current_question)
     
-    section_text = content[start_pos:start_pos + end_pos]
-    # Don't clean yet - return raw for extract_bullets to handle Med RTF format
-    return section_text
+    if question_breaks >= 2 and question_items:
+        return question_items
+    if line_items:
+        return line_items
+    return _extract_inline_bullets(' '.join(flat_lines))
 
-def extract_bullets(text):
-    """Extract bullet points, stopping at section headers. Handles both Pre-Med and Med RTF formats."""
+def _extract_inline_bullets(flat_text):
+    """Items of whitespace-normalised text: the text between bullet characters"""
     bullets = []
-    # Stop at section headers
-    section_headers = ['Key Points:', 'More to Learn:', 'Skill Check:', 'Questions:', 'Starter Questions:']
-    
-    # Find where to stop
-    stop_pos = len(text)
-    for header in section_headers:
-        header_match = re.search(re.escape(header), text, re.IGNORECASE)
-        if header_match and header_match.start() < stop_pos:
-            stop_pos = header_match.start()
-    
-    # Extract only up to the stop position
-    text_to_parse = text[:stop_pos]
-    
-    # First, try Med RTF format: questions separated by ?\ or !\ or just \ (for statements)
-    # Format 1: "question?\\question?\\question?"
-    # Format 2: "statement.\\statement.\\statement." (Skill Check format)
-    question_parts = re.split(r'([?!])\\', text_to_parse)
-    med_questions_found = False
-    if len(question_parts) > 3:  # More than just the original text
-        # Reconstruct questions by pairing chunks with their punctuation
-        i = 0
-        while i < len(question_parts) - 1:
-            question_text = question_parts[i]
-            if i + 1 < len(question_parts) and question_parts[i + 1] in ['?', '!']:
-                # This chunk ends with ? or !, combine with punctuation
-                question = question_text + question_parts[i + 1]
-                # Clean it - handle RTF codes
-                question = re.sub(r'\\uc0\\u(\d+)', lambda m: chr(int(m.group(1))), question)
-                question = re.sub(r'\\uc0\\u9679\s*', '', question)  # Remove bullet markers
-                question = re.sub(r'\\[a-z]+\d*\s*', ' ', question)
-                question = re.sub(r'\{|\}', '', question)
-                question = re.sub(r'\\\s*\n', ' ', question)
-                question = re.sub(r'\\', ' ', question)
-                question = re.sub(r'\s+', ' ', question).strip()
-                # Remove leading bullet characters if any
-                question = re.sub(r'^[•\u9679●\s]+', '', question)
-                # Skip if it contains section headers or is too short
-                if question and len(question) > 10:
-                    # Check if it contains section headers (case-insensitive)
-                    contains_header = False
-                    for header in section_headers:
-                        if header.lower() in question.lower():
-                            contains_header = True
-                            break
-                    if not contains_header:
-                        bullets.append(question)
-                        med_questions_found = True
-                i += 2
-            else:
-                i += 1
-    
-    # Also try Med RTF format where questions/statements are separated by \ (backslash-newline)
-    # This is common in Skill Check sections where questions end with periods
-    if not med_questions_found:
-        # Split by backslash followed by newline or end of text
-        # Look for patterns like: "text.\text.\text."
-        lines = re.split(r'\\\s*\n', text_to_parse)
-        potential_questions = []
-        current_question = ""
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Clean the line
-            line = re.sub(r'\\uc0\\u(\d+)', lambda m: chr(int(m.group(1))), line)
-            line = re.sub(r'\\uc0\\u9679\s*', '', line)
-            line = re.sub(r'\\[a-z]+\d*\s*', ' ', line)
-            line = re.sub(r'\{|\}', '', line)
-            line = re.sub(r'\\', ' ', line)
-            line = re.sub(r'\s+', ' ', line).strip()
-            line = re.sub(r'^[•\u9679●\s]+', '', line)
-            
-            if not line or len(line) < 5:
-                continue
-            
-            # If line ends with . ? or !, it might be a complete question
-            if line.endswith(('.', '?', '!')):
-                if current_question:
-                    current_question += " " + line
-                else:
-                    current_question = line
-                
-                # Check if it's substantial and not a section header
-                if len(current_question) > 20:
-                    contains_header = False
-                    for header in section_headers:
-                        if header.lower() in current_question.lower():
-                            contains_header = True
-                            break
-                    if not contains_header:
-                        potential_questions.append(current_question)
-                current_question = ""
-            else:
-                # Continue building the question
-                if current_question:
-                    current_question += " " + line
-                else:
-                    current_question = line
-        
-        # Add any remaining question
-        if current_question and len(current_question) > 20:
-            contains_header = False
-            for header in section_headers:
-                if header.lower() in current_question.lower():
-                    contains_header = True
-                    break
-            if not contains_header:
-                potential_questions.append(current_question)
-        
-        if len(potential_questions) > 0:
-            bullets.extend(potential_questions)
-            med_questions_found = True
-    
-    # If Med format didn't work, try Pre-Med format (traditional bullets on cleaned text)
-    if not med_questions_found:
-        # Clean the text first for Pre-Med format
-        cleaned_text = clean_rtf(text_to_parse)
-        # Try the traditional bullet pattern
-        pattern = r'[•\u9679●]\s*([^\n•\u9679●]+)'
-        matches = re.findall(pattern, cleaned_text)
-        for match in matches:
-            cleaned = match.strip()
-            # Skip if empty, too short, or contains section headers
-            if not cleaned or len(cleaned) < 5:
-                continue
-            if any(header.lower() in cleaned.lower() for header in section_headers):
-                continue
-            bullets.append(cleaned)
+    for match in INLINE_BULLET_PATTERN.findall(flat_text):
+        cleaned = match.strip()
+        # Skip if empty, too short, or contains section headers
+        if len(cleaned) < 5 or SECTION_HEADER_PATTERN.search(cleaned):
+            continue
+        bullets.append(cleaned)
+    return bullets
+
+def extract_bullets(text):
+    """Extract bullet points, stopping at section headers. Handles both Pre-Med and Med RTF formats.
+    
+    Takes already-cleaned section text in which RTF paragraph breaks are newlines.
+    Med "?\\" lists, Skill Check statements and Pre-Med bullet paragraphs are all
+    read by the same single pass over the lines; only text with no line breaks at
+    all is split at its bullet characters instead.
+    """
+    # Extract only up to the first section header
+    stop = SECTION_HEADER_PATTERN.search(text)
+    text_to_parse = text[:stop.start()] if stop else text
+    
+    if '\n' in text_to_parse:
+        bullets = _extract_line_bullets(text_to_parse)
+    else:
+        bullets = _extract_inline_bullets(normalize_space(text_to_parse))
     
     # Remove duplicates while preserving order, and filter out non-questions
     seen = set()
@@ -194,11 +144,10 @@ def extract_bullets(text):
         if not bullet or len(bullet.strip()) < 10:
             continue
         # Skip if it's just whitespace or bullet characters
-        if re.match(r'^[\s•\u9679●]+$', bullet):
+        if BLANK_BULLET_PATTERN.match(bullet):
             continue
         # Normalize for comparison (remove extra spaces, bullet chars)
-        normalized = re.sub(r'[•\u9679●\s]+', ' ', bullet.strip())
-        normalized = re.sub(r'\s+', ' ', normalized).strip()
+        normalized = BULLET_RUN_PATTERN.sub(' ', bullet.strip()).strip()
         if normalized and normalized not in seen:
             seen.add(normalized)
             unique_bullets.append(bullet.strip())
@@ -207,156 +156,32 @@ def extract_bullets(text):
 
 def determine_question_type(question_text):
     """Determine the best question type based on question content"""
-    question_lower = question_text.lower()
-    
-    # Fill in the blank indicators
-    fill_blank_keywords = ['______', 'fill in', 'blank', 'complete the', 'missing word']
-    if any(keyword in question_lower or keyword in question_text for keyword in fill_blank_keywords):
-        return "fill_in_blank"
-    
-    # Drag and drop indicators
-    drag_drop_keywords = ['order', 'sequence', 'arrange', 'put in order', 'match', 'connect', 'pair', 'label', 'drag', 'drop']
-    if any(keyword in question_lower for keyword in drag_drop_keywords):
-        return "drag_drop"
-    
-    # Multiple choice indicators (questions with "which", "what" that suggest selection)
-    mc_keywords = ['which of the following', 'which one', 'select', 'choose', 'pick']
-    if any(keyword in question_lower for keyword in mc_keywords):
-        return "multiple_choice"
-    
-    # Text answer indicators (open-ended questions)
-    text_answer_keywords = ['explain', 'describe', 'list', 'name', 'how does', 'why', 'in your own words', 'give an example', 'what do you think', 'can you']
-    if any(keyword in question_lower for keyword in text_answer_keywords):
-        return "text_answer"
-    
-    # If it ends with a question mark and is short, likely multiple choice
-    if question_text.strip().endswith('?') and len(question_text) < 100:
-        return "multiple_choice"
-    
-    # Default to text answer for open-ended questions
-    return "text_answer"
-
-def extract_key_words_for_fill_blank(text):
-    """Extract key medical/biology terms suitable for fill-in-the-blank"""
-    if not text:
+    return QUESTION_CLASSIFIER.classify(question_text)[0]
+
+def extract_key_words_for_fill_blank(lesson_corpus):
+    """Key medical/biology terms suitable for fill-in-the-blank, most frequent first"""
+    if not lesson_corpus.text:
         return []
     
-    # Medical/biology key words
-    key_word_patterns = [
-        r'\b(heart|brain|lungs|stomach|kidney|liver|muscle|bone|cell|tissue|organ|system)\b',
-        r'\b(blood|oxygen|carbon|dioxide|nutrient|waste|energy|protein|vitamin|mineral)\b',
-        r'\b(circulatory|respiratory|digestive|nervous|skeletal|muscular|immune|endocrine)\b',
-        r'\b(artery|vein|capillary|nerve|neuron|hormone|enzyme|antibody)\b'
-    ]
-    
-    key_words = []
-    text_lower = text.lower()
+    # Medical/biology key words; ties keep first-seen order, so runs are reproducible
+    key_words = Counter(LEXICON.terms_in(lesson_corpus.lower, FILL_BLANK_CATEGORIES))
     
-    for pattern in key_word_patterns:
-        matches = re.findall(pattern, text_lower, re.IGNORECASE)
-        key_words.extend(matches)
-    
-    # Remove duplicates and filter out common words
+    # Filter out common words
     filler_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with'}
-    key_words = [w for w in set(key_words) if w.lower() not in filler_words and len(w) > 3]
-    
-    return key_words[:10]  # Return top 10
-
-def create_fill_in_blank_from_text(text, key_word):
-    """Create a fill-in-the-blank question by removing a key word from text"""
-    if not text or not key_word:
-        return None
-    
-    # Find sentences containing the key word
-    sentences = re.split(r'[.!?]+', text)
-    target_sentence = None
-    
-    for sentence in sentences:
-        if re.search(r'\b' + re.escape(key_word) + r'\b', sentence, re.IGNORECASE):
-            target_sentence = sentence.strip()
-            if len(target_sentence) > 20 and len(target_sentence) < 200:
-                break
-    
-    if not target_sentence:
-        return None
-    
-    # Replace the key word with a blank
-    blank_sentence = re.sub(
-        r'\b' + re.escape(key_word) + r'\b',
-        '______',
-        target_sentence,
-        flags=re.IGNORECASE
-    )
-    
-    return blank_sentence.strip()
+    return [w for w, _ in key_words.most_common() if w.lower() not in filler_words and len(w) > 3]
 
-def extract_answer_from_content(question, lesson_content):
+def extract_answer_from_content(question, lesson_corpus, scorer):
     """Extract a concise answer from lesson content based on the question"""
-    question_lower = question.lower()
-    content_lower = lesson_content.lower()
-    sentences = re.split(r'[.!?]+', lesson_content)
-    
-    # Look for concise answers (shorter sentences are better for multiple choice)
-    answer_candidates = []
-    
-    # System-related questions - look for concise definitions
-    if any(term in question_lower for term in ['system', 'systems']):
-        if 'skeletal' in question_lower or 'bone' in question_lower:
-            for sent in sentences:
-                sent_lower = sent.lower()
-                if 'skeletal' in sent_lower and ('provides' in sent_lower or 'protects' in sent_lower or 'supports' in sent_lower):
-                    # Extract key phrase
-                    if len(sent) < 120:
-                        answer_candidates.append(sent.strip())
-        elif 'circulatory' in question_lower or 'heart' in question_lower or 'blood' in question_lower:
-            for sent in sentences:
-                sent_lower = sent.lower()
-                if any(term in sent_lower for term in ['circulatory', 'heart', 'blood']) and ('pumps' in sent_lower or 'transports' in sent_lower or 'delivers' in sent_lower):
-                    if len(sent) < 120:
-                        answer_candidates.append(sent.strip())
-        elif 'respiratory' in question_lower or 'lung' in question_lower or 'breath' in question_lower:
-            for sent in sentences:
-                sent_lower = sent.lower()
-                if any(term in sent_lower for term in ['respiratory', 'lung', 'breath']) and ('oxygen' in sent_lower or 'breathe' in sent_lower):
-                    if len(sent) < 120:
-                        answer_candidates.append(sent.strip())
-        elif 'work together' in question_lower or 'cooperate' in question_lower:
-            for sent in sentences:
-                sent_lower = sent.lower()
-                if any(term in sent_lower for term in ['work together', 'cooperate', 'collaborate']) and len(sent) < 100:
-                    answer_candidates.append(sent.strip())
-    
-    # Organ-related questions
-    elif 'organ' in question_lower:
-        for sent in sentences:
-            if 'organ' in sent.lower() and len(sent) > 20 and len(sent) < 100:
-                answer_candidates.append(sent.strip())
-    
-    # Cell-related questions
-    elif 'cell' in question_lower:
-        for sent in sentences:
-            if 'cell' in sent.lower() and ('building block' in sent.lower() or 'basic' in sent.lower()) and len(sent) < 100:
-                answer_candidates.append(sent.strip())
-    
-    # General: find concise sentences with question keywords
-    question_words = [w for w in question_lower.split() if len(w) > 4 and w not in ['what', 'which', 'where', 'when', 'why', 'how', 'does', 'doesn', 'would', 'could', 'should', 'think', 'about']]
-    for word in question_words[:2]:  # Check first 2 meaningful words
-        for sent in sentences:
-            if word in sent.lower() and len(sent) > 20 and len(sent) < 100:
-                answer_candidates.append(sent.strip())
-    
-    # Return the shortest good candidate (more concise)
-    if answer_candidates:
-        # Sort by length, prefer shorter
-        answer_candidates.sort(key=len)
-        return answer_candidates[0]
-    
-    return None
+    # Best BM25 match among sentences short enough to be an option
+    sent_id = scorer.best(question, min_len=20, max_len=120)
+    if sent_id is None:
+        return None
+    return lesson_corpus.stripped[sent_id]
 
-def generate_multiple_choice_options(question, lesson_content):
+def generate_multiple_choice_options(question, lesson_corpus, scorer):
     """Generate realistic multiple choice options with actual answers from lesson content"""
     question_lower = question.lower()
-    content_lower = lesson_content.lower()
+    content_lower = lesson_corpus.lower
     
     # For specific question types, generate targeted answers FIRST
     correct_answer = None
@@ -383,26 +208,13 @@ def generate_multiple_choice_options(question, lesson_content):
     
     # If not a hospital question, try to extract from content
     if not correct_answer:
-        correct_answer = extract_answer_from_content(question, lesson_content)
+        correct_answer = extract_answer_from_content(question, lesson_corpus, scorer)
     
-    # If we couldn't extract, try harder to find concise answer in content
+    # If we couldn't extract, accept a shorter best match
     if not correct_answer or len(correct_answer) < 15:
-        sentences = re.split(r'[.!?]+', lesson_content)
-        question_keywords = [w for w in question_lower.split() if len(w) > 3 and w not in ['what', 'which', 'where', 'when', 'why', 'how', 'does', 'doesn', 'would', 'could', 'should', 'think', 'about', 'from', 'this', 'that', 'the', 'and', 'or', 'but']]
-        
-        # Find concise sentences with keyword overlap
-        best_sentences = []
-        for sent in sentences:
-            if len(sent) > 15 and len(sent) < 100:  # Prefer shorter
-                sent_lower = sent.lower()
-                overlap = sum(1 for kw in question_keywords if kw in sent_lower)
-                if overlap > 0:
-                    best_sentences.append((overlap, len(sent), sent.strip()))
-        
-        # Sort by overlap (desc) then length (asc) - prefer high overlap, short sentences
-        best_sentences.sort(reverse=True, key=lambda x: (x[0], -x[1]))
-        if best_sentences and best_sentences[0][0] > 0:
-            correct_answer = best_sentences[0][2][:100]  # Limit to 100 chars
+        sent_id = scorer.best(question, min_len=15, max_len=100)
+        if sent_id is not None:
+            correct_answer = lesson_corpus.stripped[sent_id][:100]  # Limit to 100 chars
     
     # Final fallback: generate concise answer based on question type
     if not correct_answer or len(correct_answer) < 15:
@@ -436,21 +248,19 @@ def generate_multiple_choice_options(question, lesson_content):
             correct_answer = "Systems must cooperate to keep the body healthy"
         elif "why" in question_lower:
             # Try to find a "because" or reason in the content
-            for sent in re.split(r'[.!?]+', lesson_content):
-                if 'because' in sent.lower() or 'reason' in sent.lower() or 'important' in sent.lower():
-                    if len(sent) > 30 and len(sent) < 200:
-                        correct_answer = sent.strip()[:150]
-                        break
+            for sent_id in lesson_corpus.sentences_with_any(['because', 'reason', 'important']):
+                if lesson_corpus.lengths[sent_id] > 30 and lesson_corpus.lengths[sent_id] < 200:
+                    correct_answer = lesson_corpus.stripped[sent_id][:150]
+                    break
             if not correct_answer or len(correct_answer) < 20:
                 correct_answer = "This is important for maintaining proper body function"
         else:
             # Try to find any relevant sentence
-            sentences = re.split(r'[.!?]+', lesson_content)
-            for sent in sentences:
-                # Check if sentence contains words from the question
-                question_words = [w for w in question_lower.split() if len(w) > 4]
-                if any(word in sent.lower() for word in question_words[:2]) and len(sent) > 30 and len(sent) < 200:
-                    correct_answer = sent.strip()[:150]
+            # Check if sentence contains words from the question
+            question_words = [w for w in question_lower.split() if len(w) > 4]
+            for sent_id in lesson_corpus.sentences_with_any(question_words[:2]):
+                if lesson_corpus.lengths[sent_id] > 30 and lesson_corpus.lengths[sent_id] < 200:
+                    correct_answer = lesson_corpus.stripped[sent_id][:150]
                     break
             if not correct_answer or len(correct_answer) < 20:
                 correct_answer = "This concept is essential for understanding how the body works"
@@ -552,30 +362,17 @@ def generate_multiple_choice_options(question, lesson_content):
     
     return options, correct_index
 
-def generate_explanation(question, lesson_content, correct_answer=None):
+def generate_explanation(question, lesson_corpus, scorer, correct_answer=None):
     """Generate a real explanation for the answer based on lesson content"""
     question_lower = question.lower()
-    content_lower = lesson_content.lower()
-    
-    # Try to find explanation in lesson content
-    sentences = re.split(r'[.!?]+', lesson_content)
     
-    # Look for sentences that explain the concept
-    explanation_candidates = []
+    # Best-scoring explanatory sentence: one with words like "because", "helps", "allows", "enables"
+    explanatory = lesson_corpus.sentences_with_any(['because', 'helps', 'allows', 'enables', 'important', 'essential', 'function', 'works', 'provides'])
+    sent_id = scorer.best(question, min_len=40, max_len=250, mask=scorer.mask(explanatory))
     
-    # Find sentences that contain key terms from the question
-    question_keywords = [w for w in question_lower.split() if len(w) > 4 and w not in ['what', 'which', 'where', 'when', 'why', 'how', 'does', 'doesn', 'would', 'could', 'should', 'think', 'about']]
-    
-    for keyword in question_keywords[:3]:
-        for sent in sentences:
-            if keyword in sent.lower() and len(sent) > 40 and len(sent) < 250:
-                # Check if it's explanatory (contains words like "because", "helps", "allows", "enables")
-                if any(word in sent.lower() for word in ['because', 'helps', 'allows', 'enables', 'important', 'essential', 'function', 'works', 'provides']):
-                    explanation_candidates.append(sent.strip())
-    
-    # If we found good explanations, use the first one
-    if explanation_candidates:
-        explanation = explanation_candidates[0]
+    # If we found a good explanation, use it
+    if sent_id is not None:
+        explanation = lesson_corpus.stripped[sent_id]
         # Clean it up
         explanation = re.sub(r'\s+', ' ', explanation).strip()
         if len(explanation) > 30:
@@ -610,19 +407,13 @@ def generate_explanation(question, lesson_content, correct_answer=None):
         # Generic but helpful explanation
         return "This concept is important for understanding how the human body functions and maintains health."
 
-def extract_drag_drop_items(question_text, lesson_text_parts):
+def extract_drag_drop_items(question_text, lesson_corpus):
     """Extract items for drag and drop questions"""
     items = []
-    full_text = ' '.join(lesson_text_parts).lower()
-    
-    # Look for common medical/anatomy terms in question
-    medical_terms = ['heart', 'lungs', 'brain', 'stomach', 'kidneys', 'liver', 'blood', 'oxygen', 
-                     'carbon dioxide', 'arteries', 'veins', 'nerves', 'muscles', 'bones', 'cells', 
-                     'tissues', 'organs', 'skeletal', 'muscular', 'circulatory', 'respiratory', 
-                     'nervous', 'digestive']
     
-    for term in medical_terms:
-        if term in question_text.lower() and term in full_text:
+    # Medical/anatomy terms named in the question that the lesson also mentions
+    for term in dict.fromkeys(LEXICON.terms_in(question_text.lower(), DRAG_DROP_CATEGORIES)):
+        if lesson_corpus.sentences_with(term):
             items.append(term.capitalize())
     
     # If not enough items, add generic ones
@@ -631,428 +422,838 @@ def extract_drag_drop_items(question_text, lesson_text_parts):
     
     return items[:6]  # Max 6 items
 
-def parse_rtf_file(filepath, path_type, num_lessons):
-    """Parse RTF file and extract all lessons with complete content"""
-    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
+# Where --extract-images DIR is served from, when it is not given; images get src /name
+DEFAULT_IMAGE_PREFIX = '/'
+
+# Learning objective, up to the next heading
+OBJECTIVE_PATTERN = re.compile(r'After this lesson.*?(?=\\fs51|$)', re.DOTALL | re.IGNORECASE)
+
+def extract_lesson_text(lesson_block, doc, sections, lesson_num):
+    """The parts of a lesson's main text: intro, lesson body, key points and more to learn"""
+    # Get intro paragraph
+    lesson_text_parts = []
+    intro = find_intro(lesson_block, lesson_num)
+    if intro:
+        intro_text = normalize_space(doc[intro[0]:intro[1]])
+        if intro_text and len(intro_text) > 20:
+            lesson_text_parts.append(intro_text)
     
-    lessons = []
+    # Get the "Lesson X: ..." main content
+    lesson_text = section_text(doc, sections, 'Lesson')
+    if lesson_text:
+        lesson_text = normalize_space(lesson_text)
+        if lesson_text and len(lesson_text) > 20:
+            lesson_text_parts.append(lesson_text)
     
-    for lesson_num in range(1, num_lessons + 1):
-        print(f"\nProcessing {path_type} Lesson {lesson_num}...")
-        
-        # Find lesson title
-        title_pattern1 = rf'\\fs51\\fsmilli25995\s+\\cf2\s+{lesson_num}\s+\|\s+(.*?)(?=\\fs21|\\fs51)'
-        title_pattern2 = rf'\\fs51\\fsmilli25995\s+{lesson_num}\s+\|\s+(.*?)(?=\\fs21|\\fs51)'
-        title_match = re.search(title_pattern1, content, re.DOTALL) or re.search(title_pattern2, content, re.DOTALL)
+    # Extract Key Points and add to lesson text
+    key_points_text = section_text(doc, sections, 'Key Points')
+    if key_points_text:
+        bullets = extract_bullets(key_points_text)
+        for bp in bullets:
+            if len(bp) > 10:
+                lesson_text_parts.append(f"\n\n• {bp}")
         
-        if not title_match:
-            print(f"  ⚠ Warning: Lesson {lesson_num} title not found")
-            continue
-        
-        title = clean_rtf(title_match.group(1))
-        print(f"  Title: {title}")
-        
-        start_pos = title_match.start()
-        
-        # Find next lesson
-        next_pattern1 = rf'\\fs51\\fsmilli25995\s+\\cf2\s+{lesson_num + 1}\s+\|'
-        next_pattern2 = rf'\\fs51\\fsmilli25995\s+{lesson_num + 1}\s+\|'
-        next_match = re.search(next_pattern1, content[start_pos:]) or re.search(next_pattern2, content[start_pos:])
-        end_pos = start_pos + next_match.start() if next_match else len(content)
-        
-        lesson_block = content[start_pos:end_pos]
-        
-        # Extract objective
-        obj_match = re.search(r'After this lesson.*?(?=\\fs51|$)', lesson_block, re.DOTALL | re.IGNORECASE)
-        objective = clean_rtf(obj_match.group(0)) if obj_match else f"Learn about {title}"
-        if len(objective) > 500:
-            objective = objective[:497] + "..."
-        print(f"  Objective: {objective[:80]}...")
-        
-        # Extract main lesson text - get intro paragraph
-        lesson_text_parts = []
-        intro_match = re.search(rf'In this lesson.*?(?=After this lesson|Lesson {lesson_num}:|Starter Questions:)', lesson_block, re.DOTALL | re.IGNORECASE)
-        if intro_match:
-            intro_text = clean_rtf(intro_match.group(0))
-            if intro_text and len(intro_text) > 20:
-                lesson_text_parts.append(intro_text)
-        
-        # Get the "Lesson X: ..." main content
-        lesson_text_pattern = rf'Lesson {lesson_num}:(.*?)(?=Starter Questions:|Key Points:|Questions:|More to Learn:|Skill Check:|\\fs51)'
-        lesson_text_match = re.search(lesson_text_pattern, lesson_block, re.DOTALL | re.IGNORECASE)
-        if lesson_text_match:
-            lesson_text_raw = lesson_text_match.group(1)
-            lesson_text_raw = re.sub(r'\\\s*\n', ' ', lesson_text_raw)
-            lesson_text = clean_rtf(lesson_text_raw)
-            if lesson_text and len(lesson_text) > 20:
-                lesson_text_parts.append(lesson_text)
-        
-        # Extract Starter Questions
-        tasks = []
-        starter_text = extract_section_text(lesson_block, r'Starter Questions:', [r'Key Points:', r'Questions:', r'More to Learn:', r'Skill Check:'])
-        if starter_text:
-            # Extract bullets from raw RTF text (extract_bullets will handle cleaning)
-            task_list = extract_bullets(starter_text)
-            for i, task in enumerate(task_list):
-                # Assign question type with variety: mix of text_answer, multiple_choice, fill_in_blank
-                # Use index to distribute evenly: 0,3,6 = text, 1,4,7 = mcq, 2,5,8 = fill_blank
-                if i % 3 == 0:
-                    question_type = "text_answer"
-                elif i % 3 == 1:
-                    question_type = "multiple_choice"
+        # Also extract structured key points
+        key_points_clean = normalize_space(key_points_text)
+        if key_points_clean and len(key_points_clean) > 20:
+            lesson_text_parts.append(f"\n\nKey Points:\n{key_points_clean}")
+    
+    # Extract More to Learn
+    more_text = section_text(doc, sections, 'More to Learn')
+    if more_text:
+        more_clean = normalize_space(more_text)
+        if more_clean and len(more_clean) > 20:
+            lesson_text_parts.append(f"\n\nMore to Learn:\n{more_clean}")
+    
+    return lesson_text_parts
+
+def answer_phrases(lesson_corpus):
+    """A lesson's option-sized sentences, which other lessons may use as wrong options"""
+    return list(dict.fromkeys(
+        phrase for phrase in (LEADING_BULLETS_PATTERN.sub('', sent) for sent in lesson_corpus.stripped)
+        if MIN_OPTION_LENGTH <= len(phrase) <= MAX_OPTION_LENGTH
+    ))
+
+def picture_section(sections, raw_pos):
+    """Name of the section whose body holds raw_pos, or None when it is outside every section"""
+    for name, (start, end) in sections.items():
+        if start <= raw_pos < end:
+            return name
+    return None
+
+def parse_lesson(lesson_block, path_type, lesson_num, seed=None, image_dir=None, image_prefix=DEFAULT_IMAGE_PREFIX):
+    """Parse one lesson's raw RTF block into a lesson dict
+    
+    Depends only on the block, so lessons can be parsed in worker processes.
+    With a seed, the random choices are reseeded per lesson and the result is
+    the same whichever process parses it. With image_dir, embedded \\pict
+    images are written there and listed under "images", each with its URL
+    under image_prefix and the section it sits in.
+    """
+    if seed is not None:
+        random.seed(f"{seed}:{path_type}:{lesson_num}")
+    
+    # Clean the block once; structure is found on the raw RTF and
+    # text is sliced out of the cleaned buffer through the offset map
+    doc = CleanDocument(lesson_block, pictures=image_dir is not None)
+    
+    title_match = TITLE_PATTERN.match(lesson_block)
+    title = normalize_space(doc[title_match.start(1):title_match.end(1)]) if title_match else f"Lesson {lesson_num}"
+    
+    # Every section header in the lesson, found in one scan
+    sections = split_sections(lesson_block, lesson_num)
+    
+    # Extract objective
+    obj_match = OBJECTIVE_PATTERN.search(lesson_block)
+    objective = normalize_space(doc[obj_match.start():obj_match.end()]) if obj_match else f"Learn about {title}"
+    if len(objective) > 500:
+        objective = objective[:497] + "..."
+    
+    lesson_text_parts = extract_lesson_text(lesson_block, doc, sections, lesson_num)
+    
+    # Every question is generated against the whole lesson text, segmented once
+    lesson_corpus = LessonCorpus(' '.join(lesson_text_parts))
+    
+    # Collect every question first so all of them are scored against the text in one batch
+    starter_text = section_text(doc, sections, 'Starter Questions')
+    task_list = extract_bullets(starter_text) if starter_text else []
+    questions_text = section_text(doc, sections, 'Questions')
+    followup_list = extract_bullets(questions_text) if questions_text else []
+    quiz_text = section_text(doc, sections, 'Skill Check')
+    if quiz_text is None and 'Questions' in sections:
+        # Without a Skill Check the quiz is a second Questions section, never the follow-ups
+        # again; only the text after the follow-ups needs scanning for it
+        later_sections = split_sections(lesson_block, lesson_num, pos=sections['Questions'][1], keep='last')
+        quiz_text = section_text(doc, later_sections, 'Questions')
+    quiz_list = extract_bullets(quiz_text) if quiz_text else []
+    
+    all_questions = [q.strip() for q in task_list + followup_list + quiz_list]
+    scorer = SentenceScorer(lesson_corpus)
+    scorer.score(all_questions)
+    
+    # Every bullet is classified in one batch; the rule that fired is kept for the type summary
+    classified = QUESTION_CLASSIFIER.classify_batch(all_questions)
+    task_types = classified[:len(task_list)]
+    followup_types = classified[len(task_list):len(task_list) + len(followup_list)]
+    quiz_types = classified[len(task_list) + len(followup_list):]
+    # (type, rule) of each question kept, per section
+    kept_types = {"tasks": [], "follow_ups": [], "quiz_questions": []}
+    
+    # Blanks for every key term are cut up front; each fill-in-the-blank question takes the next one
+    blanks = iter(BlankIndex(lesson_corpus).candidates(extract_key_words_for_fill_blank(lesson_corpus)))
+    
+    # Extract Starter Questions
+    tasks = []
+    if task_list:
+        for i, task in enumerate(task_list):
+            # Assign question type with variety: mix of text_answer, multiple_choice, fill_in_blank
+            # Use index to distribute evenly: 0,3,6 = text, 1,4,7 = mcq, 2,5,8 = fill_blank
+            if i % 3 == 0:
+                question_type = "text_answer"
+            elif i % 3 == 1:
+                question_type = "multiple_choice"
+            else:
+                question_type = "fill_in_blank"
+            
+            # Override with intelligent detection if it's clearly a specific type
+            detected_type = task_types[i][0]
+            if detected_type in ["drag_drop", "fill_in_blank"]:
+                question_type = detected_type
+            
+            task_data = {
+                "id": i + 1,
+                "type": "interactive",
+                "question": task,
+                "questionFormat": question_type,
+                "hint": "Think about the key points from this lesson."
+            }
+            
+            if question_type == "drag_drop":
+                task_data["items"] = extract_drag_drop_items(task, lesson_corpus)
+                task_data["correct_order"] = list(range(len(task_data["items"])))
+            elif question_type == "multiple_choice":
+                # Generate options for multiple choice
+                options, correct_idx = generate_multiple_choice_options(task, lesson_corpus, scorer)
+                task_data["options"] = options
+                task_data["correct"] = correct_idx
+            elif question_type == "fill_in_blank":
+                # Create fill-in-the-blank from lesson text
+                blank = next(blanks, None)
+                if blank:
+                    key_word, blank_text = blank
+                    task_data["question"] = blank_text
+                    task_data["correctAnswer"] = key_word
                 else:
-                    question_type = "fill_in_blank"
-                
-                # Override with intelligent detection if it's clearly a specific type
-                detected_type = determine_question_type(task)
-                if detected_type in ["drag_drop", "fill_in_blank"]:
-                    question_type = detected_type
-                
-                task_data = {
-                    "id": i + 1,
-                    "type": "interactive",
-                    "question": task,
-                    "questionFormat": question_type,
-                    "hint": "Think about the key points from this lesson."
-                }
-                
-                if question_type == "drag_drop":
-                    task_data["items"] = extract_drag_drop_items(task, lesson_text_parts)
-                    task_data["correct_order"] = list(range(len(task_data["items"])))
-                elif question_type == "multiple_choice":
-                    # Generate options for multiple choice
-                    options, correct_idx = generate_multiple_choice_options(task, ' '.join(lesson_text_parts))
-                    task_data["options"] = options
-                    task_data["correct"] = correct_idx
-                elif question_type == "fill_in_blank":
-                    # Create fill-in-the-blank from lesson text
-                    key_words = extract_key_words_for_fill_blank(' '.join(lesson_text_parts))
-                    if key_words:
-                        key_word = key_words[0]  # Use first key word
-                        blank_text = create_fill_in_blank_from_text(' '.join(lesson_text_parts), key_word)
-                        if blank_text:
-                            task_data["question"] = blank_text
-                            task_data["correctAnswer"] = key_word
-                        else:
-                            # Fallback to original question as text_answer
-                            task_data["questionFormat"] = "text_answer"
-                    else:
-                        task_data["questionFormat"] = "text_answer"
-                
-                tasks.append(task_data)
-        
-        # Extract Key Points and add to lesson text
-        key_points_text = extract_section_text(lesson_block, r'Key Points:', [r'Questions:', r'More to Learn:', r'Skill Check:'])
-        if key_points_text:
-            bullets = extract_bullets(key_points_text)
-            for bp in bullets:
-                if len(bp) > 10:
-                    lesson_text_parts.append(f"\n\n• {bp}")
+                    # Fallback to original question as text_answer
+                    task_data["questionFormat"] = "text_answer"
             
-            # Also extract structured key points
-            key_points_clean = clean_rtf(key_points_text)
-            if key_points_clean and len(key_points_clean) > 20:
-                lesson_text_parts.append(f"\n\nKey Points:\n{key_points_clean}")
-        
-        # Extract Questions (followUps) - first Questions section (after Key Points, before More to Learn)
-        follow_ups = []
-        # Find Questions section that comes after Key Points
-        questions_match = re.search(r'Questions:', lesson_block, re.IGNORECASE)
-        if questions_match:
-            # Get text from Questions to next major section (More to Learn or Skill Check)
-            q_start = questions_match.end()
-            # Find next major section marker
-            next_section = re.search(r'(More to Learn:|Skill Check:|\\fs51)', lesson_block[q_start:], re.IGNORECASE)
-            if next_section:
-                questions_text = lesson_block[q_start:q_start + next_section.start()]  # Keep raw for extract_bullets
+            tasks.append(task_data)
+            kept_types["tasks"].append(task_types[i])
+    
+    # Extract Questions (followUps) - the Questions section after Key Points, not Starter Questions
+    follow_ups = []
+    if followup_list:
+        for i, followup in enumerate(followup_list):
+            # Clean up the followup text
+            followup = followup.strip()
+            
+            # Skip if empty or just whitespace
+            if not followup or len(followup) < 5:
+                continue
+            
+            # Only skip obvious non-questions (section headers)
+            if followup.lower().startswith(('key points:', 'more to learn:', 'skill check:', 'questions:')):
+                continue
+            
+            # Skip if it's extremely long (likely content, not a question) - but be lenient
+            if len(followup) > 500:
+                continue
+            
+            # Assign question type with variety: mix of types
+            if i % 3 == 0:
+                question_type = "text_answer"
+            elif i % 3 == 1:
+                question_type = "multiple_choice"
             else:
-                questions_text = lesson_block[q_start:]  # Keep raw for extract_bullets
+                question_type = "fill_in_blank"
             
-            followup_list = extract_bullets(questions_text)
-            for i, followup in enumerate(followup_list):
-                # Clean up the followup text
-                followup = followup.strip()
-                
-                # Skip if empty or just whitespace
-                if not followup or len(followup) < 5:
-                    continue
-                
-                # Only skip obvious non-questions (section headers)
-                if followup.lower().startswith(('key points:', 'more to learn:', 'skill check:', 'questions:')):
-                    continue
-                
-                # Skip if it's extremely long (likely content, not a question) - but be lenient
-                if len(followup) > 500:
-                    continue
-                
-                # Assign question type with variety: mix of types
-                if i % 3 == 0:
-                    question_type = "text_answer"
-                elif i % 3 == 1:
-                    question_type = "multiple_choice"
+            # Override with intelligent detection if it's clearly a specific type
+            detected_type = followup_types[i][0]
+            if detected_type in ["drag_drop", "fill_in_blank"]:
+                question_type = detected_type
+            
+            followup_data = {
+                "id": i + 1,
+                "question": followup,
+                "questionFormat": question_type,
+                "adaptive": True,
+                "feedback": "Great thinking! Review the key points if you need help."
+            }
+            
+            if question_type == "drag_drop":
+                followup_data["items"] = extract_drag_drop_items(followup, lesson_corpus)
+                followup_data["correct_order"] = list(range(len(followup_data["items"])))
+            elif question_type == "multiple_choice":
+                # Generate options for multiple choice
+                options, correct_idx = generate_multiple_choice_options(followup, lesson_corpus, scorer)
+                followup_data["options"] = options
+                followup_data["correct"] = correct_idx
+            elif question_type == "fill_in_blank":
+                # Create fill-in-the-blank from lesson text
+                blank = next(blanks, None)
+                if blank:
+                    key_word, blank_text = blank
+                    followup_data["question"] = blank_text
+                    followup_data["correctAnswer"] = key_word
                 else:
-                    question_type = "fill_in_blank"
-                
-                # Override with intelligent detection if it's clearly a specific type
-                detected_type = determine_question_type(followup)
-                if detected_type in ["drag_drop", "fill_in_blank"]:
-                    question_type = detected_type
-                
-                followup_data = {
-                    "id": i + 1,
-                    "question": followup,
-                    "questionFormat": question_type,
-                    "adaptive": True,
-                    "feedback": "Great thinking! Review the key points if you need help."
-                }
-                
-                if question_type == "drag_drop":
-                    followup_data["items"] = extract_drag_drop_items(followup, lesson_text_parts)
-                    followup_data["correct_order"] = list(range(len(followup_data["items"])))
-                elif question_type == "multiple_choice":
-                    # Generate options for multiple choice
-                    options, correct_idx = generate_multiple_choice_options(followup, ' '.join(lesson_text_parts))
-                    followup_data["options"] = options
-                    followup_data["correct"] = correct_idx
-                elif question_type == "fill_in_blank":
-                    # Create fill-in-the-blank from lesson text
-                    key_words = extract_key_words_for_fill_blank(' '.join(lesson_text_parts))
-                    if key_words:
-                        key_word = key_words[i % len(key_words)] if key_words else None
-                        if key_word:
-                            blank_text = create_fill_in_blank_from_text(' '.join(lesson_text_parts), key_word)
-                            if blank_text:
-                                followup_data["question"] = blank_text
-                                followup_data["correctAnswer"] = key_word
-                            else:
-                                followup_data["questionFormat"] = "text_answer"
-                        else:
-                            followup_data["questionFormat"] = "text_answer"
-                    else:
-                        followup_data["questionFormat"] = "text_answer"
-                
-                follow_ups.append(followup_data)
-        
-        # Extract More to Learn
-        more_text = extract_section_text(lesson_block, r'More to Learn:', [r'Skill Check:', r'Questions:'])
-        if more_text:
-            more_clean = clean_rtf(more_text)
-            if more_clean and len(more_clean) > 20:
-                lesson_text_parts.append(f"\n\nMore to Learn:\n{more_clean}")
-        
-        # Extract Quiz Questions - use Skill Check section if available, otherwise last Questions section
-        quiz_questions = []
-        quiz_text = None
-        
-        # First try to find Skill Check section
-        skill_check_match = re.search(r'Skill Check:', lesson_block, re.IGNORECASE)
-        if skill_check_match:
-            sc_start = skill_check_match.end()
-            # Find next section marker or end of lesson
-            next_section = re.search(r'\\fs51\\fsmilli25995\s+\\cf2\s+\d+\s+\|', lesson_block[sc_start:])
-            if next_section:
-                quiz_text = lesson_block[sc_start:sc_start + next_section.start()]  # Keep raw for extract_bullets
+                    followup_data["questionFormat"] = "text_answer"
+            
+            follow_ups.append(followup_data)
+            kept_types["follow_ups"].append(followup_types[i])
+    
+    # Extract Quiz Questions - use Skill Check section if available, otherwise the Questions section
+    quiz_questions = []
+    if quiz_list:
+        for i, quiz_item in enumerate(quiz_list):
+            # Clean up the quiz item text
+            quiz_item = quiz_item.strip()
+            
+            # Skip if empty or just whitespace
+            if not quiz_item or len(quiz_item) < 5:
+                continue
+            
+            # Only skip obvious non-questions (section headers)
+            if quiz_item.lower().startswith(('key points:', 'more to learn:', 'skill check:', 'questions:')):
+                continue
+            
+            # Skip if it's extremely long (likely content, not a question) - but be lenient
+            if len(quiz_item) > 500:
+                continue
+            
+            # Assign question type with variety: mix of types
+            if i % 3 == 0:
+                question_type = "text_answer"
+            elif i % 3 == 1:
+                question_type = "multiple_choice"
             else:
-                quiz_text = lesson_block[sc_start:]  # Keep raw for extract_bullets
-        else:
-            # Fall back to last Questions section if Skill Check not found
-            all_questions_sections = list(re.finditer(r'Questions:', lesson_block, re.IGNORECASE))
-            if len(all_questions_sections) > 1:
-                # Use the last Questions section for quiz
-                last_q_start = all_questions_sections[-1].end()
-                last_q_end = len(lesson_block)
-                # Find next section marker
-                next_section = re.search(r'\\fs51\\fsmilli25995\s+\\cf2\s+\d+\s+\|', lesson_block[last_q_start:])
-                if next_section:
-                    last_q_end = last_q_start + next_section.start()
-                quiz_text = lesson_block[last_q_start:last_q_end]  # Keep raw for extract_bullets
-        
-        if quiz_text:
-            quiz_list = extract_bullets(quiz_text)
-            # Combine all lesson content for context
-            full_lesson_content = ' '.join(lesson_text_parts)
+                question_type = "fill_in_blank"
             
-            for i, quiz_item in enumerate(quiz_list):
-                # Clean up the quiz item text
-                quiz_item = quiz_item.strip()
-                
-                # Skip if empty or just whitespace
-                if not quiz_item or len(quiz_item) < 5:
-                    continue
-                
-                # Only skip obvious non-questions (section headers)
-                if quiz_item.lower().startswith(('key points:', 'more to learn:', 'skill check:', 'questions:')):
-                    continue
-                
-                # Skip if it's extremely long (likely content, not a question) - but be lenient
-                if len(quiz_item) > 500:
-                    continue
-                
-                # Assign question type with variety: mix of types
-                if i % 3 == 0:
-                    question_type = "text_answer"
-                elif i % 3 == 1:
-                    question_type = "multiple_choice"
-                else:
-                    question_type = "fill_in_blank"
-                
-                # Override with intelligent detection if it's clearly a specific type
-                detected_type = determine_question_type(quiz_item)
-                if detected_type in ["drag_drop", "fill_in_blank"]:
-                    question_type = detected_type
-                
-                # Generate explanation based on question and content
-                if question_type == "multiple_choice":
-                    options, correct_idx = generate_multiple_choice_options(quiz_item, full_lesson_content)
-                    correct_answer = options[correct_idx] if options else None
-                    explanation = generate_explanation(quiz_item, full_lesson_content, correct_answer)
-                else:
-                    explanation = generate_explanation(quiz_item, full_lesson_content)
-                
-                question_data = {
-                    "id": i + 1,
-                    "question": quiz_item,
-                    "type": question_type,
-                    "explanation": explanation
-                }
-                
-                if question_type == "multiple_choice":
-                    question_data["options"] = options
-                    question_data["correct"] = correct_idx
-                elif question_type == "drag_drop":
-                    question_data["items"] = extract_drag_drop_items(quiz_item, lesson_text_parts)
-                    question_data["correct_order"] = list(range(len(question_data["items"])))
-                elif question_type == "fill_in_blank":
-                    # Create fill-in-the-blank from lesson text
-                    key_words = extract_key_words_for_fill_blank(full_lesson_content)
-                    if key_words:
-                        key_word = key_words[i % len(key_words)] if key_words else None
-                        if key_word:
-                            blank_text = create_fill_in_blank_from_text(full_lesson_content, key_word)
-                            if blank_text:
-                                question_data["question"] = blank_text
-                                question_data["correctAnswer"] = key_word
-                            else:
-                                question_data["type"] = "text_answer"
-                        else:
-                            question_data["type"] = "text_answer"
-                    else:
-                        question_data["type"] = "text_answer"
-                
-                quiz_questions.append(question_data)
-        
-        # Combine text
-        main_text = "\n\n".join(lesson_text_parts) if lesson_text_parts else f"Content for {title}"
-        
-        # Ensure minimum content
-        if not tasks:
-            tasks = [{"id": 1, "type": "interactive", "question": "What did you learn from this lesson?", "questionFormat": "text_answer", "hint": "Think about the key points."}]
-        if not follow_ups:
-            follow_ups = [{"id": 1, "question": "Can you explain the main concept?", "questionFormat": "text_answer", "adaptive": True, "feedback": "Great thinking!"}]
-        if not quiz_questions:
-            # Generate a quiz question from the lesson content
-            fallback_question = f"What is the main takeaway from this lesson about {title}?"
-            options, correct_idx = generate_multiple_choice_options(fallback_question, main_text)
-            explanation = generate_explanation(fallback_question, main_text, options[correct_idx] if options else None)
-            quiz_questions = [{
-                "id": 1, 
-                "question": fallback_question,
-                "type": "multiple_choice",
-                "options": options,
-                "correct": correct_idx,
+            # Override with intelligent detection if it's clearly a specific type
+            detected_type = quiz_types[i][0]
+            if detected_type in ["drag_drop", "fill_in_blank"]:
+                question_type = detected_type
+            
+            # Generate explanation based on question and content
+            if question_type == "multiple_choice":
+                options, correct_idx = generate_multiple_choice_options(quiz_item, lesson_corpus, scorer)
+                correct_answer = options[correct_idx] if options else None
+                explanation = generate_explanation(quiz_item, lesson_corpus, scorer, correct_answer)
+            else:
+                explanation = generate_explanation(quiz_item, lesson_corpus, scorer)
+            
+            question_data = {
+                "id": i + 1,
+                "question": quiz_item,
+                "type": question_type,
                 "explanation": explanation
-            }]
-        
-        lessons.append({
-            "path_type": path_type,
-            "order_index": lesson_num,
-            "title": title,
-            "objective": objective,
-            "main_text": main_text,
-            "tasks": tasks,
-            "follow_ups": follow_ups,
-            "quiz_questions": quiz_questions
-        })
-        
-        print(f"  ✓ Extracted: {len(tasks)} tasks, {len(follow_ups)} follow-ups, {len(quiz_questions)} quiz questions")
-        print(f"  ✓ Text length: {len(main_text)} characters")
-    
-    return lessons
-
-def generate_sql(lessons):
-    """Generate SQL INSERT statements"""
-    sql_lines = [
-        "-- ============================================",
-        "-- COMPLETE SQL - ALL 46 LESSONS",
-        "-- 28 Pre-Med Lessons + 18 Med Lessons",
-        "-- Generated from RTF files with COMPLETE content",
-        "-- Includes actual questions, descriptions, and quiz questions",
-        "-- ============================================\n",
-        "-- IMPORTANT: Before running this, first:\n",
-        "-- 1. Run CLEAN_DUPLICATES_SIMPLE.sql to remove duplicates\n",
-        "-- 2. Or delete all existing lessons: DELETE FROM lessons;\n",
-        "-- 3. Then run this file to insert all 46 lessons\n\n"
-    ]
+            }
+            
+            if question_type == "multiple_choice":
+                question_data["options"] = options
+                question_data["correct"] = correct_idx
+            elif question_type == "drag_drop":
+                question_data["items"] = extract_drag_drop_items(quiz_item, lesson_corpus)
+                question_data["correct_order"] = list(range(len(question_data["items"])))
+            elif question_type == "fill_in_blank":
+                # Create fill-in-the-blank from lesson text
+                blank = next(blanks, None)
+                if blank:
+                    key_word, blank_text = blank
+                    question_data["question"] = blank_text
+                    question_data["correctAnswer"] = key_word
+                else:
+                    question_data["type"] = "text_answer"
+            
+            quiz_questions.append(question_data)
+            kept_types["quiz_questions"].append(quiz_types[i])
+    
+    # Combine text
+    main_text = "\n\n".join(lesson_text_parts) if lesson_text_parts else f"Content for {title}"
     
+    # Ensure minimum content
+    if not tasks:
+        tasks = [{"id": 1, "type": "interactive", "question": "What did you learn from this lesson?", "questionFormat": "text_answer", "hint": "Think about the key points."}]
+        kept_types["tasks"] = [("text_answer", FALLBACK_RULE)]
+    if not follow_ups:
+        follow_ups = [{"id": 1, "question": "Can you explain the main concept?", "questionFormat": "text_answer", "adaptive": True, "feedback": "Great thinking!"}]
+        kept_types["follow_ups"] = [("text_answer", FALLBACK_RULE)]
+    if not quiz_questions:
+        # Generate a quiz question from the lesson content
+        fallback_question = f"What is the main takeaway from this lesson about {title}?"
+        options, correct_idx = generate_multiple_choice_options(fallback_question, lesson_corpus, scorer)
+        explanation = generate_explanation(fallback_question, lesson_corpus, scorer, options[correct_idx] if options else None)
+        quiz_questions = [{
+            "id": 1, 
+            "question": fallback_question,
+            "type": "multiple_choice",
+            "options": options,
+            "correct": correct_idx,
+            "explanation": explanation
+        }]
+        kept_types["quiz_questions"] = [("multiple_choice", FALLBACK_RULE)]
+    
+    lesson = {
+        "path_type": path_type,
+        "order_index": lesson_num,
+        "title": title,
+        "objective": objective,
+        "main_text": main_text,
+        "tasks": tasks,
+        "follow_ups": follow_ups,
+        "quiz_questions": quiz_questions,
+        # In iter_questions order, one entry per question
+        "question_types": kept_types["tasks"] + kept_types["follow_ups"] + kept_types["quiz_questions"],
+        "answer_phrases": answer_phrases(lesson_corpus)
+    }
+    
+    if image_dir is not None:
+        # Each image names the section it sits in, so it can be placed with that section's text
+        name_prefix = f"{path_type.lower()}-lesson{lesson_num}-image"
+        saved = save_pictures(lesson_block, doc.pictures, image_dir, name_prefix)
+        lesson["images"] = [
+            {"src": posixpath.join(image_prefix, name), "format": picture["format"],
+             "section": picture_section(sections, picture["raw_start"])}
+            for name, picture in saved
+        ]
+    
+    return lesson
+
+def scan_answer_phrases(lesson_block, path_type, lesson_num, seed=None, image_dir=None, image_prefix=DEFAULT_IMAGE_PREFIX):
+    """The answer_phrases parse_lesson gives a lesson, without generating its questions
+    
+    Takes parse_lesson's arguments, so the same tasks can be scanned first.
+    """
+    sections = split_sections(lesson_block, lesson_num)
+    lesson_text_parts = extract_lesson_text(lesson_block, CleanDocument(lesson_block), sections, lesson_num)
+    return {"path_type": path_type, "order_index": lesson_num,
+            "answer_phrases": answer_phrases(LessonCorpus(' '.join(lesson_text_parts)))}
+
+def phrase_category(phrase):
+    """Lexicon category of the first term in phrase, or None"""
+    terms = LEXICON.terms_in(phrase.lower())
+    return LEXICON.category_of(terms[0]) if terms else None
+
+def add_distractor_phrases(index, lesson):
+    """Offer a lesson's option-sized sentences to other lessons as wrong options"""
+    group = (lesson["path_type"], lesson["order_index"])
+    for phrase in lesson["answer_phrases"]:
+        index.add(phrase, phrase_category(phrase), group)
+
+def iter_questions(lesson):
+    """(section key, question dict) for every question of a lesson"""
+    for key in ("tasks", "follow_ups", "quiz_questions"):
+        for question in lesson[key]:
+            yield key, question
+
+def iter_multiple_choice(lesson):
+    """Every multiple choice question dict of a lesson"""
+    for key, question in iter_questions(lesson):
+        question_format = question["type"] if key == "quiz_questions" else question["questionFormat"]
+        if question_format == "multiple_choice":
+            yield question
+
+def apply_distractors(lessons, index):
+    """Swap the wrong options of every multiple choice question for corpus phrases
+    
+    Each question gets the phrases from other lessons most similar to it and its
+    answer, same-category phrases first. The correct option keeps its place, and
+    template options are kept where the pool runs short. Returns the number of
+    options replaced.
+    """
+    replaced = 0
     for lesson in lessons:
-        # Determine competence tag
-        title_lower = lesson["title"].lower()
-        if "first aid" in title_lower or "emergency" in title_lower:
-            competence = "first aid"
-        elif "safe" in title_lower or "health" in title_lower or "prevent" in title_lower or "hygiene" in title_lower:
-            competence = "safe"
-        else:
-            competence = "anatomy"
-        
-        content = {
-            "text": lesson["main_text"],
-            "tasks": lesson["tasks"],
-            "followUps": lesson["follow_ups"],
-            "quiz": {"questions": lesson["quiz_questions"]}
-        }
-        
-        content_json = json.dumps(content, ensure_ascii=False).replace("'", "''")
-        title_esc = lesson["title"].replace("'", "''")
-        obj_esc = lesson["objective"].replace("'", "''")
-        
-        sql = f"""INSERT INTO lessons (path_type, order_index, title, objective, estimated_duration, competence_tag, content) VALUES
-('{lesson["path_type"]}', {lesson["order_index"]}, '{title_esc}', 
-'{obj_esc}',
-20,
-'{competence}',
-'{content_json}'::jsonb);"""
+        group = (lesson["path_type"], lesson["order_index"])
+        for question in iter_multiple_choice(lesson):
+            options = question["options"]
+            correct_answer = options[question["correct"]]
+            wrong = index.nearest(f"{question['question']} {correct_answer}", k=len(options) - 1,
+                                  category=phrase_category(correct_answer), exclude=[correct_answer], skip_group=group)
+            slots = [i for i in range(len(options)) if i != question["correct"]]
+            for slot, phrase in zip(slots, wrong):
+                options[slot] = phrase
+                replaced += 1
+    return replaced
+
+def build_distractor_index(tasks, jobs=1, cache=None):
+    """DistractorIndex of the answer phrases of every lesson in tasks, scanned in corpus order
+    
+    A first pass over the corpus, much cheaper than parsing it, so the parse
+    can then stream lessons straight through LessonEnricher.
+    """
+    index = DistractorIndex()
+    for lesson in map_lessons(tasks, jobs, cache, scan_answer_phrases):
+        add_distractor_phrases(index, lesson)
+    return index.build()
+
+class LessonEnricher:
+    """Corpus-wide question work, done on lessons as they stream past in corpus order
+    
+    Each lesson's questions are checked against those of earlier lessons for
+    near-duplicates, which are recorded and, with merge, dropped from the later
+    lesson (never emptying a section). Wrong options of multiple choice
+    questions are drawn from every other lesson in the corpus: from
+    distractors, an index of every lesson's answer phrases built beforehand
+    (see build_distractor_index), so each lesson passes straight on, or
+    without one from the lessons themselves, which are then held until the
+    last one has been indexed. With a BuildManifest, a lesson unchanged since the previous build keeps
+    the options it had, so editing one lesson does not redraw the others.
+    """
+    
+    def __init__(self, threshold=DEFAULT_THRESHOLD, merge=False, manifest=None, distractors=None):
+        self.merge = merge
+        self.manifest = manifest
+        self.duplicates = NearDuplicateIndex(threshold)
+        self.prebuilt = distractors is not None
+        self.distractors = distractors if self.prebuilt else DistractorIndex()
+        # Per indexed question: lesson ordinal, report record and union-find parent
+        self._lesson_of = []
+        self._records = []
+        self._parent = []
+        self.dropped = 0
+        self.replaced = 0
+        self.kept = 0
+    
+    def __call__(self, lessons):
+        held = []
+        for ordinal, lesson in enumerate(lessons):
+            self.check_duplicates(lesson, ordinal)
+            pinned = None if self.manifest is None else self.manifest.pinned(lesson)
+            if self.prebuilt:
+                yield self.add_distractors(lesson, pinned)
+                continue
+            add_distractor_phrases(self.distractors, lesson)
+            held.append((lesson, pinned))
+        for lesson, pinned in held:
+            yield self.add_distractors(lesson, pinned)
+    
+    def _find(self, i):
+        while self._parent[i] != i:
+            self._parent[i] = self._parent[self._parent[i]]
+            i = self._parent[i]
+        return i
+    
+    def check_duplicates(self, lesson, ordinal):
+        entries = list(iter_questions(lesson))
+        matches = self.duplicates.add([question["question"] for _, question in entries])
+        drop = []
+        for (key, question), found in zip(entries, matches):
+            question_id = len(self._parent)
+            self._parent.append(question_id)
+            self._lesson_of.append(ordinal)
+            self._records.append({"path_type": lesson["path_type"], "order_index": lesson["order_index"],
+                                  "section": key, "id": question["id"], "question": question["question"]})
+            for match in found:
+                root, other = sorted((self._find(question_id), self._find(match)))
+                self._parent[other] = root
+            # Groups are rooted at their earliest question, so a root in an earlier lesson makes this a copy
+            if self.merge and self._lesson_of[self._find(question_id)] != ordinal:
+                drop.append((key, question))
         
-        sql_lines.append(sql)
-        sql_lines.append("")
+        changed = set()
+        dropped = set()
+        for key, question in drop:
+            if len(lesson[key]) > 1:
+                lesson[key] = [kept for kept in lesson[key] if kept is not question]
+                changed.add(key)
+                dropped.add(id(question))
+                self.dropped += 1
+        for key in changed:
+            for number, question in enumerate(lesson[key], 1):
+                question["id"] = number
+        if dropped:
+            # question_types lines up with iter_questions, so it loses the same entries
+            lesson["question_types"] = [qtype for (_, question), qtype in zip(entries, lesson["question_types"])
+                                        if id(question) not in dropped]
+    
+    def add_distractors(self, lesson, pinned=None):
+        questions = list(iter_multiple_choice(lesson))
+        if pinned is not None and len(pinned) == len(questions):
+            for question, options in zip(questions, pinned):
+                question["options"] = options
+            self.kept += 1
+        else:
+            self.replaced += apply_distractors([lesson], self.distractors)
+        if self.manifest is not None:
+            self.manifest.pin(lesson, [question["options"] for question in questions])
+        return lesson
+    
+    def duplicate_groups(self):
+        """Near-duplicate groups spanning more than one lesson, as report records in corpus order"""
+        groups = {}
+        for question_id in range(len(self._parent)):
+            groups.setdefault(self._find(question_id), []).append(question_id)
+        return [[self._records[i] for i in members] for members in groups.values()
+                if len({self._lesson_of[i] for i in members}) > 1]
+
+def write_duplicate_report(groups, path):
+    """Write the groups from LessonEnricher.duplicate_groups as JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(groups, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+def assigned_question_formats(lessons):
+    """Counter of the formats the generated questions ended up with"""
+    formats = Counter()
+    for lesson in lessons:
+        formats.update(task["questionFormat"] for task in lesson["tasks"])
+        formats.update(followup["questionFormat"] for followup in lesson["follow_ups"])
+        formats.update(question["type"] for question in lesson["quiz_questions"])
+    return formats
+
+def print_lesson_summary(lesson):
+    """Print what was extracted from one lesson"""
+    print(f"\nProcessing {lesson['path_type']} Lesson {lesson['order_index']}...")
+    print(f"  Title: {lesson['title']}")
+    print(f"  Objective: {lesson['objective'][:80]}...")
+    print(f"  ✓ Extracted: {len(lesson['tasks'])} tasks, {len(lesson['follow_ups'])} follow-ups, {len(lesson['quiz_questions'])} quiz questions")
+    print(f"  ✓ Text length: {len(lesson['main_text'])} characters")
+
+def iter_lesson_tasks(filepath, path_type, num_lessons=None, seed=None, image_dir=None, image_prefix=DEFAULT_IMAGE_PREFIX):
+    """Yield the parse_lesson arguments for every lesson in one RTF file
+    
+    Lessons are streamed from the file one at a time, so parsing can start
+    before the whole file has been read. num_lessons only caps and checks the count.
+    """
+    found = set()
+    for lesson_num, lesson_block in iter_lessons(filepath):
+        if num_lessons is not None and lesson_num > num_lessons:
+            continue
+        found.add(lesson_num)
+        yield lesson_block, path_type, lesson_num, seed, image_dir, image_prefix
+    
+    if num_lessons is not None:
+        for lesson_num in range(1, num_lessons + 1):
+            if lesson_num not in found:
+                print(f"  ⚠ Warning: {path_type} Lesson {lesson_num} title not found")
+
+# Sources whose edits can change what parse_lesson returns; they stamp the lesson cache
+PARSER_SOURCES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('comprehensive_parser.py', 'fill_blanks.py', 'lesson_corpus.py', 'lesson_scoring.py',
+                 'medical_lexicon.py', 'question_classifier.py', 'rtf_lessons.py', 'rtf_tokenizer.py')
+] + [LEXICON_PATH]
+
+def images_saved(lesson, image_dir):
+    """Whether every image of lesson is still in image_dir"""
+    return all(os.path.exists(os.path.join(image_dir, posixpath.basename(image["src"]))) for image in lesson.get("images", ()))
+
+def _reseed_worker():
+    """Pool initializer, so no two workers draw the same unseeded shuffles"""
+    random.seed(os.urandom(16))
+
+def map_lessons(tasks, jobs=1, cache=None, parse=parse_lesson):
+    """Run parse, parse_lesson by default, over tasks and yield the results in task order
+    
+    With jobs > 1 the lessons are parsed in a process pool. Only about two
+    blocks per worker are in flight at once, so memory stays bounded however
+    many files the tasks come from. With a LessonCache, results whose parse,
+    block and arguments were seen before are loaded instead, and new ones are stored.
+    """
+    def lookup(task):
+        if cache is None:
+            return None, None
+        key = cache.key(*task, parse.__name__)
+        image_dir = task[4]
+        return key, cache.get(key, None if image_dir is None else lambda lesson: images_saved(lesson, image_dir))
+    
+    def store(key, lesson):
+        if key is not None:
+            cache.put(key, lesson)
+        return lesson
     
-    return '\n'.join(sql_lines)
+    if jobs <= 1:
+        for task in tasks:
+            key, lesson = lookup(task)
+            yield lesson if lesson is not None else store(key, parse(*task))
+        return
+    
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_reseed_worker) as executor:
+        pending = deque()
+        for task in tasks:
+            key, lesson = lookup(task)
+            if lesson is not None:
+                pending.append((None, lesson))
+            else:
+                pending.append((key, executor.submit(parse, *task)))
+            if len(pending) >= jobs * 2:
+                key, result = pending.popleft()
+                yield store(key, result.result()) if isinstance(result, Future) else result
+        while pending:
+            key, result = pending.popleft()
+            yield store(key, result.result()) if isinstance(result, Future) else result
+
+# Files parsed when no --corpus is given
+DEFAULT_CORPUS = [('pre-med.rtf', 'Pre-Med'), ('med.rtf', 'Med')]
+
+def path_type_from_filename(filepath):
+    """Derive a path_type from an RTF file name, e.g. pre-med.rtf -> Pre-Med"""
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    return '-'.join(part.capitalize() for part in stem.split('-'))
+
+def load_corpus(corpus_path):
+    """Read a corpus as a list of (filepath, path_type)
+    
+    corpus_path is either a directory, whose .rtf files are taken in name order
+    with path_type derived from the file name, or a JSON manifest mapping file
+    paths (relative to the manifest) to path_type, taken in manifest order.
+    """
+    if os.path.isdir(corpus_path):
+        filenames = sorted(name for name in os.listdir(corpus_path) if name.lower().endswith('.rtf'))
+        return [(os.path.join(corpus_path, name), path_type_from_filename(name)) for name in filenames]
+    
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(corpus_path)
+    return [(os.path.join(base_dir, filepath), path_type) for filepath, path_type in manifest.items()]
+
+# Seed of the random question choices when --seed is not given; a fixed one makes
+# rebuilds of unchanged lessons identical, so deltas and the cache only see real edits
+DEFAULT_SEED = '0'
+
+# Where the SQL is written
+SQL_FILE = 'COMPLETE_ALL_46_LESSONS.sql'
+
+# Fingerprints of the last build's lessons, which --delta compares against
+MANIFEST_FILE = 'COMPLETE_ALL_46_LESSONS.manifest.json'
+
+# Comment block at the top of the SQL file
+SQL_HEADER = [
+    "-- ============================================",
+    "-- COMPLETE SQL - ALL 46 LESSONS",
+    "-- 28 Pre-Med Lessons + 18 Med Lessons",
+    "-- Generated from RTF files with COMPLETE content",
+    "-- Includes actual questions, descriptions, and quiz questions",
+    "-- ============================================\n",
+    "-- IMPORTANT: Before running this, first:\n",
+    "-- 1. Run CLEAN_DUPLICATES_SIMPLE.sql to remove duplicates\n",
+    "-- 2. Or delete all existing lessons: DELETE FROM lessons;\n",
+    "-- 3. Then run this file to insert all 46 lessons\n\n"
+]
+
+def lesson_row(lesson):
+    """Column values of one lesson, in LESSON_COLUMNS order"""
+    # Determine competence tag
+    title_lower = lesson["title"].lower()
+    if "first aid" in title_lower or "emergency" in title_lower:
+        competence = "first aid"
+    elif "safe" in title_lower or "health" in title_lower or "prevent" in title_lower or "hygiene" in title_lower:
+        competence = "safe"
+    else:
+        competence = "anatomy"
+    
+    content = {
+        "text": lesson["main_text"],
+        "tasks": lesson["tasks"],
+        "followUps": lesson["follow_ups"],
+        "quiz": {"questions": lesson["quiz_questions"]}
+    }
+    if lesson.get("images"):
+        content["images"] = lesson["images"]
+    
+    return (lesson["path_type"], lesson["order_index"], lesson["title"], lesson["objective"], 20, competence,
+            Jsonb(json.dumps(content, ensure_ascii=False)))
+
+# Comment block at the top of a --delta file
+DELTA_HEADER = [
+    "-- ============================================",
+    "-- LESSON CHANGES SINCE THE PREVIOUS BUILD",
+    "-- Upserts new and changed lessons by (path_type, order_index)",
+    "-- and deletes lessons that are no longer in the RTF files",
+    "-- ============================================\n",
+    "-- Run it once, against the database the previous build was loaded into.",
+    "-- Needs a unique constraint on lessons (path_type, order_index).\n",
+]
+
+def row_sql(row):
+    """The INSERT statement for one lesson row, in the layout the variety scripts read back"""
+    path_type, order_index, title, objective, duration, competence, content = map(sql_value, row)
+    return f"""INSERT INTO lessons ({', '.join(LESSON_COLUMNS)}) VALUES
+({path_type}, {order_index}, {title}, 
+{objective},
+{duration},
+{competence},
+{content});"""
 
 # Main execution
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Parse the lesson RTF files into SQL")
+    arg_parser.add_argument('--jobs', type=int, default=1, help="parse lessons in N worker processes")
+    arg_parser.add_argument('--seed', default=DEFAULT_SEED,
+                            help=f"seed for the random question choices; change it for a different draw (default {DEFAULT_SEED})")
+    arg_parser.add_argument('--corpus', help="directory of .rtf files or JSON manifest {file: path_type}")
+    arg_parser.add_argument('--extract-images', metavar='DIR', help="write embedded \\pict images to DIR (e.g. public)")
+    arg_parser.add_argument('--image-prefix', default=DEFAULT_IMAGE_PREFIX, metavar='URL',
+                            help=f"path or URL the --extract-images DIR is served under, for image src (default {DEFAULT_IMAGE_PREFIX})")
+    arg_parser.add_argument('--type-summary', metavar='FILE', help="write a JSON summary of question types and the rules behind them")
+    arg_parser.add_argument('--dedup-threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help=f"similarity at which questions in different lessons count as near-duplicates (default {DEFAULT_THRESHOLD})")
+    arg_parser.add_argument('--merge-duplicates', action='store_true', help="drop near-duplicate questions from later lessons")
+    arg_parser.add_argument('--duplicates-report', metavar='FILE', help="write the near-duplicate question groups as JSON")
+    arg_parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='insert',
+                            help="insert (default), dollar-quoted INSERTs, multi-row VALUES batches, or COPY in text or CSV format")
+    arg_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f"rows per INSERT in the values format, and per transaction when loading (default {DEFAULT_BATCH_SIZE})")
+    arg_parser.add_argument('--manifest', default=MANIFEST_FILE, metavar='FILE',
+                            help=f"where builds writing --delta or loading a database record what they published (default {MANIFEST_FILE})")
+    arg_parser.add_argument('--delta', metavar='FILE',
+                            help="also write SQL that upserts only the lessons changed since the build in --manifest and deletes removed ones")
+    arg_parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                            help=f"keep parsed lessons here and reuse them while their RTF block is unchanged (default {DEFAULT_CACHE_DIR})")
+    arg_parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE >> 20, metavar='MB',
+                            help=f"evict the least recently used cached lessons beyond this size (default {DEFAULT_CACHE_SIZE >> 20})")
+    arg_parser.add_argument('--no-cache', action='store_true', help="parse every lesson, without reading or writing the cache")
+    arg_parser.add_argument('--database-url', metavar='URL',
+                            help="also upsert the lessons changed since the build in --manifest straight into this Postgres database "
+                                 "and delete removed ones (needs psycopg and psycopg_pool)")
+    arg_parser.add_argument('--db-connections', type=int, default=4, help="most connections to open when loading (default 4)")
+    args = arg_parser.parse_args()
+    if args.delta and args.output_format in ('copy', 'csv'):
+        arg_parser.error(f"--delta needs an INSERT format, not {args.output_format}")
+
     print("=" * 60)
     print("COMPREHENSIVE RTF PARSER")
     print("Extracting complete lesson content with proper quiz questions")
     print("=" * 60)
 
-    print("\nParsing Pre-Med lessons...")
-    premed_lessons = parse_rtf_file('pre-med.rtf', 'Pre-Med', 28)
+    corpus = load_corpus(args.corpus) if args.corpus else DEFAULT_CORPUS
+    for filepath, path_type in corpus:
+        print(f"\nParsing {path_type} lessons from {filepath}...")
 
-    print("\nParsing Med lessons...")
-    med_lessons = parse_rtf_file('med.rtf', 'Med', 18)
+    def corpus_tasks():
+        return itertools.chain.from_iterable(
+            iter_lesson_tasks(filepath, path_type, seed=args.seed, image_dir=args.extract_images, image_prefix=args.image_prefix)
+            for filepath, path_type in corpus
+        )
 
-    all_lessons = premed_lessons + med_lessons
+    cache = None
+    if not args.no_cache:
+        cache = LessonCache(args.cache_dir, source_stamp(PARSER_SOURCES), args.cache_size << 20)
+
+    # Distractors come from the whole corpus; its answer phrases are scanned first, so the parse can stream
+    distractors = build_distractor_index(corpus_tasks(), args.jobs, cache)
+    manifest = BuildManifest.load(args.manifest)
+    enricher = LessonEnricher(args.dedup_threshold, merge=args.merge_duplicates, manifest=manifest,
+                              distractors=distractors)
+    classified = []
+    formats = Counter()
+
+    def report(lessons):
+        """Last stage: print each lesson and keep the counts for --type-summary"""
+        for lesson in lessons:
+            print_lesson_summary(lesson)
+            classified.extend(lesson["question_types"])
+            formats.update(assigned_question_formats([lesson]))
+            yield lesson
+
+    loader = None
+    if args.database_url:
+        from lesson_loader import LessonLoader
+        loader = LessonLoader(args.database_url, lesson_row, args.batch_size, args.db_connections, manifest)
+
+    # Lessons stream through the stages one at a time; the SQL is written as they arrive
+    with ExitStack() as outputs:
+        writer = outputs.enter_context(SqlWriter(SQL_FILE, SQL_HEADER, args.output_format, args.batch_size))
+        stages = [
+            ("parse", lambda blocks: map_lessons(blocks, args.jobs, cache)),
+            ("enrich", enricher),
+            ("serialize", lambda lessons: writer.write_lessons(lessons, manifest.record(lesson_row), row_sql)),
+        ]
+        if args.delta:
+            delta_writer = outputs.enter_context(
+                SqlWriter(args.delta, DELTA_HEADER, args.output_format, args.batch_size, conflict=CONFLICT_COLUMNS)
+            )
+            stages.append(("delta", lambda lessons: manifest.delta(lessons, delta_writer, lesson_row)))
+        if loader is not None:
+            stages.append(("load", loader))
+        stages.append(("report", report))
+        pipeline = Pipeline(corpus_tasks(), stages)
+        lesson_count = pipeline.run()
+    # The manifest stands for what was last published, so a plain build leaves it alone
+    if args.delta or loader is not None:
+        manifest.write(args.manifest)
 
     print(f"\n{'=' * 60}")
-    print(f"Total lessons extracted: {len(all_lessons)}")
+    print(f"Total lessons extracted: {lesson_count}")
     print(f"{'=' * 60}")
+    for stats in pipeline.stats:
+        print(f"  {stats}")
+    if cache is not None:
+        print(f"✓ Lesson cache: {cache}")
 
-    sql_output = generate_sql(all_lessons)
-
-    with open('COMPLETE_ALL_46_LESSONS.sql', 'w', encoding='utf-8') as f:
-        f.write(sql_output)
+    duplicates = enricher.duplicate_groups()
+    print(f"✓ Near-duplicate questions: {len(duplicates)} groups, {sum(len(group) for group in duplicates)} questions")
+    for group in duplicates[:5]:
+        print(f"  {len(group)}x \"{group[0]['question'][:70]}\"")
+    if args.duplicates_report:
+        write_duplicate_report(duplicates, args.duplicates_report)
+        print(f"✓ Duplicate report: {args.duplicates_report}")
+    if args.merge_duplicates:
+        print(f"✓ Dropped {enricher.dropped} duplicate questions from later lessons")
+    print(f"✓ Distractors: {enricher.replaced} wrong options from a pool of {len(enricher.distractors)} phrases, "
+          f"{enricher.kept} lessons kept their published options")
 
-    print("\n✓ SQL file generated: COMPLETE_ALL_46_LESSONS.sql")
-    insert_count = len([l for l in sql_output.split('\n') if l.strip().startswith('INSERT')])
-    print(f"✓ Total INSERT statements: {insert_count}")
+    print(f"\n✓ SQL file generated: {SQL_FILE} ({writer.bytes_written} bytes)")
+    print(f"✓ Total SQL statements: {writer.statements} ({writer.rows} lessons, {args.output_format} format)")
+    if args.delta or loader is not None:
+        print(f"✓ Build manifest: {args.manifest}")
+    if args.delta:
+        print(f"✓ Delta SQL generated: {args.delta} ({manifest}, {delta_writer.bytes_written} bytes)")
+    if loader is not None:
+        print(f"✓ Loaded into Postgres: {loader}")
 
+    if args.type_summary:
+        summary = summarize_question_types(classified, formats)
+        write_type_summary(summary, args.type_summary)
+        print(f"✓ Question type summary ({summary['total']} questions): {args.type_summary}")
+        for qtype, entry in summary['types'].items():
+            print(f"  {qtype}: {entry['count']}")
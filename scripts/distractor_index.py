@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Corpus-wide pool of wrong answers for multiple choice questions
+Candidate phrases from every lesson are embedded once with the hashing trick;
+a lookup is one matrix-vector product and a sort, however many candidates
+the corpus holds
+"""
+
+import zlib
+
+import numpy as np
+
+from lesson_corpus import WORD_PATTERN
+from lesson_scoring import QUESTION_STOP_WORDS
+
+# Width of the hashed vectors; collisions only blur similarity a little
+HASH_DIM = 512
+
+def phrase_features(text):
+    """Content words of text and their adjacent pairs"""
+    words = [word for word in WORD_PATTERN.findall(text.lower())
+             if len(word) > 2 and word not in QUESTION_STOP_WORDS]
+    return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+def hashed_vector(text, dim=HASH_DIM):
+    """Unit-length signed feature-hashing vector of text
+
+    crc32 rather than hash(), so vectors match across processes and runs.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in phrase_features(text):
+        h = zlib.crc32(feature.encode('utf-8'))
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def _top_ids(ids, similarity, m):
+    """The ids of the m highest similarities, highest first, ties in id order
+
+    Phrases tied with the m-th are all kept, so the order matches a stable
+    sort of every id.
+    """
+    scores = similarity[ids]
+    if m < len(ids):
+        cutoff = np.partition(scores, len(ids) - m)[len(ids) - m]
+        keep = scores >= cutoff
+        ids, scores = ids[keep], scores[keep]
+    return ids[np.argsort(-scores, kind='stable')]
+
+class DistractorIndex:
+    """Candidate answer phrases, each with a lexicon category and the lesson it came from
+
+    Phrases are embedded from their own text, or from context text such as the
+    sentences a term occurs in. A phrase added again keeps its first category
+    and lesson and gains the new context. Phrases can be added between lookups;
+    only new or extended phrases are embedded again.
+    """
+
+    def __init__(self, dim=HASH_DIM):
+        self.dim = dim
+        self.phrases = []
+        self.categories = []
+        self.groups = []
+        self._contexts = []
+        self._ids = {}
+        # Categories and lessons as integer codes, for vectorized masks
+        self._codes = {}
+        self._category_codes = []
+        self._group_codes = []
+        self._dirty = set()
+        # Embedded rows and their category and lesson codes, in buffers grown by doubling
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._category_array = np.zeros(0, dtype=np.int64)
+        self._group_array = np.zeros(0, dtype=np.int64)
+        self._coded = 0
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def _code(self, value):
+        return self._codes.setdefault(value, len(self._codes))
+
+    def add(self, phrase, category=None, group=None, context=None):
+        key = phrase.lower()
+        phrase_id = self._ids.get(key)
+        if phrase_id is None:
+            phrase_id = self._ids[key] = len(self.phrases)
+            self.phrases.append(phrase)
+            self.categories.append(category)
+            self.groups.append(group)
+            self._category_codes.append(self._code(category))
+            self._group_codes.append(self._code(('group', group)))
+            self._contexts.append([context or phrase])
+        else:
+            self._contexts[phrase_id].append(context or phrase)
+        self._dirty.add(phrase_id)
+
+    @property
+    def vectors(self):
+        """Phrase x HASH_DIM matrix of unit vectors"""
+        return self.build()._vectors[:len(self.phrases)]
+
+    def build(self):
+        """Embed the phrases added or extended since the last build; called by nearest"""
+        if self._dirty:
+            if len(self.phrases) > len(self._vectors):
+                size = max(len(self.phrases), 2 * len(self._vectors))
+                grown = np.zeros((size, self.dim), dtype=np.float32)
+                grown[:len(self._vectors)] = self._vectors
+                self._vectors = grown
+                for name in ('_category_array', '_group_array'):
+                    codes = np.zeros(size, dtype=np.int64)
+                    codes[:len(getattr(self, name))] = getattr(self, name)
+                    setattr(self, name, codes)
+            # Codes never change once a phrase is added, so only new phrases are copied in
+            self._category_array[self._coded:len(self.phrases)] = self._category_codes[self._coded:]
+            self._group_array[self._coded:len(self.phrases)] = self._group_codes[self._coded:]
+            self._coded = len(self.phrases)
+            for phrase_id in self._dirty:
+                self._vectors[phrase_id] = hashed_vector(' '.join(self._contexts[phrase_id]), self.dim)
+            self._dirty.clear()
+        return self
+
+    def nearest(self, query, k=3, category=None, exclude=(), skip_group=None, skip=None):
+        """Up to k phrases most cosine-similar to query, most similar first
+
+        query is embedded from its text, or taken from the index when it is an
+        indexed phrase. Phrases in category come first, topped up from the rest.
+        Phrases matching exclude (case-insensitive), from skip_group, or for
+        which skip(phrase) is true are never returned.
+        """
+        if not self.phrases:
+            return []
+        vectors = self.vectors
+        count = len(self.phrases)
+        query_id = self._ids.get(query.lower())
+        query_vector = vectors[query_id] if query_id is not None else hashed_vector(query, self.dim)
+        similarity = vectors @ query_vector
+
+        allowed = np.ones(count, dtype=bool)
+        if skip_group is not None:
+            allowed &= self._group_array[:count] != self._codes.get(('group', skip_group), -1)
+        excluded = {phrase.lower() for phrase in exclude} | {query.lower()}
+        for key in excluded:
+            if key in self._ids:
+                allowed[self._ids[key]] = False
+
+        tiers = [allowed]
+        if category is not None:
+            in_category = self._category_array[:count] == self._codes.get(category, -1)
+            tiers = [allowed & in_category, allowed & ~in_category]
+
+        found = []
+        for tier in tiers:
+            ids = np.flatnonzero(tier)
+            # Only the top of the tier is sorted, widened if skip turns down too many
+            wanted = k - len(found)
+            while True:
+                top = _top_ids(ids, similarity, wanted)
+                taken = []
+                for phrase_id in top:
+                    phrase = self.phrases[phrase_id]
+                    if skip is not None and skip(phrase):
+                        continue
+                    taken.append(phrase)
+                    if len(found) + len(taken) >= k:
+                        return found + taken
+                if len(top) == len(ids):
+                    break
+                wanted *= 2
+            found += taken
+        return found
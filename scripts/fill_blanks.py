@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Fill-in-the-blank questions cut from one lesson's sentences
+Every word of the lesson is indexed once by sentence and offset, so blanks for
+all key terms come out of one pass instead of a regex scan per term
+"""
+
+import re
+
+# What replaces the answer in a blanked sentence
+BLANK = '______'
+
+# Sentences outside these lengths make poor blanks
+MIN_SENTENCE_LENGTH = 20
+MAX_SENTENCE_LENGTH = 200
+
+# Words as \b sees them, so an indexed occurrence is always a whole-word match
+TOKEN_PATTERN = re.compile(r'\w+')
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+class BlankIndex:
+    """Word -> (sentence id, start, end) of each occurrence in one lesson"""
+
+    def __init__(self, lesson_corpus):
+        self.corpus = lesson_corpus
+        self.positions = {}
+        for sent_id, sent in enumerate(lesson_corpus.sentences):
+            for match in TOKEN_PATTERN.finditer(sent):
+                self.positions.setdefault(match.group().lower(), []).append((sent_id, match.start(), match.end()))
+
+    def occurrences(self, term):
+        """Sentence id -> (start, end) of each whole-word, case-insensitive occurrence of term
+
+        Terms of several words are looked up by their first word and checked
+        against the sentence text from there.
+        """
+        term = term.lower()
+        words = TOKEN_PATTERN.findall(term)
+        found = {}
+        if not words:
+            return found
+        sentences = self.corpus.sentences
+        for sent_id, start, end in self.positions.get(words[0], ()):
+            if words != [term]:
+                end = start + len(term)
+                sent = sentences[sent_id]
+                if sent[start:end].lower() != term or (end < len(sent) and _is_word_char(sent[end])):
+                    continue
+            found.setdefault(sent_id, []).append((start, end))
+        return found
+
+    def blank(self, sent_id, spans):
+        """Sentence sent_id with every span replaced by BLANK"""
+        sent = self.corpus.sentences[sent_id]
+        pieces = []
+        last = 0
+        for start, end in spans:
+            pieces.append(sent[last:start])
+            pieces.append(BLANK)
+            last = end
+        pieces.append(sent[last:])
+        return ''.join(pieces).strip()
+
+    def candidates(self, terms, min_len=MIN_SENTENCE_LENGTH, max_len=MAX_SENTENCE_LENGTH):
+        """(answer, blanked sentence) for terms, in the order given
+
+        Each term is blanked in the first sentence of suitable length that no
+        earlier term has taken, so no sentence is used twice and no answer
+        repeats. Terms with no such sentence are left out. max_len=None sets no
+        upper bound.
+        """
+        blanks = []
+        used = set()
+        seen = set()
+        for term in terms:
+            key = term.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            for sent_id, spans in self.occurrences(key).items():
+                length = len(self.corpus.stripped[sent_id])
+                if sent_id in used or length <= min_len or (max_len is not None and length >= max_len):
+                    continue
+                used.add(sent_id)
+                blanks.append((term, self.blank(sent_id, spans)))
+                break
+        return blanks
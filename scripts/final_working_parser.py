@@ -7,47 +7,22 @@ Uses simpler approach to handle RTF complexity
 import re
 import json
 
-def clean_rtf(text):
-    """Clean RTF formatting"""
-    if not text:
-        return ""
-    
-    # Handle Unicode escapes
-    text = re.sub(r'\\uc0\\u(\d+)', lambda m: chr(int(m.group(1))), text)
-    
-    # Handle special characters
-    char_map = {
-        '92': "'", '96': '-', '93': '"', '94': '"',
-        '8217': "'", '8216': "'", '8220': '"', '8221': '"',
-        '8211': '–', '8212': '—', '8230': '...', '8594': '→'
-    }
-    text = re.sub(r"\\'(\d+)", lambda m: char_map.get(m.group(1), ''), text)
-    
-    # Remove RTF codes
-    text = re.sub(r'\\[a-z]+\d*\s*', ' ', text)
-    text = re.sub(r'\{|\}', '', text)
-    text = re.sub(r'\\', ' ', text)  # Replace remaining backslashes
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'\n\s*\n+', '\n\n', text)
-    return text.strip()
+from medical_lexicon import load_lexicon
+from rtf_lessons import RTF_ENCODING, TITLE_PATTERN, Span, build_lesson_index, find_intro, section_text, split_sections
+from rtf_tokenizer import clean_rtf
+from sql_writer import DEFAULT_BATCH_SIZE, LESSON_COLUMNS, Jsonb, sql_value, write_sql
 
-def extract_section_text(content, start_marker, end_markers):
-    """Extract text between start_marker and any end_marker"""
-    start_match = re.search(start_marker, content, re.IGNORECASE)
-    if not start_match:
-        return None
-    
-    start_pos = start_match.end()
-    
-    # Find earliest end marker
-    end_pos = len(content)
-    for end_marker in end_markers:
-        end_match = re.search(end_marker, content[start_pos:], re.IGNORECASE)
-        if end_match and end_match.start() < end_pos:
-            end_pos = end_match.start()
-    
-    section_text = content[start_pos:start_pos + end_pos]
-    return clean_rtf(section_text)
+# This parser's drag-and-drop terms and question cues from the lexicon file, compiled once
+LEXICON = load_lexicon(parser='final_working_parser')
+
+# Learning objective, up to the next heading
+OBJECTIVE_PATTERN = re.compile(r'After this lesson.*?(?=\\fs51|$)', re.DOTALL | re.IGNORECASE)
+
+# Title heading of the next lesson
+NEXT_LESSON_PATTERN = re.compile(r'\\fs51\\fsmilli25995\s+\\cf2\s+\d+\s+\|')
+
+# RTF line breaks inside the main lesson text
+LINE_BREAK_PATTERN = re.compile(r'\\\s*\n')
 
 def extract_bullets(text):
     """Extract bullet points"""
@@ -63,16 +38,14 @@ def extract_bullets(text):
 
 def determine_question_type(question_text):
     """Determine the best question type based on question content"""
-    question_lower = question_text.lower()
+    cued_types = LEXICON.question_types(question_text.lower())
     
     # Drag and drop indicators
-    drag_drop_keywords = ['order', 'sequence', 'arrange', 'put in order', 'match', 'connect', 'pair', 'label']
-    if any(keyword in question_lower for keyword in drag_drop_keywords):
+    if "drag_drop" in cued_types:
         return "drag_drop"
     
     # Text answer indicators (explain, describe, list, name, etc.)
-    text_answer_keywords = ['explain', 'describe', 'list', 'name', 'what is', 'how does', 'why', 'in your own words', 'give an example']
-    if any(keyword in question_lower for keyword in text_answer_keywords):
+    if "text_answer" in cued_types:
         return "text_answer"
     
     # Default to multiple choice
@@ -88,11 +61,9 @@ def extract_drag_drop_items(question_text, lesson_text_parts):
     matches = re.findall(pattern, question_text)
     
     # Also look for common medical/anatomy terms
-    medical_terms = ['heart', 'lungs', 'brain', 'stomach', 'kidneys', 'liver', 'blood', 'oxygen', 'carbon dioxide', 
-                     'arteries', 'veins', 'nerves', 'muscles', 'bones', 'cells', 'tissues', 'organs']
-    
-    for term in medical_terms:
-        if term in question_text.lower():
+    question_lower = question_text.lower()
+    for term in LEXICON.category_terms('drag_drop_items'):
+        if term in question_lower:
             items.append(term.capitalize())
     
     # If we found matches, use them
@@ -105,92 +76,88 @@ def extract_drag_drop_items(question_text, lesson_text_parts):
     
     return items[:6]  # Max 6 items for drag and drop
 
-def parse_rtf_file(filepath, path_type, num_lessons):
+def parse_rtf_file(filepath, path_type, num_lessons=None):
     """Parse RTF file and extract all lessons"""
-    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+    with open(filepath, 'r', encoding=RTF_ENCODING) as f:
         content = f.read()
     
     lessons = []
     
-    for lesson_num in range(1, num_lessons + 1):
+    # One scan finds every lesson heading; num_lessons only caps and checks the count
+    lesson_index = build_lesson_index(content)
+    if num_lessons is not None:
+        for lesson_num in range(1, num_lessons + 1):
+            if lesson_num not in lesson_index:
+                print(f"  ⚠ Warning: Lesson {lesson_num} title not found")
+        lesson_index = {n: span for n, span in lesson_index.items() if n <= num_lessons}
+    
+    for lesson_num, (start_pos, end_pos) in lesson_index.items():
         print(f"\nProcessing {path_type} Lesson {lesson_num}...")
         
-        # Find lesson title - handle multi-line titles
-        title_pattern1 = rf'\\fs51\\fsmilli25995\s+\\cf2\s+{lesson_num}\s+\|\s+(.*?)(?=\\fs21|\\fs51)'
-        title_pattern2 = rf'\\fs51\\fsmilli25995\s+{lesson_num}\s+\|\s+(.*?)(?=\\fs21|\\fs51)'
-        title_match = re.search(title_pattern1, content, re.DOTALL) or re.search(title_pattern2, content, re.DOTALL)
-        
-        if not title_match:
-            print(f"  ⚠ Warning: Lesson {lesson_num} title not found")
-            continue
-        
-        title = clean_rtf(title_match.group(1))
+        title_match = TITLE_PATTERN.match(content, start_pos, end_pos)
+        title = clean_rtf(title_match.group(1)) if title_match else f"Lesson {lesson_num}"
         print(f"  Title: {title}")
         
-        start_pos = title_match.start()
-        
-        # Find next lesson
-        next_pattern1 = rf'\\fs51\\fsmilli25995\s+\\cf2\s+{lesson_num + 1}\s+\|'
-        next_pattern2 = rf'\\fs51\\fsmilli25995\s+{lesson_num + 1}\s+\|'
-        next_match = re.search(next_pattern1, content[start_pos:]) or re.search(next_pattern2, content[start_pos:])
-        end_pos = start_pos + next_match.start() if next_match else len(content)
-        
-        lesson_block = content[start_pos:end_pos]
+        # The lesson and its sections are spans over content; text is only copied to be cleaned
+        lesson_block = Span(content, start_pos, end_pos)
         
         # Extract objective
-        obj_match = re.search(r'After this lesson.*?(?=\\fs51|$)', lesson_block, re.DOTALL | re.IGNORECASE)
+        obj_match = lesson_block.search(OBJECTIVE_PATTERN)
         objective = clean_rtf(obj_match.group(0)) if obj_match else f"Learn about {title}"
         if len(objective) > 500:
             objective = objective[:497] + "..."
         print(f"  Objective: {objective[:80]}...")
         
         # Find Content section
-        content_marker = rf'\\fs51\\fsmilli25995\s+{lesson_num}\s+\|\s+Content'
-        content_match = re.search(content_marker, lesson_block, re.IGNORECASE)
+        content_marker = re.compile(rf'\\fs51\\fsmilli25995\s+{lesson_num}\s+\|\s+Content', re.IGNORECASE)
+        content_match = lesson_block.search(content_marker)
         if not content_match:
             print(f"  ⚠ Warning: Content section not found")
             continue
         
-        content_section = lesson_block[content_match.end():]
+        content_section = lesson_block.narrow(start=content_match.end())
         # Stop at next lesson marker
-        next_lesson_match = re.search(r'\\fs51\\fsmilli25995\s+\\cf2\s+\d+\s+\|', content_section)
+        next_lesson_match = content_section.search(NEXT_LESSON_PATTERN)
         if next_lesson_match:
-            content_section = content_section[:next_lesson_match.start()]
+            content_section = content_section.narrow(end=next_lesson_match.start())
+        
+        # Every section header in the Content section, found in one scan
+        sections = split_sections(content_section)
         
         # Extract main lesson text - get everything from "Lesson X:" until "Starter Questions"
         lesson_text_parts = []
         # First, try to get the intro paragraph before "Lesson X:" (in the objective section)
-        intro_match = re.search(rf'In this lesson.*?(?=After this lesson|Lesson {lesson_num}:|Starter Questions:)', lesson_block, re.DOTALL | re.IGNORECASE)
-        if intro_match:
-            intro_text = clean_rtf(intro_match.group(0))
+        intro = find_intro(lesson_block, lesson_num)
+        if intro:
+            intro_text = clean_rtf(content[intro[0]:intro[1]])
             if intro_text and len(intro_text) > 20:
                 lesson_text_parts.append(intro_text)
         
         # Then get the "Lesson X: ..." main content from the Content section
         # Use a more flexible pattern that handles RTF formatting
-        lesson_text_pattern = rf'Lesson {lesson_num}:(.*?)(?=Starter Questions:|Key Points:|Questions:|More to Learn:|Skill Check:|\\fs51)'
-        lesson_text_match = re.search(lesson_text_pattern, content_section, re.DOTALL | re.IGNORECASE)
+        lesson_text_pattern = re.compile(rf'Lesson {lesson_num}:(.*?)(?=Starter Questions:|Key Points:|Questions:|More to Learn:|Skill Check:|\\fs51)', re.DOTALL | re.IGNORECASE)
+        lesson_text_match = content_section.search(lesson_text_pattern)
         if lesson_text_match:
             lesson_text_raw = lesson_text_match.group(1)
             # Replace backslash line breaks before cleaning
-            lesson_text_raw = re.sub(r'\\\s*\n', ' ', lesson_text_raw)
+            lesson_text_raw = LINE_BREAK_PATTERN.sub(' ', lesson_text_raw)
             lesson_text = clean_rtf(lesson_text_raw)
             if lesson_text and len(lesson_text) > 20:
                 lesson_text_parts.append(lesson_text)
         else:
             # Try alternative pattern without the colon
-            alt_pattern = rf'Lesson {lesson_num}[^:]*:(.*?)(?=Starter Questions:|Key Points:)'
-            alt_match = re.search(alt_pattern, content_section, re.DOTALL | re.IGNORECASE)
+            alt_pattern = re.compile(rf'Lesson {lesson_num}[^:]*:(.*?)(?=Starter Questions:|Key Points:)', re.DOTALL | re.IGNORECASE)
+            alt_match = content_section.search(alt_pattern)
             if alt_match:
                 lesson_text_raw = alt_match.group(1)
-                lesson_text_raw = re.sub(r'\\\s*\n', ' ', lesson_text_raw)
+                lesson_text_raw = LINE_BREAK_PATTERN.sub(' ', lesson_text_raw)
                 lesson_text = clean_rtf(lesson_text_raw)
                 if lesson_text and len(lesson_text) > 20:
                     lesson_text_parts.append(lesson_text)
         
         # Extract Starter Questions
         tasks = []
-        starter_text = extract_section_text(content_section, r'Starter Questions:', [r'Key Points:', r'Questions:', r'More to Learn:', r'Skill Check:'])
+        starter_text = clean_rtf(section_text(content, sections, 'Starter Questions'))
         if starter_text:
             task_list = extract_bullets(starter_text)
             for i, task in enumerate(task_list):
@@ -208,7 +175,7 @@ def parse_rtf_file(filepath, path_type, num_lessons):
                 tasks.append(task_data)
         
         # Extract Key Points
-        key_points_text = extract_section_text(content_section, r'Key Points:', [r'Questions:', r'More to Learn:', r'Skill Check:'])
+        key_points_text = clean_rtf(section_text(content, sections, 'Key Points'))
         if key_points_text:
             # Extract bold titles with content
             bold_pattern = r'([A-Z][A-Za-z\s]+):\s*([^A-Z]+?)(?=[A-Z][A-Za-z\s]+:|$)'
@@ -227,7 +194,7 @@ def parse_rtf_file(filepath, path_type, num_lessons):
         
         # Extract Questions (followUps)
         follow_ups = []
-        questions_text = extract_section_text(content_section, r'Questions:', [r'More to Learn:', r'Skill Check:'])
+        questions_text = clean_rtf(section_text(content, sections, 'Questions'))
         if questions_text:
             followup_list = extract_bullets(questions_text)
             for i, followup in enumerate(followup_list):
@@ -245,7 +212,7 @@ def parse_rtf_file(filepath, path_type, num_lessons):
                 follow_ups.append(followup_data)
         
         # Extract More to Learn
-        more_text = extract_section_text(content_section, r'More to Learn:', [r'Skill Check:', r'Questions:'])
+        more_text = clean_rtf(section_text(content, sections, 'More to Learn'))
         if more_text:
             more_list = extract_bullets(more_text)
             for more_item in more_list:
@@ -254,7 +221,7 @@ def parse_rtf_file(filepath, path_type, num_lessons):
         
         # Extract Skill Check (quiz)
         quiz_questions = []
-        skill_text = extract_section_text(content_section, r'Skill Check:', [])
+        skill_text = clean_rtf(section_text(content, sections, 'Skill Check'))
         if skill_text:
             skill_list = extract_bullets(skill_text)
             for i, skill_item in enumerate(skill_list):
@@ -310,48 +277,56 @@ def parse_rtf_file(filepath, path_type, num_lessons):
     
     return lessons
 
-def generate_sql(lessons):
-    """Generate SQL INSERT statements"""
-    sql_lines = [
-        "-- ============================================",
-        "-- COMPLETE SQL - ALL 46 LESSONS",
-        "-- 28 Pre-Med Lessons + 18 Med Lessons",
-        "-- Generated from RTF files with FULL content",
-        "-- ============================================\n"
-    ]
+# Where the SQL is written
+SQL_FILE = 'COMPLETE_ALL_46_LESSONS.sql'
+
+# Comment block at the top of the SQL file
+SQL_HEADER = [
+    "-- ============================================",
+    "-- COMPLETE SQL - ALL 46 LESSONS",
+    "-- 28 Pre-Med Lessons + 18 Med Lessons",
+    "-- Generated from RTF files with FULL content",
+    "-- ============================================\n"
+]
+
+def lesson_row(lesson):
+    """Column values of one lesson, in LESSON_COLUMNS order"""
+    # Determine competence tag
+    title_lower = lesson["title"].lower()
+    if "first aid" in title_lower or "emergency" in title_lower:
+        competence = "first aid"
+    elif "safe" in title_lower or "health" in title_lower or "prevent" in title_lower or "hygiene" in title_lower:
+        competence = "safe"
+    else:
+        competence = "anatomy"
     
-    for lesson in lessons:
-        # Determine competence tag
-        title_lower = lesson["title"].lower()
-        if "first aid" in title_lower or "emergency" in title_lower:
-            competence = "first aid"
-        elif "safe" in title_lower or "health" in title_lower or "prevent" in title_lower or "hygiene" in title_lower:
-            competence = "safe"
-        else:
-            competence = "anatomy"
-        
-        content = {
-            "text": lesson["main_text"],
-            "tasks": lesson["tasks"],
-            "followUps": lesson["follow_ups"],
-            "quiz": {"questions": lesson["quiz_questions"]}
-        }
-        
-        content_json = json.dumps(content, ensure_ascii=False).replace("'", "''")
-        title_esc = lesson["title"].replace("'", "''")
-        obj_esc = lesson["objective"].replace("'", "''")
-        
-        sql = f"""INSERT INTO lessons (path_type, order_index, title, objective, estimated_duration, competence_tag, content) VALUES
-('{lesson["path_type"]}', {lesson["order_index"]}, '{title_esc}', 
-'{obj_esc}',
-20,
-'{competence}',
-'{content_json}'::jsonb);"""
-        
-        sql_lines.append(sql)
-        sql_lines.append("")
+    content = {
+        "text": lesson["main_text"],
+        "tasks": lesson["tasks"],
+        "followUps": lesson["follow_ups"],
+        "quiz": {"questions": lesson["quiz_questions"]}
+    }
     
-    return '\n'.join(sql_lines)
+    return (lesson["path_type"], lesson["order_index"], lesson["title"], lesson["objective"], 20, competence,
+            Jsonb(json.dumps(content, ensure_ascii=False)))
+
+def row_sql(row):
+    """The INSERT statement for one lesson row, in the layout the variety scripts read back"""
+    path_type, order_index, title, objective, duration, competence, content = map(sql_value, row)
+    return f"""INSERT INTO lessons ({', '.join(LESSON_COLUMNS)}) VALUES
+({path_type}, {order_index}, {title}, 
+{objective},
+{duration},
+{competence},
+{content});"""
+
+def lesson_sql(lesson):
+    """The INSERT statement for one lesson"""
+    return row_sql(lesson_row(lesson))
+
+def generate_sql(lessons, path=SQL_FILE, output_format='insert', batch_size=DEFAULT_BATCH_SIZE):
+    """Write the SQL for lessons to path in output_format; (statements, bytes) written"""
+    return write_sql(lessons, path, lesson_row, row_sql, SQL_HEADER, output_format, batch_size)
 
 # Main execution
 print("=" * 60)
@@ -359,10 +334,10 @@ print("FINAL WORKING RTF PARSER")
 print("=" * 60)
 
 print("\nParsing Pre-Med lessons...")
-premed_lessons = parse_rtf_file('pre-med.rtf', 'Pre-Med', 28)
+premed_lessons = parse_rtf_file('pre-med.rtf', 'Pre-Med')
 
 print("\nParsing Med lessons...")
-med_lessons = parse_rtf_file('med.rtf', 'Med', 18)
+med_lessons = parse_rtf_file('med.rtf', 'Med')
 
 all_lessons = premed_lessons + med_lessons
 
@@ -370,12 +345,7 @@ print(f"\n{'=' * 60}")
 print(f"Total lessons extracted: {len(all_lessons)}")
 print(f"{'=' * 60}")
 
-sql_output = generate_sql(all_lessons)
+insert_count, byte_count = generate_sql(all_lessons)
 
-with open('COMPLETE_ALL_46_LESSONS.sql', 'w', encoding='utf-8') as f:
-    f.write(sql_output)
-
-print("\n✓ SQL file generated: COMPLETE_ALL_46_LESSONS.sql")
-insert_count = len([l for l in sql_output.split('\n') if l.strip().startswith('INSERT')])
+print(f"\n✓ SQL file generated: {SQL_FILE} ({byte_count} bytes)")
 print(f"✓ Total INSERT statements: {insert_count}")
-
@@ -12,7 +12,10 @@ For Fill in the blank: Extracts key words from text and creates blanks
 import json
 import re
 import random
-from collections import Counter
+
+from fill_blanks import BlankIndex
+from keyword_profile import KeywordProfile, build_term_distractors, same_stem
+from medical_lexicon import load_lexicon
 
 # Common filler words to avoid
 FILLER_WORDS = {
@@ -23,79 +26,26 @@ FILLER_WORDS = {
     'very', 'more', 'most', 'some', 'any', 'all', 'each', 'every', 'many', 'much', 'few', 'little'
 }
 
-# Medical/biology key words that are good for fill-in-the-blank
-KEY_WORD_PATTERNS = [
-    r'\b(heart|brain|lungs|stomach|kidney|liver|muscle|bone|cell|tissue|organ|system)\b',
-    r'\b(doctor|nurse|patient|hospital|clinic|medicine|treatment|diagnosis|surgery)\b',
-    r'\b(blood|oxygen|carbon|dioxide|nutrient|waste|energy|protein|vitamin|mineral)\b',
-    r'\b(circulatory|respiratory|digestive|nervous|skeletal|muscular|immune|endocrine)\b',
-    r'\b(artery|vein|capillary|nerve|neuron|synapse|hormone|enzyme|antibody|antigen)\b'
-]
+# Lexicon categories whose terms are good for fill-in-the-blank
+KEY_WORD_CATEGORIES = ('anatomy', 'care', 'substance', 'body_system', 'signalling')
 
-def extract_key_words(text):
-    """Extract important medical/biology terms from text"""
-    key_words = []
-    text_lower = text.lower()
-    
-    for pattern in KEY_WORD_PATTERNS:
-        matches = re.findall(pattern, text_lower, re.IGNORECASE)
-        key_words.extend(matches)
-    
-    # Also look for capitalized words (likely proper nouns or important terms)
-    capitalized = re.findall(r'\b[A-Z][a-z]+\b', text)
-    key_words.extend([w.lower() for w in capitalized if w.lower() not in FILLER_WORDS])
-    
-    # Count frequency and return most common
-    word_counts = Counter(key_words)
-    # Return words that appear at least once and are not fillers
-    important_words = [word for word, count in word_counts.items() 
-                      if word.lower() not in FILLER_WORDS and len(word) > 3]
-    
-    return list(set(important_words))  # Remove duplicates
-
-def create_fill_in_blank(text, key_word):
-    """Create a fill-in-the-blank question by removing a key word"""
-    # Find sentences containing the key word
-    sentences = re.split(r'[.!?]+', text)
-    target_sentence = None
-    
-    for sentence in sentences:
-        if re.search(r'\b' + re.escape(key_word) + r'\b', sentence, re.IGNORECASE):
-            target_sentence = sentence.strip()
-            break
-    
-    if not target_sentence:
-        return None
-    
-    # Replace the key word with a blank
-    blank_sentence = re.sub(
-        r'\b' + re.escape(key_word) + r'\b',
-        '______',
-        target_sentence,
-        flags=re.IGNORECASE
-    )
-    
-    return blank_sentence.strip()
+LEXICON = load_lexicon()
 
-def generate_mcq_options(correct_answer, lesson_text, num_options=4):
+def generate_mcq_options(correct_answer, profile, distractors, num_options=4):
     """Generate plausible multiple choice options"""
     options = [correct_answer]
     
-    # Extract other key terms from the lesson
-    key_words = extract_key_words(lesson_text)
-    
-    # Remove the correct answer from key words
-    key_words = [w for w in key_words if w.lower() != correct_answer.lower()]
+    # The key terms from any lesson most like the answer, same-category terms first,
+    # leaving out other forms of the answer itself
+    wrong_options = distractors.nearest(correct_answer, k=num_options - 1,
+                                        category=profile.categories.get(correct_answer.lower()),
+                                        skip=lambda term: same_stem(term, correct_answer))
     
-    # Generate wrong options
-    wrong_options = []
-    if len(key_words) >= num_options - 1:
-        # Use related terms
-        wrong_options = random.sample(key_words, min(num_options - 1, len(key_words)))
-    else:
-        # Use generic wrong answers
+    if len(wrong_options) < num_options - 1:
+        # Top up with generic wrong answers
         generic_wrong = ['incorrect', 'wrong', 'false', 'none', 'unknown', 'other']
-        wrong_options = generic_wrong[:num_options - 1]
+        generic_wrong = [w for w in generic_wrong if w not in wrong_options and w != correct_answer.lower()]
+        wrong_options += generic_wrong[:num_options - 1 - len(wrong_options)]
     
     options.extend(wrong_options)
     
@@ -118,11 +68,22 @@ def assign_question_format(question_text, lesson_text, question_index, total_que
     else:
         return 'fill_in_blank'
 
-def process_lesson(lesson_data):
-    """Process a lesson and add question variation"""
+def build_keyword_profile(lesson_text):
+    """Key terms of a lesson, computed once and shared by all of its questions"""
+    return KeywordProfile(lesson_text, LEXICON, FILLER_WORDS, KEY_WORD_CATEGORIES)
+
+def process_lesson(lesson_data, profile, distractors):
+    """Process a lesson and add question variation
+    
+    profile is the lesson's keyword profile; distractors is the corpus-wide pool
+    of key terms that wrong options come from.
+    """
     content = lesson_data.get('content', {})
     lesson_text = content.get('text', '')
     
+    # Blanks for every key term, at most one per sentence; each is used once
+    blanks = BlankIndex(profile.corpus).candidates(profile.ranked, min_len=0, max_len=None)
+    
     # Process tasks
     tasks = content.get('tasks', [])
     for i, task in enumerate(tasks):
@@ -135,10 +96,10 @@ def process_lesson(lesson_data):
         
         if new_format == 'multiple_choice':
             # Extract a key term from the question or text
-            key_words = extract_key_words(question_text + ' ' + lesson_text)
+            key_words = profile.ranked_with(question_text)
             if key_words:
                 correct_answer = random.choice(key_words[:5])  # Pick from top 5
-                options, correct_index = generate_mcq_options(correct_answer, lesson_text)
+                options, correct_index = generate_mcq_options(correct_answer, profile, distractors)
                 task['options'] = options
                 task['correct'] = correct_index
             else:
@@ -146,18 +107,13 @@ def process_lesson(lesson_data):
                 task['questionFormat'] = 'text_answer'
         
         elif new_format == 'fill_in_blank':
-            # Find a key word to remove
-            key_words = extract_key_words(lesson_text)
-            if key_words:
-                key_word = random.choice(key_words[:10])  # Pick from top 10
-                blank_text = create_fill_in_blank(lesson_text, key_word)
-                if blank_text:
-                    task['question'] = blank_text
-                    task['correct_answer'] = key_word
-                else:
-                    # Fallback to text_answer
-                    task['questionFormat'] = 'text_answer'
+            # Take a blank for one of the top 10 key words
+            if blanks:
+                key_word, blank_text = blanks.pop(random.randrange(min(len(blanks), 10)))
+                task['question'] = blank_text
+                task['correct_answer'] = key_word
             else:
+                # Fallback to text_answer
                 task['questionFormat'] = 'text_answer'
     
     # Process follow-ups (same logic)
@@ -170,25 +126,20 @@ def process_lesson(lesson_data):
         follow_up['questionFormat'] = new_format
         
         if new_format == 'multiple_choice':
-            key_words = extract_key_words(question_text + ' ' + lesson_text)
+            key_words = profile.ranked_with(question_text)
             if key_words:
                 correct_answer = random.choice(key_words[:5])
-                options, correct_index = generate_mcq_options(correct_answer, lesson_text)
+                options, correct_index = generate_mcq_options(correct_answer, profile, distractors)
                 follow_up['options'] = options
                 follow_up['correct'] = correct_index
             else:
                 follow_up['questionFormat'] = 'text_answer'
         
         elif new_format == 'fill_in_blank':
-            key_words = extract_key_words(lesson_text)
-            if key_words:
-                key_word = random.choice(key_words[:10])
-                blank_text = create_fill_in_blank(lesson_text, key_word)
-                if blank_text:
-                    follow_up['question'] = blank_text
-                    follow_up['correct_answer'] = key_word
-                else:
-                    follow_up['questionFormat'] = 'text_answer'
+            if blanks:
+                key_word, blank_text = blanks.pop(random.randrange(min(len(blanks), 10)))
+                follow_up['question'] = blank_text
+                follow_up['correct_answer'] = key_word
             else:
                 follow_up['questionFormat'] = 'text_answer'
     
@@ -203,25 +154,20 @@ def process_lesson(lesson_data):
         question['type'] = new_format
         
         if new_format == 'multiple_choice':
-            key_words = extract_key_words(question_text + ' ' + lesson_text)
+            key_words = profile.ranked_with(question_text)
             if key_words:
                 correct_answer = random.choice(key_words[:5])
-                options, correct_index = generate_mcq_options(correct_answer, lesson_text)
+                options, correct_index = generate_mcq_options(correct_answer, profile, distractors)
                 question['options'] = options
                 question['correct'] = correct_index
             else:
                 question['type'] = 'text_answer'
         
         elif new_format == 'fill_in_blank':
-            key_words = extract_key_words(lesson_text)
-            if key_words:
-                key_word = random.choice(key_words[:10])
-                blank_text = create_fill_in_blank(lesson_text, key_word)
-                if blank_text:
-                    question['question'] = blank_text
-                    question['correct_answer'] = key_word
-                else:
-                    question['type'] = 'text_answer'
+            if blanks:
+                key_word, blank_text = blanks.pop(random.randrange(min(len(blanks), 10)))
+                question['question'] = blank_text
+                question['correct_answer'] = key_word
             else:
                 question['type'] = 'text_answer'
     
@@ -244,19 +190,28 @@ def main():
     
     print(f"Found {len(matches)} lessons to process")
     
-    # Process each lesson
-    updated_lessons = []
+    # Read every lesson first, so wrong options can come from the key terms of all of them
+    lessons = []
     for i, json_str in enumerate(matches, 1):
         try:
             json_clean = json_str.replace("''", "'")
             lesson_data = json.loads(json_clean)
-            
+            lessons.append((i, lesson_data, build_keyword_profile(lesson_data.get('text', ''))))
+        except Exception as e:
+            print(f"Error reading lesson {i}: {e}")
+    
+    distractors = build_term_distractors(profile for _, _, profile in lessons)
+    
+    # Process each lesson
+    updated_lessons = []
+    for i, lesson_data, profile in lessons:
+        try:
             # Extract the full INSERT line to get metadata
             insert_pattern = r"\(('[^']+',\s*\d+,\s*'[^']+'.*?)'({.*?})'::jsonb\)"
             full_match = re.search(insert_pattern, content, re.DOTALL)
             
             # Process the lesson
-            processed = process_lesson({'content': lesson_data})
+            processed = process_lesson({'content': lesson_data}, profile, distractors)
             updated_lessons.append((i, processed['content']))
             
             print(f"Processed lesson {i}")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Keyword profile of one lesson, computed once and shared by every question
+Holds term frequencies, candidates ranked by frequency and the category each
+term was matched under, plus the lesson's sentence index for blanking
+"""
+
+import re
+from collections import Counter
+
+from distractor_index import DistractorIndex
+from lesson_corpus import LessonCorpus
+
+# Capitalized words are likely proper nouns or important terms
+CAPITALIZED_PATTERN = re.compile(r'\b[A-Z][a-z]+\b')
+
+# Terms shorter than this make poor answers and blanks
+MIN_TERM_LENGTH = 4
+
+# Terms agreeing in this many leading letters are taken as forms of one word ("bone", "bones")
+STEM_LENGTH = 4
+
+def same_stem(term, other):
+    return term[:STEM_LENGTH].lower() == other[:STEM_LENGTH].lower()
+
+class KeywordProfile:
+    """Key terms of one lesson's text
+
+    Terms come from the lexicon, limited to categories when given; a term keeps
+    its first such category. Capitalized words that are not filler are counted
+    too, with no category.
+    """
+
+    def __init__(self, text, lexicon, filler_words, categories=None):
+        self.text = text or ''
+        self.corpus = LessonCorpus(self.text)
+        self._lexicon = lexicon
+        self._term_filter = categories
+        self._filler_words = filler_words
+        self.categories = {}
+        self.counts = self._count_terms(self.text)
+        self.ranked = self._rank(self.counts)
+
+    def _count_terms(self, text):
+        counts = Counter()
+        for term in self._lexicon.terms_in(text.lower(), self._term_filter):
+            counts[term] += 1
+            self.categories.setdefault(term, self._lexicon.category_of(term, self._term_filter))
+        for word in CAPITALIZED_PATTERN.findall(text):
+            counts[word.lower()] += 1
+        return counts
+
+    def _rank(self, counts):
+        """Terms by frequency, most common first; ties keep first-counted order"""
+        return [term for term, _ in counts.most_common()
+                if term not in self._filler_words and len(term) >= MIN_TERM_LENGTH]
+
+    def ranked_with(self, extra_text):
+        """Ranked candidates for the lesson text plus extra_text, such as a question"""
+        if not extra_text:
+            return self.ranked
+        return self._rank(self.counts + self._count_terms(extra_text))
+
+def build_term_distractors(profiles):
+    """Wrong-option pool of every profile's key terms
+
+    A term is embedded from all the sentences it occurs in across the lessons,
+    so terms used in similar contexts come out similar.
+    """
+    index = DistractorIndex()
+    for profile in profiles:
+        for term in profile.ranked:
+            context = ' '.join(profile.corpus.sentences[i] for i in profile.corpus.sentences_with(term))
+            index.add(term, profile.categories.get(term), context=context)
+    return index.build()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of parsed lessons keyed by their source
+A lesson's key hashes its raw RTF block, its parse arguments and a stamp of the
+parser's own source, so a run only parses lessons whose block or parser changed;
+the least recently used entries are evicted once the cache outgrows its bound
+"""
+
+import hashlib
+import os
+import pickle
+import time
+
+# Where the cache lives, relative to the working directory
+DEFAULT_CACHE_DIR = '.lesson_cache'
+
+# Bytes the cache may hold before old entries are evicted
+DEFAULT_CACHE_SIZE = 64 << 20
+
+# Eviction frees down to this share of the bound, so it runs once per many puts
+EVICT_TO = 0.9
+
+# Bump to drop every cached lesson even when no parser source changed
+PARSER_VERSION = 1
+
+ENTRY_SUFFIX = '.pickle'
+
+def source_stamp(paths, version=PARSER_VERSION):
+    """Hash of version and the contents of paths, so any edit to them changes it"""
+    digest = hashlib.sha256(str(version).encode())
+    for path in sorted(paths):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+class LessonCache:
+    """Pickled lessons in one file per key, bounded to max_bytes on disk
+
+    A hit touches the entry's modification time, which orders eviction.
+    Unreadable entries count as misses and are removed.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, stamp='', max_bytes=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.stamp = stamp
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        # key -> (last use, size) of every entry on disk
+        self._entries = {}
+        for entry in os.scandir(directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                stat = entry.stat()
+                self._entries[entry.name[:-len(ENTRY_SUFFIX)]] = (stat.st_mtime, stat.st_size)
+        self.size = sum(size for _, size in self._entries.values())
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def key(self, lesson_block, *args):
+        """Key of a lesson block parsed with args under this cache's stamp"""
+        digest = hashlib.sha256(self.stamp.encode())
+        digest.update(repr(args).encode())
+        digest.update(lesson_block.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def get(self, key, valid=None):
+        """The cached lesson for key, or None; a lesson for which valid(lesson) is false is a miss"""
+        if key in self._entries:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    lesson = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                self._forget(key)
+            else:
+                if valid is not None and not valid(lesson):
+                    self.misses += 1
+                    return None
+                now = time.time()
+                os.utime(self._path(key), (now, now))
+                self._entries[key] = (now, self._entries[key][1])
+                self.hits += 1
+                return lesson
+        self.misses += 1
+        return None
+
+    def put(self, key, lesson):
+        data = pickle.dumps(lesson, protocol=pickle.HIGHEST_PROTOCOL)
+        temp_path = f"{self._path(key)}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, self._path(key))
+        if key in self._entries:
+            self.size -= self._entries[key][1]
+        self._entries[key] = (time.time(), len(data))
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def _forget(self, key):
+        self.size -= self._entries.pop(key)[1]
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Remove least recently used entries until the cache is EVICT_TO of max_bytes"""
+        for key in sorted(self._entries, key=lambda key: self._entries[key][0]):
+            if self.size <= self.max_bytes * EVICT_TO:
+                break
+            self._forget(key)
+            self.evictions += 1
+
+    def __str__(self):
+        return (f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions, "
+                f"{len(self._entries)} entries ({self.size / (1 << 20):.1f} MiB of {self.max_bytes / (1 << 20):.0f} MiB)")
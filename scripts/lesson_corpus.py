@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Per-lesson text prepared once for question generation
+Sentences, their lowercase forms, token sets and lengths are computed when the
+lesson is built instead of once per question, along with an inverted index from
+token to sentence ids
+"""
+
+import re
+from bisect import bisect_left
+
+# Sentence boundaries, as the question generators have always split lesson text
+SENTENCE_PATTERN = re.compile(r'[.!?]+')
+
+# Word tokens of lowercased text
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+class LessonCorpus:
+    """One lesson's text, segmented into sentences once for every question"""
+
+    def __init__(self, text):
+        self.text = text
+        self.lower = text.lower()
+        self.sentences = SENTENCE_PATTERN.split(text)
+        # Lowercasing never touches the punctuation we split on, so both lists line up
+        self.sentences_lower = SENTENCE_PATTERN.split(self.lower)
+        self.stripped = [sent.strip() for sent in self.sentences]
+        self.lengths = [len(sent) for sent in self.sentences]
+        self.token_sets = [frozenset(WORD_PATTERN.findall(sent)) for sent in self.sentences_lower]
+
+        # Inverted index: token -> ids of the sentences it occurs in, ascending
+        self.postings = {}
+        for sent_id, tokens in enumerate(self.token_sets):
+            for token in tokens:
+                self.postings.setdefault(token, []).append(sent_id)
+        self._word_ids = {}
+        self._term_ids = {}
+        self._suffixes = None
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def _tokens_containing(self, word):
+        """Tokens with word anywhere in them, found by prefix search of their sorted suffixes"""
+        if self._suffixes is None:
+            self._suffixes = sorted((token[i:], token) for token in self.postings for i in range(len(token)))
+        tokens = set()
+        i = bisect_left(self._suffixes, (word,))
+        while i < len(self._suffixes) and self._suffixes[i][0].startswith(word):
+            tokens.add(self._suffixes[i][1])
+            i += 1
+        return tokens
+
+    def _sentences_with_word(self, word):
+        """Ids of sentences with a token containing word, merged from the posting lists"""
+        ids = self._word_ids.get(word)
+        if ids is None:
+            ids = set()
+            for token in self._tokens_containing(word):
+                ids.update(self.postings[token])
+            self._word_ids[word] = ids
+        return ids
+
+    def sentences_with(self, term):
+        """Ids, in order, of the sentences whose lowercase text contains term
+
+        Gives the same answer as testing term in every lowercase sentence. Each word
+        of term narrows the candidates by intersecting posting lists, and only terms
+        with several words or punctuation are then checked against sentence text.
+        """
+        term = term.lower()
+        ids = self._term_ids.get(term)
+        if ids is not None:
+            return ids
+        words = WORD_PATTERN.findall(term)
+        if words:
+            candidates = set.intersection(*sorted((self._sentences_with_word(w) for w in words), key=len))
+        else:
+            candidates = range(len(self.sentences))
+        if words == [term]:
+            ids = sorted(candidates)
+        else:
+            ids = sorted(i for i in candidates if term in self.sentences_lower[i])
+        self._term_ids[term] = ids
+        return ids
+
+    def sentences_with_any(self, terms):
+        """Ids, in order, of the sentences containing at least one of terms"""
+        ids = set()
+        for term in terms:
+            ids.update(self.sentences_with(term))
+        return sorted(ids)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Loads lessons straight into Postgres instead of through a pasted SQL file
+Lessons are sharded by path_type and each shard is upserted over its own pooled
+connection, a batch of rows per transaction, so a re-publish is one command and
+only ever locks the rows being written; with a build manifest only the lessons
+changed since the last publish are sent, and removed ones are deleted
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg_pool import ConnectionPool
+
+from sql_writer import CONFLICT_COLUMNS, DEFAULT_BATCH_SIZE, LESSON_COLUMNS, Jsonb, upsert_clause
+
+# Most connections open at once; shards beyond this wait for a free one
+DEFAULT_CONNECTIONS = 4
+
+# Seconds to wait for the first connection
+CONNECT_TIMEOUT = 10
+
+# Batches a shard may have queued before the stage waits for the oldest
+MAX_PENDING = 2
+
+def upsert_sql(row, table='lessons', columns=LESSON_COLUMNS, conflict=CONFLICT_COLUMNS):
+    """INSERT ... ON CONFLICT DO UPDATE for rows shaped like row, jsonb values cast"""
+    placeholders = ', '.join('%s::jsonb' if isinstance(value, Jsonb) else '%s' for value in row)
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) {upsert_clause(columns, conflict)}"
+
+def shard_delete_sql(table='lessons'):
+    """DELETE of one path_type's lessons whose order_index is in a list"""
+    return f"DELETE FROM {table} WHERE path_type = %s AND order_index = ANY(%s)"
+
+class LessonLoader:
+    """Pipeline stage upserting each lesson's row as it passes through
+
+    Rows are grouped into batches of batch_size per path_type; each shard has
+    one worker thread, so its batches commit in order, and the shards share a
+    pool of up to connections connections. A failed batch is rolled back and
+    stops the stage; batches already committed stay.
+
+    With a BuildManifest whose rows have been recorded by an earlier stage,
+    lessons unchanged since its previous build are not sent, and each shard's
+    last transaction also deletes that shard's lessons the build no longer
+    has. The previous build must be the one the database holds.
+    """
+
+    def __init__(self, conninfo, to_row, batch_size=DEFAULT_BATCH_SIZE, connections=DEFAULT_CONNECTIONS,
+                 manifest=None):
+        self.conninfo = conninfo
+        self.to_row = to_row
+        self.batch_size = batch_size
+        self.connections = connections
+        self.manifest = manifest
+        self.rows = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.batches = 0
+        # Time inside upsert transactions, summed over batches, and the stage's wall time
+        self.seconds = 0.0
+        self.wall = 0.0
+        self.shard_rows = {}
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        """Rows committed per second spent in a transaction"""
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def _upsert(self, pool, shard, rows, removed=()):
+        with pool.connection() as conn:
+            started = time.perf_counter()
+            deleted = 0
+            with conn.transaction():
+                cursor = conn.cursor()
+                if rows:
+                    cursor.executemany(upsert_sql(rows[0]), rows)
+                if removed:
+                    cursor.execute(shard_delete_sql(), (shard, list(removed)))
+                    deleted = cursor.rowcount
+            elapsed = time.perf_counter() - started
+        with self._lock:
+            self.rows += len(rows)
+            self.shard_rows[shard] = self.shard_rows.get(shard, 0) + len(rows)
+            self.deleted += deleted
+            self.batches += 1
+            self.seconds += elapsed
+
+    def __call__(self, lessons):
+        started = time.perf_counter()
+        with ConnectionPool(self.conninfo, min_size=1, max_size=self.connections, open=True) as pool:
+            # Fail before the first lesson if the database cannot be reached
+            pool.wait(CONNECT_TIMEOUT)
+            workers = {}
+            pending = {}
+            batches = {}
+
+            def submit(shard, removed=()):
+                rows = batches.pop(shard, [])
+                queued = pending.setdefault(shard, [])
+                if len(queued) >= MAX_PENDING:
+                    queued.pop(0).result()
+                worker = workers.get(shard)
+                if worker is None:
+                    worker = workers[shard] = ThreadPoolExecutor(1, thread_name_prefix=f'load-{shard}')
+                queued.append(worker.submit(self._upsert, pool, shard, rows, removed))
+
+            try:
+                for lesson in lessons:
+                    if self.manifest is not None and self.manifest.is_current(lesson):
+                        self.unchanged += 1
+                        yield lesson
+                        continue
+                    shard = lesson["path_type"]
+                    batches.setdefault(shard, []).append(self.to_row(lesson))
+                    if len(batches[shard]) >= self.batch_size:
+                        submit(shard)
+                    yield lesson
+                # The removed lessons are only known once every lesson has been recorded
+                removed = {}
+                if self.manifest is not None:
+                    for path_type, order_index in self.manifest.removed_keys():
+                        removed.setdefault(path_type, []).append(order_index)
+                for shard in list(batches) + [shard for shard in removed if shard not in batches]:
+                    submit(shard, removed.get(shard, ()))
+                for queued in pending.values():
+                    for future in queued:
+                        future.result()
+            finally:
+                for worker in workers.values():
+                    worker.shutdown(cancel_futures=True)
+                self.wall = time.perf_counter() - started
+
+    def __str__(self):
+        shards = ', '.join(f'{shard}: {rows}' for shard, rows in self.shard_rows.items())
+        return (f"{self.rows} rows in {self.batches} batches over {len(self.shard_rows)} shards ({shards}), "
+                f"{self.unchanged} unchanged, {self.deleted} deleted, "
+                f"{self.seconds:.2f}s in transactions ({self.rate:.0f} rows/s), {self.wall:.2f}s wall")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Build manifest of lesson fingerprints, for publishing only what changed
+Each build records a hash of every lesson's row; the next build compares its
+rows against that record and upserts just the lessons whose hash differs,
+deleting the ones that are gone, instead of reloading the whole table. The
+multiple choice options drawn from other lessons are recorded too, so a lesson
+whose own source is unchanged keeps them and an edit changes a single row
+"""
+
+import hashlib
+import json
+import os
+
+from sql_writer import quote_literal
+
+MANIFEST_VERSION = 2
+
+def fingerprint(row):
+    """Hash of a lesson row's column values"""
+    return hashlib.sha256(json.dumps(list(row), ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def source_fingerprint(lesson):
+    """Hash of a lesson as parsed, before options from other lessons are drawn"""
+    return hashlib.sha256(json.dumps(lesson, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+def lesson_key(lesson):
+    return lesson["path_type"], lesson["order_index"]
+
+def delete_sql(keys, table='lessons'):
+    """DELETE of the lessons with the given (path_type, order_index) keys"""
+    values = ', '.join(f"({quote_literal(path_type)}, {order_index})" for path_type, order_index in keys)
+    return f"DELETE FROM {table} WHERE (path_type, order_index) IN ({values});"
+
+class BuildManifest:
+    """Fingerprints of this build's lessons, and of the build before it
+
+    record() wraps the function giving lesson rows, so each row is hashed
+    where it is serialized anyway. delta() is a pipeline stage writing the
+    upserts and deletes that take the previous build to this one. pinned()
+    and pin() keep the options a lesson was published with while its source
+    fingerprint stays the same.
+    """
+
+    def __init__(self, previous=None):
+        # (path_type, order_index) -> {"fingerprint", "source", "options"} of the previous build
+        self.previous = previous or {}
+        self.fingerprints = {}
+        self.sources = {}
+        self.options = {}
+        self.added = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.removed = []
+
+    @classmethod
+    def load(cls, path):
+        """Manifest with the fingerprints written to path as previous; empty if there is none"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls()
+        return cls({(entry["path_type"], entry["order_index"]): entry for entry in data["lessons"]})
+
+    def pinned(self, lesson):
+        """Options the previous build gave lesson's multiple choice questions, if its source is unchanged
+
+        lesson is taken as parsed; its source fingerprint is kept for pin().
+        None when the lesson is new or its source changed.
+        """
+        key = lesson_key(lesson)
+        source = self.sources[key] = source_fingerprint(lesson)
+        before = self.previous.get(key)
+        if before is None or before["source"] != source:
+            return None
+        return before["options"]
+
+    def pin(self, lesson, options):
+        """Record the options lesson's multiple choice questions were given, for the next build"""
+        self.options[lesson_key(lesson)] = options
+
+    def record(self, to_row):
+        """to_row, also keeping the fingerprint of each row it gives"""
+        def recorded(lesson):
+            row = to_row(lesson)
+            self.fingerprints[lesson_key(lesson)] = fingerprint(row)
+            return row
+        return recorded
+
+    def is_current(self, lesson):
+        """Whether a recorded lesson's row is the one the previous build had"""
+        before = self.previous.get(lesson_key(lesson))
+        return before is not None and before["fingerprint"] == self.fingerprints[lesson_key(lesson)]
+
+    def removed_keys(self):
+        """Keys of the previous build's lessons that this build has not recorded, sorted"""
+        return sorted(key for key in self.previous if key not in self.fingerprints)
+
+    def delta(self, lessons, writer, to_row):
+        """Stage writing an upsert through writer for each new or changed lesson
+
+        Lessons must have been recorded. The DELETE of lessons missing from
+        this build is written once lessons run out, and the whole delta is one
+        transaction.
+        """
+        writer.write("BEGIN;")
+        for lesson in lessons:
+            if self.is_current(lesson):
+                self.unchanged += 1
+                yield lesson
+                continue
+            if lesson_key(lesson) in self.previous:
+                self.changed += 1
+            else:
+                self.added += 1
+            writer.write_row(to_row(lesson))
+            yield lesson
+        writer.finish()
+        self.removed = self.removed_keys()
+        if self.removed:
+            writer.write(delete_sql(self.removed, writer.table))
+        writer.write("COMMIT;")
+
+    def write(self, path):
+        lessons = [
+            {"path_type": path_type, "order_index": order_index, "fingerprint": digest,
+             "source": self.sources.get((path_type, order_index)), "options": self.options.get((path_type, order_index))}
+            for (path_type, order_index), digest in self.fingerprints.items()
+        ]
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_VERSION, "lessons": lessons}, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, path)
+
+    def __str__(self):
+        return (f"{self.added} added, {self.changed} changed, {self.unchanged} unchanged, "
+                f"{len(self.removed)} removed")
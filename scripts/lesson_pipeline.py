@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Streaming pipeline of lesson stages joined by bounded queues
+Each stage is a generator function over the previous stage's output and runs in
+its own thread, so a lesson can be written while later ones are still being
+parsed and only a few lessons are ever held between two stages
+"""
+
+import queue
+import threading
+import time
+
+# Lessons that may wait between two stages
+QUEUE_SIZE = 8
+
+# How often a blocked stage checks whether another stage has failed, in seconds
+POLL_INTERVAL = 0.1
+
+# Marks the end of a stage's output
+_DONE = object()
+
+class StageStats:
+    """Throughput counters of one stage
+
+    busy is the time the stage spent working, excluding time blocked on an
+    empty input queue or a full output queue.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.busy = 0.0
+        self.wall = 0.0
+
+    @property
+    def rate(self):
+        """Items out per busy second"""
+        return self.items_out / self.busy if self.busy else 0.0
+
+    def __str__(self):
+        return (f"{self.name}: {self.items_in} in, {self.items_out} out, "
+                f"{self.busy:.2f}s busy of {self.wall:.2f}s, {self.rate:.1f}/s")
+
+class _Stopped(Exception):
+    """Raised inside a stage when another stage has failed"""
+
+class Pipeline:
+    """Stages run in threads, each reading the previous stage's output from a bounded queue
+
+    stages is a list of (name, function), where function takes an iterator of
+    items and yields items; the first stage is given source. run() drains the
+    last stage and returns its outputs' count, re-raising the first error any
+    stage hit.
+    """
+
+    def __init__(self, source, stages, queue_size=QUEUE_SIZE):
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats = [StageStats(name) for name, _ in stages]
+        self._stop = threading.Event()
+        self._errors = []
+
+    def _get(self, inbox, stats):
+        """Items from inbox until the previous stage is done; waiting is not busy time"""
+        while True:
+            waited = time.perf_counter()
+            while True:
+                if self._stop.is_set():
+                    raise _Stopped()
+                try:
+                    item = inbox.get(timeout=POLL_INTERVAL)
+                    break
+                except queue.Empty:
+                    pass
+            stats.busy -= time.perf_counter() - waited
+            if item is _DONE:
+                return
+            stats.items_in += 1
+            yield item
+
+    def _put(self, outbox, item, stats):
+        waited = time.perf_counter()
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                outbox.put(item, timeout=POLL_INTERVAL)
+                break
+            except queue.Full:
+                pass
+        stats.busy -= time.perf_counter() - waited
+
+    def _run_stage(self, function, inbox, outbox, stats):
+        started = time.perf_counter()
+        try:
+            items = self._get(inbox, stats) if inbox is not None else iter(self.source)
+            for item in function(items):
+                stats.items_out += 1
+                if outbox is not None:
+                    self._put(outbox, item, stats)
+            if outbox is not None:
+                self._put(outbox, _DONE, stats)
+        except _Stopped:
+            pass
+        except BaseException as error:
+            self._errors.append(error)
+            self._stop.set()
+        finally:
+            stats.wall = time.perf_counter() - started
+            stats.busy += stats.wall
+
+    def run(self):
+        queues = [queue.Queue(self.queue_size) for _ in self.stages[1:]]
+        inboxes = [None] + queues
+        outboxes = queues + [None]
+        threads = [
+            threading.Thread(target=self._run_stage, args=(function, inbox, outbox, stats), name=name, daemon=True)
+            for (name, function), inbox, outbox, stats in zip(self.stages, inboxes, outboxes, self.stats)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+        return self.stats[-1].items_out
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+BM25 ranking of lesson sentences for question generation
+Every question of a lesson is scored against every sentence in one matrix
+product; answers and explanations are then picked with argmax over the row
+"""
+
+import numpy as np
+
+from lesson_corpus import WORD_PATTERN
+
+# BM25 term-frequency saturation and length normalisation
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Question words that say nothing about the topic
+QUESTION_STOP_WORDS = {
+    'what', 'which', 'where', 'when', 'why', 'how', 'who', 'does', 'doesn', 'would', 'could',
+    'should', 'think', 'about', 'from', 'this', 'that', 'the', 'and', 'but', 'are', 'you',
+    'your', 'can', 'for', 'with', 'into', 'they', 'their', 'them', 'there', 'have', 'has',
+    'was', 'were', 'some', 'any', 'might', 'many', 'much', 'other', 'these', 'those',
+}
+
+class SentenceScorer:
+    """BM25 weights for one lesson's sentences, with question rows cached by text"""
+
+    def __init__(self, lesson_corpus, k1=BM25_K1, b=BM25_B):
+        self.corpus = lesson_corpus
+        self.vocab = {token: i for i, token in enumerate(lesson_corpus.postings)}
+        self.lengths = np.array(lesson_corpus.lengths)
+        self._rows = {}
+
+        # Term x sentence counts, filled in one scatter-add
+        rows = []
+        cols = []
+        for sent_id, sent in enumerate(lesson_corpus.sentences_lower):
+            for token in WORD_PATTERN.findall(sent):
+                rows.append(self.vocab[token])
+                cols.append(sent_id)
+        tf = np.zeros((len(self.vocab), len(lesson_corpus)))
+        np.add.at(tf, (rows, cols), 1)
+
+        doc_len = tf.sum(axis=0)
+        avg_len = doc_len.mean() if doc_len.size and doc_len.mean() else 1.0
+        doc_freq = (tf > 0).sum(axis=1)
+        idf = np.log1p((len(lesson_corpus) - doc_freq + 0.5) / (doc_freq + 0.5))
+        norm = k1 * (1 - b + b * doc_len / avg_len)
+        self.weights = idf[:, None] * tf * (k1 + 1) / (tf + norm)
+
+    def _query_tokens(self, question):
+        return {token for token in WORD_PATTERN.findall(question.lower())
+                if len(token) > 2 and token not in QUESTION_STOP_WORDS and token in self.vocab}
+
+    def score(self, questions):
+        """Question x sentence BM25 matrix; questions not seen before are scored in one product"""
+        new = [q for q in dict.fromkeys(questions) if q not in self._rows]
+        if new:
+            query = np.zeros((len(new), len(self.vocab)))
+            for i, question in enumerate(new):
+                for token in self._query_tokens(question):
+                    query[i, self.vocab[token]] = 1
+            for question, row in zip(new, query @ self.weights):
+                self._rows[question] = row
+        if not questions:
+            return np.zeros((0, len(self.corpus)))
+        return np.stack([self._rows[q] for q in questions])
+
+    def mask(self, sent_ids):
+        """Boolean sentence mask from a list of sentence ids"""
+        selected = np.zeros(len(self.corpus), dtype=bool)
+        selected[list(sent_ids)] = True
+        return selected
+
+    def top(self, question, k, min_len=0, max_len=None, mask=None):
+        """Ids of up to k best-scoring sentences for question, best first
+
+        Only sentences with a positive score and a length strictly between
+        min_len and max_len (and inside mask, if given) are considered; ties go
+        to the earlier sentence.
+        """
+        row = self.score([question])[0]
+        allowed = (row > 0) & (self.lengths > min_len)
+        if max_len is not None:
+            allowed &= self.lengths < max_len
+        if mask is not None:
+            allowed &= mask
+        candidates = np.flatnonzero(allowed)
+        order = np.argsort(-row[candidates], kind='stable')[:k]
+        return [int(i) for i in candidates[order]]
+
+    def best(self, question, min_len=0, max_len=None, mask=None):
+        """Id of the best-scoring sentence for question, or None"""
+        top = self.top(question, 1, min_len, max_len, mask)
+        return top[0] if top else None
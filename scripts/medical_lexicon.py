@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Medical vocabulary and question cue phrases, loaded from medical_lexicon.json
+Every list is compiled into one regex alternation, so a text is scanned once by
+the regex engine however many terms the lexicon holds
+"""
+
+import json
+import os
+import re
+
+# Lexicon shipped next to the scripts
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'medical_lexicon.json')
+
+def term_pattern(terms):
+    """Regex finding whole-word occurrences of terms, leftmost-longest and without overlaps
+
+    Longer terms are tried first at each position, so "carbon dioxide" wins
+    over "carbon"; a term only counts between non-word characters.
+    """
+    alternatives = '|'.join(re.escape(term) for term in sorted(terms, key=lambda term: (-len(term), term)))
+    return re.compile(rf'(?<!\w)(?:{alternatives})(?!\w)')
+
+def cue_pattern(cues):
+    """Regex finding, at each position, the shortest of cues starting there, anywhere in a word"""
+    alternatives = '|'.join(re.escape(cue) for cue in sorted(cues, key=lambda cue: (len(cue), cue)))
+    return re.compile(rf'(?=({alternatives}))')
+
+class Lexicon:
+    """Terms by category plus question-type cue phrases, each behind one compiled regex"""
+
+    def __init__(self, terms, question_cues):
+        # A term can sit in several categories; they are kept in file order
+        self.term_categories = {}
+        for category, words in terms.items():
+            for word in words:
+                self.term_categories.setdefault(word.lower(), []).append(category)
+        # Question types in priority order, each with its cue phrases
+        self.question_cues = {qtype: [cue.lower() for cue in cues] for qtype, cues in question_cues.items()}
+        self.cue_types = {}
+        for qtype, cues in self.question_cues.items():
+            for cue in cues:
+                self.cue_types.setdefault(cue, []).append(qtype)
+
+        # Term regexes by the categories they are limited to, None for all; compiled on first use
+        self._term_patterns = {}
+        self._cue_patterns = {qtype: cue_pattern(cues) for qtype, cues in self.question_cues.items() if cues}
+
+    @classmethod
+    def load(cls, path=LEXICON_PATH, parser=None):
+        """Lexicon in path; a parser's own terms and cues, under "parsers", replace the shared ones"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        own = data.get('parsers', {})[parser] if parser is not None else {}
+        return cls(own.get('terms', data.get('terms', {})), own.get('question_cues', data.get('question_cues', {})))
+
+    def find_terms(self, text, categories=None):
+        """(start, end, term) for whole-word term occurrences in lowercase text
+
+        Only terms in one of categories count when categories is given.
+        Overlaps resolve leftmost-longest, so "carbon dioxide" wins over "carbon".
+        """
+        key = None if categories is None else frozenset(categories)
+        pattern = self._term_patterns.get(key)
+        if pattern is None:
+            terms = [term for term, term_categories in self.term_categories.items()
+                     if key is None or any(category in key for category in term_categories)]
+            pattern = self._term_patterns[key] = term_pattern(terms) if terms else None
+        if pattern is None:
+            return []
+        return [(match.start(), match.end(), match.group()) for match in pattern.finditer(text)]
+
+    def terms_in(self, text, categories=None):
+        """Terms found in lowercase text, in order of occurrence, repeats included"""
+        return [term for _, _, term in self.find_terms(text, categories)]
+
+    def category_terms(self, category):
+        """Terms of category, in file order"""
+        return [term for term, categories in self.term_categories.items() if category in categories]
+
+    def category_of(self, term, categories=None):
+        """First category of term (among categories, if given), or None"""
+        for category in self.term_categories.get(term, ()):
+            if categories is None or category in categories:
+                return category
+        return None
+
+    def question_cue_hits(self, text):
+        """Question type -> its cue phrase ending first in lowercase text, in priority order
+
+        Cues match anywhere, even inside a word; of two ending at the same
+        place the longer counts.
+        """
+        hits = {}
+        for qtype, pattern in self._cue_patterns.items():
+            first = None
+            for match in pattern.finditer(text):
+                if first is not None and match.start() >= first.end(1):
+                    break
+                if first is None or match.end(1) < first.end(1):
+                    first = match
+            if first is not None:
+                hits[qtype] = first.group(1)
+        return hits
+
+    def question_types(self, text):
+        """Question types with a cue phrase anywhere in lowercase text, in priority order"""
+        return list(self.question_cue_hits(text))
+
+def load_lexicon(path=LEXICON_PATH, parser=None):
+    """Load and compile the lexicon file, with parser's own lists if given"""
+    return Lexicon.load(path, parser)
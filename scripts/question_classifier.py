@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Rule-table question-type classifier
+Each question is scanned once by the lexicon's cue automaton and checked against
+a few length/punctuation features; the first rule in the table that holds sets
+the type, and its name comes back with the type so the mix can be audited
+"""
+
+import json
+from collections import Counter
+
+# A question ending in "?" and shorter than this reads as multiple choice
+SHORT_QUESTION_LENGTH = 100
+
+# Type and rule name when no rule holds
+DEFAULT_TYPE = 'text_answer'
+DEFAULT_RULE = 'default'
+
+def is_short_question(question_text):
+    return question_text.strip().endswith('?') and len(question_text) < SHORT_QUESTION_LENGTH
+
+# Rules after the cue rules: (name, question type, feature test)
+FEATURE_RULES = [
+    ('short_question', 'multiple_choice', is_short_question),
+]
+
+class QuestionClassifier:
+    """Question types from one precompiled rule table
+
+    The table holds one cue rule per question type, in the lexicon's priority
+    order, followed by FEATURE_RULES. Cue rules are reported as cue:<type>:<phrase>.
+    """
+
+    def __init__(self, lexicon):
+        self.lexicon = lexicon
+        self.rules = [(f'cue:{qtype}', qtype, None) for qtype in lexicon.question_cues]
+        self.rules.extend(FEATURE_RULES)
+
+    def classify(self, question_text):
+        """(question type, rule that fired) for one question"""
+        cue_hits = self.lexicon.question_cue_hits(question_text.lower())
+        for name, qtype, feature in self.rules:
+            if feature is None:
+                if qtype in cue_hits:
+                    return qtype, f'{name}:{cue_hits[qtype]}'
+            elif feature(question_text):
+                return qtype, name
+        return DEFAULT_TYPE, DEFAULT_RULE
+
+    def classify_batch(self, questions):
+        """(question type, rule that fired) for each of questions, in order"""
+        return [self.classify(question) for question in questions]
+
+def summarize_question_types(classified, assigned=None):
+    """Per-type counts of (type, rule) pairs, each with the rules that produced it
+
+    assigned, a Counter of the formats the questions finally got, is reported
+    alongside when given.
+    """
+    types = {}
+    for qtype, rule in classified:
+        entry = types.setdefault(qtype, {'count': 0, 'rules': Counter()})
+        entry['count'] += 1
+        entry['rules'][rule] += 1
+
+    summary = {'total': len(classified), 'types': {}}
+    for qtype, entry in sorted(types.items(), key=lambda item: -item[1]['count']):
+        summary['types'][qtype] = {'count': entry['count'], 'rules': dict(entry['rules'].most_common())}
+    if assigned is not None:
+        summary['assigned'] = dict(assigned.most_common())
+    return summary
+
+def write_type_summary(summary, path):
+    """Write a summary from summarize_question_types as JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+        f.write('\n')
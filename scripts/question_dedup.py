@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate question detection with MinHash and locality-sensitive hashing
+Every question is reduced to a MinHash signature in one batched pass; signatures
+are cut into bands and only questions sharing a band bucket are ever compared,
+so a corpus is grouped in roughly linear time instead of comparing all pairs
+"""
+
+import zlib
+
+import numpy as np
+
+from lesson_corpus import WORD_PATTERN
+
+# Signature length; more permutations give a sharper similarity estimate
+NUM_PERM = 128
+
+# Characters per shingle; character shingles survive the small rewordings
+# ("Why are"/"Why is") that break most word n-grams of a short question
+SHINGLE_SIZE = 5
+
+# Default estimated Jaccard similarity at which two questions count as duplicates
+DEFAULT_THRESHOLD = 0.7
+
+# Chance that a pair right at the threshold shares at least one band bucket
+MIN_RECALL = 0.95
+
+# How far below the threshold a signature estimate may fall and still be checked
+# exactly; about three standard deviations of a 128-permutation estimate
+ESTIMATE_MARGIN = 0.15
+
+# Shingles hashed per batch when computing signatures, bounding memory to
+# NUM_PERM * SIGNATURE_BATCH 8-byte hashes
+SIGNATURE_BATCH = 1 << 16
+
+# Signature value of a text with no shingles; real values are 32-bit
+EMPTY_HASH = 1 << 32
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Character shingles of text's lowercase words joined by single spaces
+
+    Punctuation and spacing are ignored; a text shorter than size is one shingle.
+    """
+    normalized = ' '.join(WORD_PATTERN.findall(text.lower()))
+    if not normalized:
+        return set()
+    return {normalized[i:i + size] for i in range(max(1, len(normalized) - size + 1))}
+
+def lsh_bands(threshold, num_perm=NUM_PERM):
+    """(bands, rows) splitting num_perm, with as many rows as still find pairs at threshold
+
+    Two texts of similarity s share a bucket with probability 1 - (1 - s**rows)**bands;
+    more rows mean fewer dissimilar candidates, as long as that probability stays
+    at least MIN_RECALL at threshold.
+    """
+    shapes = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    usable = [(bands, rows) for bands, rows in shapes if 1 - (1 - threshold ** rows) ** bands >= MIN_RECALL]
+    return usable[-1] if usable else shapes[0]
+
+class MinHasher:
+    """MinHash signatures from a fixed set of hash permutations
+
+    Each permutation is a multiply-shift hash, (a * x + b) mod 2**64 >> 32 with
+    a odd, which needs only wrapping uint64 arithmetic.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = generator.randint(0, 1 << 32, size=(num_perm, 2)).astype(np.uint64)
+        self._a = (self._a[:, 0] << np.uint64(32) | self._a[:, 1]) | np.uint64(1)
+        self._b = generator.randint(0, 1 << 32, size=(num_perm, 2)).astype(np.uint64)
+        self._b = self._b[:, 0] << np.uint64(32) | self._b[:, 1]
+
+    def signatures(self, shingle_sets):
+        """One signature row per shingle set; empty sets get an all-max row
+
+        Shingles are hashed in batches of whole sets, at most about
+        SIGNATURE_BATCH shingles each, and every batch is reduced in one call.
+        """
+        signatures = np.full((len(shingle_sets), self.num_perm), EMPTY_HASH, dtype=np.uint64)
+        owners = [i for i, shingle_set in enumerate(shingle_sets) if shingle_set]
+        start = 0
+        while start < len(owners):
+            end = start
+            size = 0
+            while end < len(owners) and (end == start or size + len(shingle_sets[owners[end]]) <= SIGNATURE_BATCH):
+                size += len(shingle_sets[owners[end]])
+                end += 1
+            batch = owners[start:end]
+            hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for i in batch for s in shingle_sets[i]),
+                                 dtype=np.uint64, count=size)
+            offsets = np.cumsum([0] + [len(shingle_sets[i]) for i in batch[:-1]])
+            # Permutations x shingles, so each set is a contiguous run along the last axis
+            permuted = (self._a[:, None] * hashes + self._b[:, None]) >> np.uint64(32)
+            signatures[batch] = np.minimum.reduceat(permuted, offsets, axis=1).T
+            start = end
+        return signatures
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+class NearDuplicateIndex:
+    """LSH index that grows a batch of texts at a time, for streaming
+
+    add() answers, for each new text, which groups of already indexed texts
+    it near-duplicates, then indexes it; ids are positions in the order texts
+    were added. Each text is checked against its band buckets only, and only
+    until one member of a group is confirmed; a text with the same shingles
+    as an earlier one joins its group without being checked or bucketed. So
+    a corpus is processed in roughly linear time however it is batched, and
+    repeated questions cost no more than one copy of them.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM):
+        self.threshold = threshold
+        self._hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self._mix = MinHasher(self.rows, seed=2)._a
+        self._buckets = [{} for _ in range(self.bands)]
+        self._shingle_sets = []
+        # Id of the first text with each shingle set
+        self._first = {}
+        # Union-find parent of every indexed text; a group's root is its earliest text
+        self._parent = []
+        # Signature rows of every indexed text, in a buffer grown by doubling
+        self._signatures = np.empty((64, num_perm), dtype=np.uint64)
+
+    def __len__(self):
+        return len(self._shingle_sets)
+
+    def group(self, text_id):
+        """Id of the earliest text in text_id's group of near-duplicates"""
+        parent = self._parent
+        while parent[text_id] != text_id:
+            parent[text_id] = parent[parent[text_id]]
+            text_id = parent[text_id]
+        return text_id
+
+    def _join(self, text_id, other):
+        root, child = sorted((self.group(text_id), self.group(other)))
+        self._parent[child] = root
+
+    def add(self, texts):
+        """Ids of earlier texts each of texts near-duplicates, one sorted list per text
+
+        Each list holds one text of every group the text joins. Earlier texts
+        of the same batch count.
+        """
+        shingle_sets = [shingles(text) for text in texts]
+        signatures = self._hasher.signatures(shingle_sets)
+        first_id = len(self._shingle_sets)
+        self._shingle_sets.extend(shingle_sets)
+        if len(self._shingle_sets) > len(self._signatures):
+            grown = np.empty((max(len(self._shingle_sets), 2 * len(self._signatures)), signatures.shape[1]), dtype=np.uint64)
+            grown[:first_id] = self._signatures[:first_id]
+            self._signatures = grown
+        self._signatures[first_id:len(self._shingle_sets)] = signatures
+        # One folded 64-bit key per text and band
+        keys = np.stack([signatures[:, band * self.rows:(band + 1) * self.rows] @ self._mix
+                         for band in range(self.bands)], axis=1).tolist()
+
+        matches = []
+        for n, shingle_set in enumerate(shingle_sets):
+            text_id = first_id + n
+            self._parent.append(text_id)
+            found = []
+            copy_of = self._first.setdefault(frozenset(shingle_set), text_id) if shingle_set else text_id
+            if copy_of != text_id:
+                # Same shingles, so the same similarity to every text as its first copy
+                found = [copy_of]
+                self._join(text_id, copy_of)
+            elif shingle_set:
+                candidates = set()
+                for buckets, key in zip(self._buckets, keys[n]):
+                    candidates.update(buckets.get(key, ()))
+                    buckets.setdefault(key, []).append(text_id)
+                if candidates:
+                    candidates = np.array(sorted(candidates), dtype=np.int64)
+                    estimates = (self._signatures[candidates] == signatures[n]).mean(axis=1)
+                    for candidate in candidates[estimates >= self.threshold - ESTIMATE_MARGIN].tolist():
+                        # One confirmed member joins the whole group
+                        if self.group(candidate) != self.group(text_id) and \
+                                jaccard(self._shingle_sets[candidate], shingle_set) >= self.threshold:
+                            found.append(candidate)
+                            self._join(text_id, candidate)
+            matches.append(found)
+        return matches
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Lesson structure of the course RTF exports
+Finds every lesson heading (\\fs51\\fsmilli25995 N | ...) in a single scan
+"""
+
+import mmap
+import os
+import re
+
+# Heading marker for a lesson; the title heading carries \cf2, the "N | Content" heading does not
+HEADING_PATTERN = re.compile(r'\\fs51\\fsmilli25995\s+(\\cf2\s+)?(\d+)\s+\|')
+
+# The same heading marker, matched directly on the file's bytes
+HEADING_BYTES_PATTERN = re.compile(HEADING_PATTERN.pattern.encode('ascii'))
+
+# RTF is read one character per byte, so a \binN payload is exactly N characters;
+# the tokenizer decodes any 8-bit literal text as UTF-8 afterwards
+RTF_ENCODING = 'latin-1'
+
+# Title text that follows a heading marker
+TITLE_PATTERN = re.compile(r'\\fs51\\fsmilli25995\s+(?:\\cf2\s+)?\d+\s+\|\s+(.*?)(?=\\fs21|\\fs51)', re.DOTALL)
+
+class Span:
+    """A [start, end) window on a shared text buffer
+
+    Regexes run on the buffer with pos/endpos, so finding and narrowing spans
+    never copies text; str(span) copies it once, when the final string is needed.
+    """
+
+    __slots__ = ('doc', 'start', 'end')
+
+    def __init__(self, doc, start=0, end=None):
+        self.doc = doc
+        self.start = start
+        self.end = len(doc) if end is None else end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __str__(self):
+        return self.doc[self.start:self.end]
+
+    def __repr__(self):
+        return f"Span({self.start}, {self.end})"
+
+    def search(self, pattern):
+        return pattern.search(self.doc, self.start, self.end)
+
+    def match(self, pattern):
+        return pattern.match(self.doc, self.start, self.end)
+
+    def finditer(self, pattern):
+        return pattern.finditer(self.doc, self.start, self.end)
+
+    def narrow(self, start=None, end=None):
+        """Sub-span between buffer offsets start and end, clamped to this span"""
+        start = self.start if start is None else max(self.start, min(start, self.end))
+        end = self.end if end is None else max(start, min(end, self.end))
+        return Span(self.doc, start, end)
+
+def build_lesson_index(content):
+    """Map each lesson number to its (start, end) offsets in content, in lesson order"""
+    titled = {}
+    untitled = {}
+    for match in HEADING_PATTERN.finditer(content):
+        lesson_num = int(match.group(2))
+        headings = titled if match.group(1) else untitled
+        headings.setdefault(lesson_num, match.start())
+
+    # Prefer the \cf2 title heading; fall back to the first plain heading
+    starts = dict(untitled)
+    starts.update(titled)
+
+    # A lesson runs until the next lesson's heading in document order
+    ordered = sorted(starts.items(), key=lambda item: item[1])
+    spans = {}
+    for i, (lesson_num, start_pos) in enumerate(ordered):
+        end_pos = ordered[i + 1][1] if i + 1 < len(ordered) else len(content)
+        spans[lesson_num] = (start_pos, end_pos)
+
+    return {lesson_num: spans[lesson_num] for lesson_num in sorted(spans)}
+
+def iter_lessons(filepath):
+    """Yield (lesson_num, lesson_block) for each lesson of an RTF file, one at a time
+
+    The file is memory-mapped and headings are found at the byte level, so only the
+    lesson being yielded is ever decoded; peak memory follows the largest lesson,
+    not the whole document. A lesson starts at the first heading with a new lesson
+    number and runs to the next one, so lessons come out in document order.
+    """
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, memoryview(data) as view:
+            # Lessons are decoded straight from the mapping, with no intermediate bytes copy
+            seen = set()
+            current_num = None
+            current_start = 0
+            for match in HEADING_BYTES_PATTERN.finditer(data):
+                lesson_num = int(match.group(2))
+                if lesson_num in seen:
+                    continue
+                if current_num is not None:
+                    yield current_num, str(view[current_start:match.start()], RTF_ENCODING)
+                seen.add(lesson_num)
+                current_num = lesson_num
+                current_start = match.start()
+            if current_num is not None:
+                yield current_num, str(view[current_start:], RTF_ENCODING)
+
+SECTION_NAMES = ['Starter Questions', 'Key Points', 'Questions', 'More to Learn', 'Skill Check']
+
+# Sections that also end at any \fs51 heading; the rest run to the next section
+# header or lesson title heading, so large text inside them does not cut them short
+FS51_SECTIONS = {'Lesson', 'Questions'}
+
+# One alternation for every section header, any "Lesson N:" header, the lesson title
+# heading and any other \fs51; the lookahead lets the scan pass over text that can
+# start none of them without trying each alternative
+SECTION_PATTERN = re.compile(
+    r'(?=[\\%s])(?:\\fs51(?P<title>\\fsmilli25995\s+\\cf2\s+\d+\s+\|)?|(?P<name>Lesson (?P<num>\d+)|%s):)' % (
+        ''.join(sorted({name[0].lower() + name[0].upper() for name in ['Lesson'] + SECTION_NAMES})),
+        '|'.join(re.escape(name) for name in SECTION_NAMES)),
+    re.IGNORECASE)
+
+def split_sections(content, lesson_num=None, pos=0, endpos=None, keep='first'):
+    """Map section name -> (start, end) offsets of its body within content[pos:endpos]
+
+    content may also be a Span, whose window then sets pos and endpos.
+
+    Sections are found in one scan; each body runs to the next header or lesson
+    title heading, or for FS51_SECTIONS to any \\fs51 heading. The "Lesson N:"
+    main text is reported as 'Lesson' when lesson_num is given. Only the first
+    occurrence of a section is kept, or the last one with keep='last'.
+    """
+    if isinstance(content, Span):
+        content, pos, endpos = content.doc, content.start, content.end
+    if endpos is None:
+        endpos = len(content)
+    canonical = {name.lower(): name for name in SECTION_NAMES}
+
+    spans = {}
+    open_name = None
+    open_start = None
+    lesson_header = None if lesson_num is None else str(lesson_num)
+    for match in SECTION_PATTERN.finditer(content, pos, endpos):
+        if match.group('num') is not None and match.group('num') != lesson_header:
+            continue
+        name = match.group('name')
+        if not name and not match.group('title') and open_name not in FS51_SECTIONS:
+            continue
+        if open_name is not None and (keep == 'last' or open_name not in spans):
+            spans[open_name] = (open_start, match.start())
+        if name:
+            open_name = canonical.get(name.lower(), 'Lesson')
+            open_start = match.end()
+        else:
+            open_name = None
+    if open_name is not None and (keep == 'last' or open_name not in spans):
+        spans[open_name] = (open_start, endpos)
+
+    return spans
+
+# Start of a lesson's intro paragraph, and the headers that can end it
+INTRO_PATTERN = re.compile(r'In this lesson', re.IGNORECASE)
+INTRO_END_PATTERN = re.compile(r'After this lesson|Lesson (\d+):|Starter Questions:', re.IGNORECASE)
+
+def find_intro(content, lesson_num, pos=0, endpos=None):
+    """(start, end) offsets of the "In this lesson" paragraph within content[pos:endpos], or None
+
+    content may also be a Span. The paragraph runs to the first "After this
+    lesson", "Lesson N:" for this lesson or "Starter Questions:" after it, and
+    is missing if none follows.
+    """
+    if isinstance(content, Span):
+        content, pos, endpos = content.doc, content.start, content.end
+    if endpos is None:
+        endpos = len(content)
+    start = INTRO_PATTERN.search(content, pos, endpos)
+    if start is None:
+        return None
+    for end in INTRO_END_PATTERN.finditer(content, start.end(), endpos):
+        if end.group(1) is None or end.group(1) == str(lesson_num):
+            return start.start(), end.start()
+    return None
+
+def section_text(content, sections, name):
+    """Text of one section from a split_sections map, or None if it is missing
+
+    content is the raw RTF string or anything sliced by raw offsets, such as a CleanDocument.
+    """
+    span = sections.get(name)
+    if span is None:
+        return None
+    return content[span[0]:span[1]]
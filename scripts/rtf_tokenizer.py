@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Single-pass RTF tokenizer - turns RTF (whole documents or fragments) into plain text
+Tracks the group stack, skips non-text destinations and decodes \\uN, \\ucN and \\'hh
+escapes through lookup tables instead of a cascade of re.sub passes
+"""
+
+import os
+import re
+from array import array
+from bisect import bisect_right
+
+# One alternation covers every RTF token, so the text is scanned exactly once
+TOKEN_PATTERN = re.compile(r"""
+    \\([a-zA-Z]+)(-?\d+)?[ ]?      # control word, optional parameter, one delimiting space
+  | \\'([0-9a-fA-F]{2})            # hex-escaped byte in the document code page
+  | \\([^a-zA-Z'])                 # control symbol: \\ \{ \} \~ \- \_ \* and \<newline>
+  | ([{}])                         # group open / close
+  | ([^\\{}\r\n]+)(\\\r?\n)?       # run of literal text, and the \<newline> ending its line
+""", re.VERBOSE | re.DOTALL)
+
+# Destinations whose content is never lesson text
+SKIPPED_DESTINATIONS = {
+    'fonttbl', 'colortbl', 'stylesheet', 'info', 'listtable', 'listoverridetable',
+    'pict', 'object', 'themedata', 'datastore', 'latentstyles', 'xmlnstbl',
+    'header', 'footer', 'headerl', 'headerr', 'footerl', 'footerr', 'footnote',
+    'fldinst', 'revtbl', 'rsidtbl', 'generator', 'filetbl', 'pgdsctbl',
+    'shppict', 'nonshppict', 'objdata', 'result',
+}
+
+# Inside a skipped destination only braces and control words matter
+SKIP_AHEAD_PATTERN = re.compile(r'[{}\\]')
+
+# \pict control words that name the picture format, and the file extension for each
+PICTURE_FORMATS = {
+    'pngblip': 'png', 'jpegblip': 'jpg', 'emfblip': 'emf', 'wmetafile': 'wmf',
+    'macpict': 'pict', 'dibitmap': 'bmp', 'wbitmap': 'bmp',
+}
+
+# Hex digits decoded per write when saving pictures
+PICTURE_CHUNK_SIZE = 1 << 16
+
+# Control words that end a paragraph or line
+BREAK_WORDS = {'par', 'line', 'sect', 'page', 'row'}
+
+# Control words that stand for a single character
+CHAR_WORDS = {
+    'tab': '\t', 'cell': ' ', 'emspace': ' ', 'enspace': ' ', 'qmspace': ' ',
+    'bullet': '•', 'endash': '–', 'emdash': '—',
+    'lquote': "'", 'rquote': "'", 'ldblquote': '"', 'rdblquote': '"',
+}
+
+# Control symbols that stand for a character (newline is handled as a paragraph break)
+CHAR_SYMBOLS = {'\\': '\\', '{': '{', '}': '}', '~': ' ', '_': '-', '-': ''}
+
+# Control words that produce text or change the tokenizer's state; any other word
+# only sets formatting
+SPECIAL_WORDS = BREAK_WORDS | set(CHAR_WORDS) | set(PICTURE_FORMATS) | {'u', 'uc', 'bin'}
+
+# A run of formatting-only control words and bare line ends, which produce nothing;
+# most of a document's markup is such runs, so each is taken as a single token
+INERT_RUN = r'(?:\\(?!(?:%s)(?![a-zA-Z]))[a-zA-Z]+(?:-?\d+)?[ ]?|[\r\n])+' % '|'.join(sorted(SPECIAL_WORDS))
+
+# TOKEN_PATTERN with inert runs in front; used everywhere except right after a
+# brace, where the first control word can name a destination
+RUN_PATTERN = re.compile(f'({INERT_RUN})|' + TOKEN_PATTERN.pattern, re.VERBOSE | re.DOTALL)
+
+# A group with no groups inside it; such groups repeat (list markers are the same
+# few bytes before every item), so each distinct one is decoded once per document
+FLAT_GROUP_PATTERN = re.compile(r'\{(?:[^\\{}]|\\.)*+\}', re.DOTALL)
+
+# Longest flat group worth remembering; longer ones are mostly unique text
+FLAT_GROUP_MAX = 80
+
+# Kinds of token for the offset map: literal text, and tokens producing nothing
+LINEAR = 1
+SILENT = 2
+
+# Typographic punctuation is flattened to ASCII, the same way whichever escape produced it
+PUNCTUATION_MAP = {'\u2018': "'", '\u2019': "'", '\u201c': '"', '\u201d': '"', '\u2026': '...'}
+
+def _build_codepage_table(codepage='cp1252'):
+    """Map every byte value to its decoded (and normalised) character"""
+    table = []
+    for byte in range(256):
+        try:
+            char = bytes([byte]).decode(codepage)
+        except UnicodeDecodeError:
+            char = ''
+        table.append(PUNCTUATION_MAP.get(char, char))
+    return table
+
+CP1252_TABLE = _build_codepage_table()
+
+def decode_8bit(literal):
+    """Literal text read one character per byte, decoded as the UTF-8 it was written in
+
+    Text that is already decoded past latin-1 is returned as it is.
+    """
+    try:
+        return literal.encode('latin-1').decode('utf-8', 'ignore')
+    except UnicodeEncodeError:
+        return literal
+
+def rtf_to_text(text, offsets=None, pictures=None, uc=1):
+    """Decode RTF into plain text in one pass; paragraph breaks come out as newlines
+
+    When offsets is a (raw, clean) pair of arrays, the raw and clean start of every
+    stretch of tokens is appended to them. Literal text maps one-to-one and markup
+    that produces nothing maps to a single point, so a run of either only needs a
+    single entry.
+
+    Skipped destinations are jumped over rather than tokenized, so \\pict hex data
+    and \\bin payloads are never copied. When pictures is a list, every \\pict
+    outside \\nonshppict is appended to it as a dict with its format and the raw
+    span of its data, plus the clean offset it sat at. uc is the \\ucN in effect
+    where text starts.
+    """
+    return _decode(text, offsets, pictures, uc, {})
+
+def _decode(text, offsets, pictures, uc, flat_groups):
+    """rtf_to_text, taking flat groups from and adding them to flat_groups unless it is None"""
+    out = []
+    stack = []
+    skipping = False      # inside a destination we do not emit
+    fallback = False      # inside \nonshppict, whose pictures duplicate \shppict ones
+    pending_skip = 0      # fallback characters still to drop
+    group_start = False   # previous token opened a group
+    ignorable = False     # group started with \*
+    picture = None        # \pict group being recorded
+    picture_depth = 0
+    clean_pos = 0
+    prev_end = -1
+    prev_run = 0          # LINEAR, SILENT or 0 for the previous token
+    pos = 0
+    length = len(text)
+
+    while pos < length:
+        if skipping:
+            # Jump straight to the next brace or control word
+            jump = SKIP_AHEAD_PATTERN.search(text, pos)
+            jump_to = jump.start() if jump else length
+            if picture is not None and len(stack) == picture_depth and jump_to > pos and not picture['binary']:
+                if picture['data_start'] is None:
+                    picture['data_start'] = pos
+                picture['data_end'] = jump_to
+            pos = jump_to
+            if jump is None:
+                break
+
+        # Kinds: 1 inert run, 2 control word, 3 its parameter, 4 hex byte,
+        # 5 control symbol, 6 brace, 7 literal text, 8 literal text and a line break
+        shift = 1 if group_start else 0
+        match = (TOKEN_PATTERN if group_start else RUN_PATTERN).match(text, pos)
+        if match is None:
+            pos += 1      # bare newline after a brace, or trailing backslash
+            continue
+        pos = match.end()
+        kind = match.lastindex + shift
+        value = match.group(match.lastindex)
+        piece = ''
+
+        if kind == 1:
+            if skipping and picture is not None and len(stack) == picture_depth:
+                picture['data_start'] = None
+
+        elif kind >= 7:
+            group_start = False
+            if not skipping:
+                piece = match.group(7 - shift)
+                if not piece.isascii():
+                    piece = decode_8bit(piece)
+                if pending_skip:
+                    dropped = min(pending_skip, len(piece))
+                    piece = piece[dropped:]
+                    pending_skip -= dropped
+                if kind == 8:
+                    piece += '\n'
+                    pending_skip = 0
+
+        elif kind == 6:
+            flat = None
+            if value == '{' and flat_groups is not None and not skipping:
+                flat = FLAT_GROUP_PATTERN.match(text, match.start())
+                if flat is not None and (flat.end() - flat.start() > FLAT_GROUP_MAX or '\\bin' in flat.group()
+                                         or (pictures is not None and 'pict' in flat.group())):
+                    flat = None
+            if flat is not None:
+                # Decoded the first time this group appears with this \ucN, then
+                # reused; it takes a single offset entry, like one token
+                piece = flat_groups.get((flat.group(), uc))
+                if piece is None:
+                    piece = flat_groups[flat.group(), uc] = _decode(flat.group(), None, None, uc, None)
+                pos = flat.end()
+                group_start = False
+            elif value == '{':
+                stack.append((skipping, fallback, uc))
+                group_start = True
+                ignorable = False
+            else:
+                if stack:
+                    skipping, fallback, uc = stack.pop()
+                if picture is not None and len(stack) < picture_depth:
+                    picture['raw_end'] = pos
+                    pictures.append(picture)
+                    picture = None
+                group_start = False
+            pending_skip = 0
+
+        elif kind <= 3:
+            word = match.group(2 - shift)
+            param = value if kind == 3 else None
+            if group_start:
+                if ignorable or word in SKIPPED_DESTINATIONS:
+                    skipping = True
+                if word == 'nonshppict':
+                    fallback = True
+                elif word == 'pict' and pictures is not None and not fallback:
+                    picture = {'format': None, 'raw_start': match.start() - 1, 'raw_end': None,
+                               'clean_pos': clean_pos, 'data_start': None, 'data_end': None, 'binary': False}
+                    picture_depth = len(stack)
+                group_start = False
+            if word == 'bin' and param:
+                # \binN is followed by N raw bytes that may contain braces
+                size = max(int(param), 0)
+                if picture is not None and len(stack) == picture_depth:
+                    picture.update(data_start=pos, data_end=min(pos + size, length), binary=True)
+                pos += size
+            elif skipping:
+                if picture is not None and len(stack) == picture_depth:
+                    # Picture data is the run after the last control word
+                    picture['data_start'] = None
+                    picture['format'] = PICTURE_FORMATS.get(word, picture['format'])
+            elif word == 'u' and param:
+                if pending_skip:
+                    pending_skip -= 1
+                else:
+                    code = int(param)
+                    if code < 0:
+                        code += 65536
+                    char = chr(code)
+                    piece = PUNCTUATION_MAP.get(char, char)
+                    pending_skip = uc
+            elif word == 'uc':
+                uc = int(param) if param else 1
+            elif word in BREAK_WORDS:
+                piece = '\n'
+                pending_skip = 0
+            elif word in CHAR_WORDS:
+                piece = CHAR_WORDS[word]
+
+        elif kind == 5:
+            symbol = value
+            if symbol == '*':
+                ignorable = True
+            else:
+                group_start = False
+                if skipping:
+                    pass
+                elif symbol in '\r\n':
+                    piece = '\n'
+                    pending_skip = 0
+                elif pending_skip:
+                    pending_skip -= 1
+                elif symbol in CHAR_SYMBOLS:
+                    piece = CHAR_SYMBOLS[symbol]
+
+        else:
+            group_start = False
+            if not skipping:
+                if pending_skip:
+                    pending_skip -= 1
+                else:
+                    piece = CP1252_TABLE[int(value, 16)]
+
+        if offsets is not None:
+            start = match.start()
+            if pos - start == len(piece):
+                run = LINEAR
+            else:
+                run = 0 if piece else SILENT
+            if not (run and run == prev_run and start == prev_end):
+                offsets[0].append(start)
+                offsets[1].append(clean_pos)
+            prev_end = pos
+            prev_run = run
+
+        if piece:
+            out.append(piece)
+            clean_pos += len(piece)
+
+    return ''.join(out)
+
+def save_pictures(text, pictures, directory, name_prefix):
+    """Stream recorded \\pict hex data from text into image files
+
+    Files are named name_prefix + index + extension. Returns one (file name, picture)
+    pair per file written. \\bin payloads are written as they are, which needs text
+    read one character per byte (see rtf_lessons.RTF_ENCODING).
+    """
+    os.makedirs(directory, exist_ok=True)
+    saved = []
+    for i, picture in enumerate(pictures, 1):
+        if picture['data_start'] is None:
+            continue
+        name = f"{name_prefix}{i}.{picture['format'] or 'bin'}"
+        with open(os.path.join(directory, name), 'wb') as f:
+            if picture['binary']:
+                f.write(text[picture['data_start']:picture['data_end']].encode('latin-1'))
+                saved.append((name, picture))
+                continue
+            carry = ''
+            for chunk_start in range(picture['data_start'], picture['data_end'], PICTURE_CHUNK_SIZE):
+                chunk_end = min(chunk_start + PICTURE_CHUNK_SIZE, picture['data_end'])
+                chunk = carry + ''.join(text[chunk_start:chunk_end].split())
+                cut = len(chunk) - len(chunk) % 2
+                f.write(bytes.fromhex(chunk[:cut]))
+                carry = chunk[cut:]
+        saved.append((name, picture))
+    return saved
+
+def normalize_space(text):
+    """Collapse all whitespace (paragraph breaks included) to single spaces"""
+    return ' '.join(text.split())
+
+def clean_rtf(text):
+    """Clean RTF formatting into a single line of plain text"""
+    if not text:
+        return ""
+    return normalize_space(rtf_to_text(text))
+
+class CleanDocument:
+    """A whole RTF document cleaned once, with a compact raw -> clean offset map
+
+    Structure is still found with regexes on the raw RTF; doc[raw_start:raw_end]
+    then returns the already-cleaned text for that raw range.
+    """
+
+    def __init__(self, raw, pictures=False):
+        self.raw = raw
+        self.raw_offsets = array('q')
+        self.clean_offsets = array('q')
+        self.pictures = [] if pictures else None
+        self.text = rtf_to_text(raw, (self.raw_offsets, self.clean_offsets), self.pictures)
+
+    def to_clean(self, raw_pos):
+        """Clean offset for a raw offset; positions inside a control token map to its output"""
+        i = bisect_right(self.raw_offsets, raw_pos) - 1
+        if i < 0:
+            return 0
+        clean_start = self.clean_offsets[i]
+        clean_end = self.clean_offsets[i + 1] if i + 1 < len(self.clean_offsets) else len(self.text)
+        return min(clean_start + raw_pos - self.raw_offsets[i], clean_end)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("CleanDocument only supports slicing by raw offsets")
+        start = 0 if key.start is None else self.to_clean(key.start)
+        end = len(self.text) if key.stop is None else self.to_clean(key.stop)
+        return self.text[start:end]
+
+    def __len__(self):
+        return len(self.raw)
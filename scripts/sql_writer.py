@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Streaming writer for the lesson SQL file
+Statements go straight to a buffered temporary file next to the target, which
+replaces the target only once everything has been written, so memory stays
+flat however many lessons there are and a failed run never leaves half a file
+"""
+
+import os
+
+# Bytes buffered before a write reaches the disk
+WRITE_BUFFER = 1 << 20
+
+# Columns of the lessons table, in the order lesson rows list them
+LESSON_COLUMNS = ('path_type', 'order_index', 'title', 'objective', 'estimated_duration', 'competence_tag', 'content')
+
+# Columns identifying a lesson; upserts need a unique constraint on them
+CONFLICT_COLUMNS = ('path_type', 'order_index')
+
+# insert: one INSERT per row with '' quoting; dollar: one INSERT per row with
+# dollar-quoted literals; values: multi-row INSERTs of batch_size rows with
+# dollar-quoted literals; copy/csv: one COPY ... FROM STDIN in text or CSV format
+OUTPUT_FORMATS = ('insert', 'dollar', 'values', 'copy', 'csv')
+
+# Rows per multi-row INSERT in the values format
+DEFAULT_BATCH_SIZE = 100
+
+# COPY text format escapes; JSON never holds a raw tab or newline, but titles might
+COPY_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+class Jsonb(str):
+    """Text of a jsonb column; INSERT literals get a ::jsonb cast"""
+
+def quote_literal(text):
+    """text as a standard SQL string literal, quotes doubled"""
+    return "'" + text.replace("'", "''") + "'"
+
+def dollar_literal(text):
+    """text as a dollar-quoted literal, with a tag that does not occur in text
+
+    The tag must not occur where text runs into the closing tag either, as
+    when text ends in '$j'.
+    """
+    tag = '$j$'
+    n = 0
+    while tag in text + tag[:-1]:
+        n += 1
+        tag = f'$j{n}$'
+    return f'{tag}{text}{tag}'
+
+def sql_value(value, quote=quote_literal):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (int, float)):
+        return str(value)
+    literal = quote(value)
+    return f'{literal}::jsonb' if isinstance(value, Jsonb) else literal
+
+def copy_text_field(value):
+    if value is None:
+        return '\\N'
+    return str(value).translate(COPY_TEXT_ESCAPES)
+
+def copy_csv_field(value):
+    if value is None:
+        return ''
+    text = str(value)
+    if text and not any(char in text for char in ',"\n\r'):
+        return text
+    # Quoted, so an empty string is not read as NULL
+    return '"' + text.replace('"', '""') + '"'
+
+def upsert_clause(columns=LESSON_COLUMNS, conflict=CONFLICT_COLUMNS):
+    """ON CONFLICT ... DO UPDATE setting every column outside conflict to the new row's value"""
+    updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns if column not in conflict)
+    return f"ON CONFLICT ({', '.join(conflict)}) DO UPDATE SET {updates}"
+
+class SqlWriter:
+    """Writes a header and then lesson rows in output_format, counting statements, rows and bytes
+
+    Used as a context manager: leaving the block normally moves the file into
+    place, leaving it on an error deletes it. Statements are each preceded and
+    followed by a newline; only a values batch of batch_size rows is ever held.
+    With conflict, INSERTs update the existing row with the same conflict columns.
+    """
+
+    def __init__(self, path, header=(), output_format='insert', batch_size=DEFAULT_BATCH_SIZE,
+                 table='lessons', columns=LESSON_COLUMNS, conflict=None, buffering=WRITE_BUFFER):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {output_format!r}, expected one of {', '.join(OUTPUT_FORMATS)}")
+        if conflict is not None and output_format in ('copy', 'csv'):
+            raise ValueError(f"The {output_format} format cannot update existing rows")
+        self.path = path
+        self.header = header
+        self.output_format = output_format
+        self.batch_size = batch_size
+        self.table = table
+        self.columns = columns
+        self.conflict = conflict
+        self.buffering = buffering
+        self.statements = 0
+        self.rows = 0
+        self.bytes_written = 0
+        self._temp_path = f"{path}.tmp"
+        self._file = None
+        self._batch = []
+        self._copying = False
+
+    def __enter__(self):
+        self._file = open(self._temp_path, 'wb', buffering=self.buffering)
+        self._write('\n'.join(self.header))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.finish()
+        finally:
+            self._file.close()
+        if exc_type is None:
+            os.replace(self._temp_path, self.path)
+        else:
+            os.remove(self._temp_path)
+        return False
+
+    def _write(self, text):
+        data = text.encode('utf-8')
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def write(self, statement):
+        self._write(f"\n{statement}\n")
+        self.statements += 1
+
+    def _insert(self, rows, quote):
+        values = ',\n'.join('(' + ', '.join(sql_value(value, quote) for value in row) + ')' for row in rows)
+        upsert = '' if self.conflict is None else '\n' + upsert_clause(self.columns, self.conflict)
+        self.write(f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES\n{values}{upsert};")
+        self.rows += len(rows)
+
+    def write_row(self, row):
+        """Write one row of column values; values rows are held until their batch fills"""
+        if self.output_format in ('copy', 'csv'):
+            if not self._copying:
+                options = ' WITH (FORMAT csv)' if self.output_format == 'csv' else ''
+                self._write(f"\nCOPY {self.table} ({', '.join(self.columns)}) FROM STDIN{options};\n")
+                self.statements += 1
+                self._copying = True
+            if self.output_format == 'csv':
+                self._write(','.join(copy_csv_field(value) for value in row) + '\n')
+            else:
+                self._write('\t'.join(copy_text_field(value) for value in row) + '\n')
+            self.rows += 1
+        elif self.output_format == 'values':
+            self._batch.append(row)
+            if len(self._batch) >= self.batch_size:
+                self.finish()
+        else:
+            self._insert([row], dollar_literal if self.output_format == 'dollar' else quote_literal)
+
+    def finish(self):
+        """Write the held values batch or end the COPY data, so a statement can follow"""
+        if self._batch:
+            self._insert(self._batch, dollar_literal)
+            self._batch = []
+        if self._copying:
+            self._write('\\.\n')
+            self._copying = False
+
+    def write_lessons(self, lessons, to_row, to_sql=None):
+        """Write each lesson as it arrives, passing the lessons on
+
+        to_row gives a lesson's column values; to_sql, if given, lays out the
+        INSERT of the insert format for a row instead.
+        """
+        for lesson in lessons:
+            row = to_row(lesson)
+            if self.output_format == 'insert' and to_sql is not None and self.conflict is None:
+                self.write(to_sql(row))
+                self.rows += 1
+            else:
+                self.write_row(row)
+            yield lesson
+        self.finish()
+
+def write_sql(lessons, path, to_row, to_sql=None, header=(), output_format='insert', batch_size=DEFAULT_BATCH_SIZE):
+    """Write lessons to path in output_format; (statements, bytes) written"""
+    with SqlWriter(path, header, output_format, batch_size) as writer:
+        for _ in writer.write_lessons(lessons, to_row, to_sql):
+            pass
+    return writer.statements, writer.bytes_written
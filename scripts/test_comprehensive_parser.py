@@ -0,0 +1,52 @@
+"""Regression tests for comprehensive_parser; run with python -m pytest scripts"""
+
+import random
+import time
+
+from comprehensive_parser import LessonEnricher, iter_questions, map_lessons, parse_lesson
+
+def lesson_block(lesson_num, questions):
+    """An RTF lesson with a Lesson text and a Questions list, but no Starter Questions"""
+    items = ''.join(f'{question}\\par ' for question in questions)
+    return (f'{{\\rtf1 \\fs51\\fsmilli25995 \\cf2 {lesson_num} | The Heart\\par '
+            f'Lesson {lesson_num}: The heart pumps blood around the body every day.\\par '
+            f'Questions:\\par {items}}}')
+
+def test_merge_drops_the_type_of_the_dropped_question():
+    first = parse_lesson(lesson_block(1, ['How does the heart pump blood around the body?']), 'Med', 1, '0')
+    second = parse_lesson(lesson_block(2, ['How does the heart pump blood around the body?',
+                                           'Why do cells need oxygen to make energy?']), 'Med', 2, '0')
+    # The made-up task and quiz question have type entries too, so the entries line up
+    for lesson in (first, second):
+        assert len(lesson["question_types"]) == len(list(iter_questions(lesson)))
+    assert second["question_types"][0] == ("text_answer", "fallback")
+
+    enricher = LessonEnricher(merge=True)
+    list(enricher([first, second]))
+
+    assert [question["question"] for question in second["follow_ups"]] == ['Why do cells need oxygen to make energy?']
+    assert [rule for _, rule in second["question_types"]] == ['fallback', 'cue:text_answer:why', 'fallback']
+
+def test_images_name_their_section_and_url(tmp_path):
+    block = lesson_block(1, ['Why do cells need oxygen to make energy?']).replace(
+        'every day.', 'every day. {\\pict\\pngblip 89504e47}')
+    lesson = parse_lesson(block, 'Med', 1, '0', str(tmp_path), '/static/lessons')
+    assert lesson["images"] == [{"src": "/static/lessons/med-lesson1-image1.png", "format": "png", "section": "Lesson"}]
+    assert (tmp_path / 'med-lesson1-image1.png').read_bytes() == b'\x89PNG'
+
+def test_second_questions_section_is_the_quiz():
+    block = lesson_block(1, ['How does the heart pump blood around the body?']).replace(
+        '}', 'Questions:\\par Why do cells need oxygen to make energy?\\par }')
+    lesson = parse_lesson(block, 'Med', 1, '0')
+    assert [question["question"] for question in lesson["follow_ups"]] == ['How does the heart pump blood around the body?']
+    assert [question["question"] for question in lesson["quiz_questions"]] == ['Why do cells need oxygen to make energy?']
+
+def draw(lesson_num):
+    """A stand-in parse that reports the worker's next random number"""
+    time.sleep(0.05)
+    return random.random()
+
+def test_pool_workers_do_not_share_random_state():
+    random.seed(0)
+    draws = list(map_lessons([(num,) for num in range(8)], jobs=2, parse=draw))
+    assert len(set(draws)) == len(draws)
@@ -0,0 +1,36 @@
+"""Regression tests for lesson_cache; run with python -m pytest scripts"""
+
+import itertools
+import pickle
+
+import lesson_cache
+from lesson_cache import LessonCache
+
+def test_edited_block_misses(tmp_path):
+    cache = LessonCache(str(tmp_path), 'stamp')
+    cache.put(cache.key('{\\rtf1 The heart pumps blood.}', 'Med', 1, '0'), {"title": "Heart"})
+
+    assert cache.get(cache.key('{\\rtf1 The heart pumps blood.}', 'Med', 1, '0')) == {"title": "Heart"}
+    assert cache.get(cache.key('{\\rtf1 The heart pumps blood!}', 'Med', 1, '0')) is None
+    assert cache.get(cache.key('{\\rtf1 The heart pumps blood.}', 'Med', 1, '1')) is None
+    # A parser edit changes the stamp, and with it every key
+    stale = LessonCache(str(tmp_path), 'new stamp')
+    assert stale.get(stale.key('{\\rtf1 The heart pumps blood.}', 'Med', 1, '0')) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_least_recently_used_is_evicted(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(lesson_cache.time, 'time', lambda: next(clock))
+    lesson = {"text": "x" * 1000}
+    entry_size = len(pickle.dumps(lesson, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = LessonCache(str(tmp_path / 'cache'), max_bytes=3 * entry_size)
+    for key in 'abc':
+        cache.put(key, lesson)
+    assert cache.get('a') == lesson
+    cache.put('d', lesson)
+
+    assert cache.evictions == 2
+    assert sorted(cache._entries) == ['a', 'd']
+    assert sorted(path.name for path in (tmp_path / 'cache').iterdir()) == ['a.pickle', 'd.pickle']
+    # A new cache over the same directory sees the same entries
+    assert LessonCache(str(tmp_path / 'cache'), max_bytes=3 * entry_size).get('a') == lesson
@@ -0,0 +1,28 @@
+"""Regression tests for lesson_manifest; run with python -m pytest scripts"""
+
+from lesson_manifest import BuildManifest
+
+def build(path, lessons, options):
+    """One build of lessons through a manifest at path; the options each lesson ended up with"""
+    manifest = BuildManifest.load(str(path))
+    kept = [manifest.pinned(lesson) for lesson in lessons]
+    to_row = manifest.record(lambda lesson: (lesson["path_type"], lesson["order_index"], lesson["text"]))
+    for lesson, pinned in zip(lessons, kept):
+        manifest.pin(lesson, pinned if pinned is not None else options)
+        to_row(lesson)
+    manifest.write(str(path))
+    return manifest, kept
+
+def test_unchanged_source_keeps_published_options(tmp_path):
+    path = tmp_path / 'manifest.json'
+    lessons = [{"path_type": "Med", "order_index": n, "text": f"lesson {n}"} for n in (1, 2)]
+    build(path, lessons, [["a", "b"]])
+
+    lessons[1]["text"] = "lesson 2, reworded"
+    manifest, kept = build(path, lessons, [["c", "d"]])
+    assert kept == [[["a", "b"]], None]
+    assert [manifest.is_current(lesson) for lesson in lessons] == [True, False]
+    assert manifest.removed_keys() == []
+
+    manifest, _ = build(path, lessons[:1], [["c", "d"]])
+    assert manifest.removed_keys() == [("Med", 2)]
@@ -0,0 +1,59 @@
+"""Regression tests for medical_lexicon; run with python -m pytest scripts"""
+
+import random
+
+from medical_lexicon import Lexicon, load_lexicon
+
+TERMS = {"organ": ["heart", "heart valve", "valve", "art", "lung", "lungs"],
+         "gas": ["carbon", "carbon dioxide", "oxide", "dioxide"]}
+CUES = {"drag_drop": ["drag", "drag and drop", "order"], "text_answer": ["why", "what is", "is", "and"]}
+WORDS = ["heart", "valve", "art", "lung", "lungs", "carbon", "dioxide", "oxide", "drag", "and", "drop",
+         "order", "why", "what", "is", "hearts", "the", "x_art", "-", ",", "éart"]
+
+def brute_terms(lexicon, text, categories=None):
+    """Leftmost-longest whole-word terms, trying every term at every position"""
+    terms = [term for term, term_categories in lexicon.term_categories.items()
+             if categories is None or any(category in categories for category in term_categories)]
+    found = []
+    i = 0
+    while i < len(text):
+        fits = [term for term in terms if text.startswith(term, i)
+                and not (i > 0 and (text[i - 1].isalnum() or text[i - 1] == '_'))
+                and not (i + len(term) < len(text) and (text[i + len(term)].isalnum() or text[i + len(term)] == '_'))]
+        if fits:
+            term = max(fits, key=len)
+            found.append((i, i + len(term), term))
+            i += len(term)
+        else:
+            i += 1
+    return found
+
+def brute_cues(lexicon, text):
+    """Per question type, the cue ending first, the longer of two ending together"""
+    hits = {}
+    for qtype, cues in lexicon.question_cues.items():
+        occurrences = [(i + len(cue), -len(cue), cue) for cue in cues for i in range(len(text)) if text.startswith(cue, i)]
+        if occurrences:
+            hits[qtype] = min(occurrences)[2]
+    return hits
+
+def test_matches_brute_force_scan():
+    lexicon = Lexicon(TERMS, CUES)
+    rng = random.Random(5)
+    for _ in range(2000):
+        text = ''.join(rng.choice(WORDS) + rng.choice([' ', '', ', ']) for _ in range(rng.randint(1, 12)))
+        for categories in (None, ("organ",), ("gas",), ()):
+            assert lexicon.find_terms(text, categories) == brute_terms(lexicon, text, categories), (text, categories)
+        assert lexicon.question_cue_hits(text) == brute_cues(lexicon, text), text
+
+def test_shipped_lexicon():
+    lexicon = load_lexicon()
+    assert lexicon.terms_in("the carbon dioxide left the lungs and kidneys") == ["carbon dioxide", "lungs", "kidneys"]
+    assert lexicon.category_of("kidneys") == "plurals"
+
+def test_parser_lists_replace_shared_ones():
+    lexicon = load_lexicon(parser='final_working_parser')
+    assert lexicon.question_types("can you drag the heart?") == []
+    assert lexicon.question_types("what is the heart?") == ["text_answer"]
+    assert lexicon.category_terms("drag_drop_items")[:3] == ["heart", "lungs", "brain"]
+    assert "system" not in lexicon.term_categories
@@ -0,0 +1,43 @@
+"""Regression tests for question_dedup; run with python -m pytest scripts"""
+
+import itertools
+
+import question_dedup
+from question_dedup import DEFAULT_THRESHOLD, NearDuplicateIndex, jaccard, shingles
+
+ORGANS = ['heart', 'lungs', 'kidneys', 'liver', 'brain', 'skin']
+
+def corpus(lessons):
+    """Questions of lessons that repeat a few templates, with one unique question each"""
+    for n in range(lessons):
+        yield ["What does the skeletal system do?", "Why are the bones important for the body?",
+               f"How does the {ORGANS[n % len(ORGANS)]} help the body stay healthy?",
+               f"Which planet did explorer number {n * 7919} visit first?"]
+
+def groups_of(pairs, count):
+    parent = list(range(count))
+    def find(i):
+        while parent[i] != i:
+            i = parent[i]
+        return i
+    for i, j in pairs:
+        parent[max(find(i), find(j))] = min(find(i), find(j))
+    return sorted(sorted(i for i in range(count) if find(i) == root) for root in {find(i) for i in range(count)})
+
+def test_groups_match_brute_force(monkeypatch):
+    checks = []
+    monkeypatch.setattr(question_dedup, 'jaccard', lambda a, b: checks.append(1) or jaccard(a, b))
+    index = NearDuplicateIndex()
+    texts, pairs = [], []
+    for questions in corpus(60):
+        for text, found in zip(questions, index.add(questions)):
+            pairs.extend((len(texts), match) for match in found)
+            texts.append(text)
+
+    shingle_sets = [shingles(text) for text in texts]
+    brute = [(i, j) for i, j in itertools.combinations(range(len(texts)), 2)
+             if jaccard(shingle_sets[i], shingle_sets[j]) >= DEFAULT_THRESHOLD]
+    assert groups_of(pairs, len(texts)) == groups_of(brute, len(texts))
+    assert index.group(len(texts) - 4) == 0
+    # Repeats join their first copy unchecked, and a group stops being checked once one member matches
+    assert len(checks) < 2 * len(texts)
@@ -0,0 +1,29 @@
+"""Regression tests for rtf_tokenizer; run with python -m pytest scripts"""
+
+from rtf_lessons import RTF_ENCODING, iter_lessons
+from rtf_tokenizer import CleanDocument, clean_rtf, save_pictures
+
+def test_bin_payload_is_skipped_by_byte_count():
+    # The payload is not valid UTF-8 and holds a closing brace
+    raw = b'{\\rtf1 {\\pict\\pngblip\\bin5 \xff}\xfe\x89P}Hello world, the heart pumps blood.}'
+    assert clean_rtf(raw.decode(RTF_ENCODING)) == 'Hello world, the heart pumps blood.'
+
+def test_bin_payload_in_lesson_file(tmp_path):
+    path = tmp_path / 'lessons.rtf'
+    path.write_bytes(b'{\\rtf1 \\fs51\\fsmilli25995 \\cf2 1 | Title\\fs21 '
+                     b'{\\pict\\pngblip\\bin4 \xff\xfe}\\}The heart pumps blood.}')
+    (lesson_num, block), = iter_lessons(str(path))
+    assert lesson_num == 1
+    assert clean_rtf(block).endswith('The heart pumps blood.')
+
+def test_binary_picture_is_saved(tmp_path):
+    raw = b'{\\rtf1 {\\pict\\pngblip\\bin4 \x89P}\xff}after}'.decode(RTF_ENCODING)
+    doc = CleanDocument(raw, pictures=True)
+    assert doc.text == 'after'
+    (name, picture), = save_pictures(raw, doc.pictures, str(tmp_path), 'image')
+    assert name == 'image1.png'
+    assert (tmp_path / name).read_bytes() == b'\x89P}\xff'
+
+def test_8bit_literal_text_is_utf8():
+    raw = 'Café – résumé'.encode('utf-8').decode(RTF_ENCODING)
+    assert clean_rtf('{\\rtf1 ' + raw + '}') == 'Café – résumé'
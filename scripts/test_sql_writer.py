@@ -0,0 +1,39 @@
+"""Regression tests for sql_writer's quoting and escaping; run with python -m pytest scripts"""
+
+import csv
+
+from sql_writer import Jsonb, SqlWriter, copy_text_field, dollar_literal, quote_literal, sql_value
+
+def dollar_body(literal):
+    """The text a Postgres lexer reads from a dollar-quoted literal: up to the first closing tag"""
+    tag = literal[:literal.index('$', 1) + 1]
+    body = literal[len(tag):]
+    return body[:body.index(tag)]
+
+def test_insert_literal_doubles_quotes():
+    assert quote_literal("it's") == "'it''s'"
+    assert sql_value(Jsonb('{"a": "O\'Neil"}')) == "'{\"a\": \"O''Neil\"}'::jsonb"
+    assert sql_value(None) == 'NULL'
+
+def test_dollar_literal_survives_its_tag():
+    for text in ('plain', 'costs $j$5', 'ends in $j', 'ends in $', 'ends in $j1', '$j$ and $j1$', ''):
+        assert dollar_body(dollar_literal(text)) == text
+
+def test_copy_text_escapes():
+    assert copy_text_field('a\\b\tc\nd\re') == 'a\\\\b\\tc\\nd\\re'
+    assert copy_text_field(None) == '\\N'
+
+def test_csv_rows_read_back(tmp_path):
+    rows = [('Pre-Med', 1, 'Title, "quoted"', '', 20, None, Jsonb('{"text": "line\\nbreak"}')),
+            ('Med', 2, 'Two\nlines', 'x', 20, 'safe', Jsonb('{}'))]
+    path = tmp_path / 'lessons.sql'
+    with SqlWriter(str(path), output_format='csv') as writer:
+        for row in rows:
+            writer.write_row(row)
+    data = path.read_text(encoding='utf-8')
+    start = 'FROM STDIN WITH (FORMAT csv);\n'
+    body = data[data.index(start) + len(start):data.index('\\.\n')]
+    read = list(csv.reader(body.splitlines(keepends=True)))
+    assert read == [['' if value is None else str(value) for value in row] for row in rows]
+    # Empty text is quoted, so COPY does not read it as NULL
+    assert ',"",' in body
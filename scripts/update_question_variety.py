@@ -11,7 +11,10 @@ Reads the SQL file, processes each lesson, and updates question formats intellig
 import json
 import re
 import random
-from collections import Counter
+
+from fill_blanks import BlankIndex
+from keyword_profile import KeywordProfile, build_term_distractors, same_stem
+from medical_lexicon import load_lexicon
 
 # Common filler words to avoid
 FILLER_WORDS = {
@@ -22,93 +25,39 @@ FILLER_WORDS = {
     'very', 'more', 'most', 'some', 'any', 'all', 'each', 'every', 'many', 'much', 'few', 'little'
 }
 
-# Medical/biology key words that are good for fill-in-the-blank
-KEY_WORD_PATTERNS = [
-    r'\b(heart|brain|lungs|stomach|kidney|liver|muscle|bone|cell|tissue|organ|system)\b',
-    r'\b(doctor|nurse|patient|hospital|clinic|medicine|treatment|diagnosis|surgery)\b',
-    r'\b(blood|oxygen|carbon|dioxide|nutrient|waste|energy|protein|vitamin|mineral)\b',
-    r'\b(circulatory|respiratory|digestive|nervous|skeletal|muscular|immune|endocrine)\b',
-    r'\b(artery|vein|capillary|nerve|neuron|synapse|hormone|enzyme|antibody|antigen)\b',
-    r'\b(bones|muscles|joints|spine|skull|ribs|femur|pelvis|cartilage|ligament)\b',
-    r'\b(doctor|nurse|pharmacist|technician|specialist|surgeon|pediatrician)\b'
-]
+# Lexicon categories whose terms are good for fill-in-the-blank
+KEY_WORD_CATEGORIES = ('anatomy', 'care', 'substance', 'body_system', 'signalling', 'skeleton', 'profession')
 
-def extract_key_words(text):
-    """Extract important medical/biology terms from text"""
-    if not text:
-        return []
-    
-    key_words = []
-    text_lower = text.lower()
-    
-    for pattern in KEY_WORD_PATTERNS:
-        matches = re.findall(pattern, text_lower, re.IGNORECASE)
-        key_words.extend(matches)
-    
-    # Also look for capitalized words (likely proper nouns or important terms)
-    capitalized = re.findall(r'\b[A-Z][a-z]+\b', text)
-    key_words.extend([w.lower() for w in capitalized if w.lower() not in FILLER_WORDS and len(w) > 3])
-    
-    # Count frequency and return most common
-    word_counts = Counter(key_words)
-    # Return words that appear at least once and are not fillers
-    important_words = [word for word, count in word_counts.items() 
-                      if word.lower() not in FILLER_WORDS and len(word) > 3]
-    
-    return list(set(important_words))  # Remove duplicates
+LEXICON = load_lexicon()
 
-def create_fill_in_blank(text, key_word):
-    """Create a fill-in-the-blank question by removing a key word"""
-    if not text or not key_word:
-        return None
-    
-    # Find sentences containing the key word
-    sentences = re.split(r'[.!?]+', text)
-    target_sentence = None
-    
-    for sentence in sentences:
-        if re.search(r'\b' + re.escape(key_word) + r'\b', sentence, re.IGNORECASE):
-            target_sentence = sentence.strip()
-            if len(target_sentence) > 20:  # Make sure sentence is substantial
-                break
-    
-    if not target_sentence:
-        return None
-    
-    # Replace the key word with a blank
-    blank_sentence = re.sub(
-        r'\b' + re.escape(key_word) + r'\b',
-        '______',
-        target_sentence,
-        flags=re.IGNORECASE
-    )
-    
-    return blank_sentence.strip()
+def build_keyword_profile(lesson_text):
+    """Key terms of a lesson, computed once and shared by all of its questions"""
+    return KeywordProfile(lesson_text, LEXICON, FILLER_WORDS, KEY_WORD_CATEGORIES)
 
-def generate_mcq_options(correct_answer, lesson_text, num_options=4):
+def fill_in_blank_candidates(profile):
+    """(key word, blanked sentence) for every ranked key term, at most one per sentence"""
+    return BlankIndex(profile.corpus).candidates(profile.ranked, max_len=None)
+
+def generate_mcq_options(correct_answer, profile, distractors, num_options=4):
     """Generate plausible multiple choice options"""
     options = [correct_answer]
     
-    # Extract other key terms from the lesson
-    key_words = extract_key_words(lesson_text)
-    
-    # Remove the correct answer from key words
-    key_words = [w for w in key_words if w.lower() != correct_answer.lower()]
+    # The key terms from any lesson most like the answer, same-category terms first,
+    # leaving out other forms of the answer itself
+    wrong_options = distractors.nearest(correct_answer, k=num_options - 1,
+                                        category=profile.categories.get(correct_answer.lower()),
+                                        skip=lambda term: same_stem(term, correct_answer))
     
-    # Generate wrong options
-    wrong_options = []
-    if len(key_words) >= num_options - 1:
-        # Use related terms
-        wrong_options = random.sample(key_words, min(num_options - 1, len(key_words)))
-    else:
-        # Use generic wrong answers based on context
+    if len(wrong_options) < num_options - 1:
+        # Top up with generic wrong answers based on context
         if 'system' in correct_answer.lower() or 'organ' in correct_answer.lower():
             generic_wrong = ['muscle', 'tissue', 'cell', 'bone']
         elif 'doctor' in correct_answer.lower() or 'nurse' in correct_answer.lower():
             generic_wrong = ['patient', 'hospital', 'clinic', 'medicine']
         else:
             generic_wrong = ['incorrect', 'wrong', 'false', 'none']
-        wrong_options = generic_wrong[:num_options - 1]
+        generic_wrong = [w for w in generic_wrong if w not in wrong_options and w != correct_answer.lower()]
+        wrong_options += generic_wrong[:num_options - 1 - len(wrong_options)]
     
     options.extend(wrong_options)
     
@@ -132,13 +81,18 @@ def assign_question_format(question_text, lesson_text, question_index, total_que
     else:
         return 'fill_in_blank'
 
-def process_question(question, lesson_text, question_index, total_questions):
-    """Process a single question and assign format"""
+def process_question(question, profile, blanks, distractors, question_index, total_questions):
+    """Process a single question and assign format, using the lesson's shared keyword profile
+    
+    blanks holds the lesson's unused fill-in-the-blank candidates; a question that
+    becomes a blank takes one out, so no answer repeats within a lesson. distractors
+    is the corpus-wide pool of key terms that wrong options come from.
+    """
     question_text = question.get('question', '')
     current_format = question.get('questionFormat') or question.get('type', 'text_answer')
     
     # Assign new format
-    new_format = assign_question_format(question_text, lesson_text, question_index, total_questions)
+    new_format = assign_question_format(question_text, profile.text, question_index, total_questions)
     
     # Update format field (use 'type' for quiz, 'questionFormat' for tasks/followups)
     if 'type' in question:
@@ -148,10 +102,10 @@ def process_question(question, lesson_text, question_index, total_questions):
     
     if new_format == 'multiple_choice':
         # Extract a key term from the question or text
-        key_words = extract_key_words(question_text + ' ' + lesson_text)
+        key_words = profile.ranked_with(question_text)
         if key_words:
             correct_answer = random.choice(key_words[:5])  # Pick from top 5
-            options, correct_index = generate_mcq_options(correct_answer, lesson_text)
+            options, correct_index = generate_mcq_options(correct_answer, profile, distractors)
             question['options'] = options
             question['correct'] = correct_index
         else:
@@ -162,20 +116,11 @@ def process_question(question, lesson_text, question_index, total_questions):
                 question['questionFormat'] = 'text_answer'
     
     elif new_format == 'fill_in_blank':
-        # Find a key word to remove
-        key_words = extract_key_words(lesson_text)
-        if key_words:
-            key_word = random.choice(key_words[:10])  # Pick from top 10
-            blank_text = create_fill_in_blank(lesson_text, key_word)
-            if blank_text:
-                question['question'] = blank_text
-                question['correct_answer'] = key_word
-            else:
-                # Fallback to text_answer
-                if 'type' in question:
-                    question['type'] = 'text_answer'
-                else:
-                    question['questionFormat'] = 'text_answer'
+        # Take a blank for one of the top 10 key words
+        if blanks:
+            key_word, blank_text = blanks.pop(random.randrange(min(len(blanks), 10)))
+            question['question'] = blank_text
+            question['correct_answer'] = key_word
         else:
             if 'type' in question:
                 question['type'] = 'text_answer'
@@ -199,36 +144,47 @@ def main():
     
     print(f"Found {len(matches)} lessons to process\n")
     
+    # Read every lesson first, so wrong options can come from the key terms of all of them
+    lessons = []
+    for match in matches:
+        try:
+            # Extract the JSON part
+            json_clean = match.group(4).replace("''", "'")
+            lesson_data = json.loads(json_clean)
+            profile = build_keyword_profile(lesson_data.get('text', ''))
+        except Exception as e:
+            print(f"❌ Error reading lesson: {e}")
+            continue
+        lessons.append((match, lesson_data, profile))
+    
+    distractors = build_term_distractors(profile for _, _, profile in lessons)
+    
     updated_content = content
     offset = 0
     
     # Process each lesson in reverse order to maintain string positions
-    for match in reversed(matches):
+    for match, lesson_data, profile in reversed(lessons):
         try:
-            # Extract the JSON part
             json_str = match.group(4)
-            json_clean = json_str.replace("''", "'")
-            lesson_data = json.loads(json_clean)
-            
-            lesson_text = lesson_data.get('text', '')
+            blanks = fill_in_blank_candidates(profile)
             
             # Process tasks
             tasks = lesson_data.get('tasks', [])
             total_questions = len(tasks) + len(lesson_data.get('followUps', [])) + len(lesson_data.get('quiz', {}).get('questions', []))
             
             for i, task in enumerate(tasks):
-                process_question(task, lesson_text, i, total_questions)
+                process_question(task, profile, blanks, distractors, i, total_questions)
             
             # Process follow-ups
             follow_ups = lesson_data.get('followUps', [])
             for i, follow_up in enumerate(follow_ups):
-                process_question(follow_up, lesson_text, len(tasks) + i, total_questions)
+                process_question(follow_up, profile, blanks, distractors, len(tasks) + i, total_questions)
             
             # Process quiz questions
             quiz = lesson_data.get('quiz', {})
             quiz_questions = quiz.get('questions', [])
             for i, question in enumerate(quiz_questions):
-                process_question(question, lesson_text, len(tasks) + len(follow_ups) + i, total_questions)
+                process_question(question, profile, blanks, distractors, len(tasks) + len(follow_ups) + i, total_questions)
             
             # Convert back to JSON string
             new_json = json.dumps(lesson_data, ensure_ascii=False).replace("'", "''")